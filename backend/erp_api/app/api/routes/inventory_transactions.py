@@ -2,7 +2,7 @@
 from decimal import Decimal
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Query
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -18,6 +18,8 @@ from app.schemas.inventory_transaction import (
 )
 from app.core.deps import get_current_active_user, require_roles
 from app.models.user import Role
+from app.services.score_cache import invalidate_scores
+from app.services.transaction_scores import score_and_store, window_dependents
 
 router = APIRouter(prefix="/inventory-transactions", tags=["inventory-transactions"])
 
@@ -62,6 +64,8 @@ def get_transaction(
 @router.post("", response_model=InventoryTransactionResponse, status_code=status.HTTP_201_CREATED)
 def create_transaction(
     payload: InventoryTransactionCreate,
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
 ):
@@ -88,6 +92,11 @@ def create_transaction(
     db.add(tx)
     db.commit()
     db.refresh(tx)
+    # Persist the anomaly score after the response is sent (no-op without a model), with
+    # the scores of later rows whose window features include this one
+    dependents = window_dependents(db, request.app.state, [(tx.item_id, tx.warehouse_id, tx.created_at)])
+    invalidate_scores(request.app.state, dependents)
+    background_tasks.add_task(score_and_store, request.app.state, [tx.id, *dependents])
     return tx
 
 
@@ -95,6 +104,8 @@ def create_transaction(
 def update_transaction(
     transaction_id: int,
     payload: InventoryTransactionUpdate,
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
 ):
@@ -102,24 +113,37 @@ def update_transaction(
     if not tx:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
     data = payload.model_dump(exclude_unset=True)
+    before = (tx.item_id, tx.warehouse_id, tx.created_at)
     for k, v in data.items():
         setattr(tx, k, v)
     if "quantity" in data or "unit_price" in data:
         tx.total_amount = (tx.unit_price * tx.quantity) if tx.unit_price else None
     db.commit()
     db.refresh(tx)
+    # Rows whose windows held the old or hold the new version are rescored with it
+    after = (tx.item_id, tx.warehouse_id, tx.created_at)
+    ids = list(dict.fromkeys([tx.id, *window_dependents(db, request.app.state, [before, after])]))
+    invalidate_scores(request.app.state, ids)
+    background_tasks.add_task(score_and_store, request.app.state, ids)
     return tx
 
 
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_transaction(
     transaction_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(require_roles(Role.ADMIN))],
 ):
     tx = db.query(InventoryTransaction).filter(InventoryTransaction.id == transaction_id).first()
     if not tx:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
+    before = (tx.item_id, tx.warehouse_id, tx.created_at)
     db.delete(tx)
     db.commit()
+    dependents = window_dependents(db, request.app.state, [before])
+    invalidate_scores(request.app.state, [transaction_id, *dependents])
+    if dependents:
+        background_tasks.add_task(score_and_store, request.app.state, dependents)
     return None
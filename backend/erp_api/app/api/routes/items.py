@@ -1,7 +1,7 @@
 """Items CRUD - product/SKU master data."""
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -10,6 +10,7 @@ from app.models.item import Item
 from app.schemas.item import ItemCreate, ItemUpdate, ItemResponse
 from app.core.deps import get_current_active_user, require_roles
 from app.models.user import Role
+from app.services.score_cache import invalidate_scores
 
 router = APIRouter(prefix="/items", tags=["items"])
 
@@ -62,6 +63,7 @@ def create_item(
 def update_item(
     item_id: int,
     payload: ItemUpdate,
+    request: Request,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
 ):
@@ -73,12 +75,16 @@ def update_item(
         setattr(item, k, v)
     db.commit()
     db.refresh(item)
+    if "category" in data:
+        # Category is a model input of every transaction of the item
+        invalidate_scores(request.app.state)
     return item
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_item(
     item_id: int,
+    request: Request,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(require_roles(Role.ADMIN))],
 ):
@@ -87,4 +93,5 @@ def delete_item(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     db.delete(item)
     db.commit()
+    invalidate_scores(request.app.state)  # transactions cascade
     return None
@@ -1,20 +1,65 @@
 """ML-ready export and inference endpoints."""
-from typing import Annotated, Any
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Annotated, Any, Literal, NamedTuple
 
-from fastapi import APIRouter, Depends, Query, Request, HTTPException, status
-from sqlalchemy import func
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import String, cast, func, literal, select, tuple_
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 
 from app.database import get_db
 from app.models.user import User
 from app.models.inventory_transaction import InventoryTransaction, TransactionType
+from app.models.row_count import get_row_count
 from app.models.item import Item
 from app.models.warehouse import Warehouse
-from app.schemas.ml_export import MLTransactionRow, MLExportResponse
+from app.models.transaction_score import TransactionScore
+from app.models.transaction_tombstone import TransactionTombstone
+from app.schemas.inventory_transaction import TransactionType as SchemaTxType
+from app.schemas.ml_export import (
+    MLTransactionRow,
+    MLExportFilters,
+    MLExportResponse,
+    MLExportShardsResponse,
+    MLIdRange,
+    MLCompactExportResponse,
+    MLFeaturesResponse,
+    MLAnomalyRow,
+    MLAnomaliesResponse,
+    MLChangesResponse,
+)
 from app.core.deps import get_current_active_user, require_roles
 from app.models.user import Role
 from app.config import get_settings
+from app.services.ml_export import (
+    ARROW_STREAM_MEDIA_TYPE,
+    EXPORT_QUERY_COLUMNS,
+    NDJSON_MEDIA_TYPE,
+    encode_arrow_stream,
+    encode_ndjson,
+    export_dimensions_version,
+    frame_to_compact_columns,
+    iter_export_frames,
+    load_export_dimensions,
+    rows_to_frame,
+)
+from app.services.batching import ScoringAborted, ScoringQueueFull
+from app.services.bulk_scoring import ScoreJobLimit, iter_score_frames, run_score_job
+from app.services.model_registry import ReloadInProgress
+from app.services.scoring_pool import ScoringPoolBusy
+from app.services.score_stream import media_type_of, result_arrow_schema, score_stream
+from app.services.transaction_scores import score_ids_cached, score_rows_cached, with_database_windows
+from app.services.features import (
+    FEATURE_COLUMNS,
+    build_feature_arrays,
+    feature_arrow_schema,
+    feature_frame,
+    feature_vocabularies,
+)
 
 router = APIRouter(prefix="/ml", tags=["ml-export"])
 settings = get_settings()
@@ -36,6 +81,178 @@ class ScoreResultItem(BaseModel):
 class ScoreResponse(BaseModel):
     results: list[ScoreResultItem]
     model_loaded: bool
+    model_version: str | None = None
+
+
+class ModelReloadRequest(BaseModel):
+    """Reload the current registry version (or ML_MODEL_DIR), or a specific version."""
+    version: str | None = Field(None, description="Registry version to load (default: the `current` pointer)")
+    promote: bool = Field(False, description="Also point `current` at version, so watching workers follow")
+    wait: bool = Field(False, description="Block until the model is loaded and swapped in")
+
+
+def _export_query(db: Session):
+    """Joined transaction + item + warehouse query selecting ML export columns."""
+    return (
+        db.query(*EXPORT_QUERY_COLUMNS)
+        .join(Item, InventoryTransaction.item_id == Item.id)
+        .join(Warehouse, InventoryTransaction.warehouse_id == Warehouse.id)
+    )
+
+
+def _export_query_statement(filters: MLExportFilters | None = None):
+    """Export select in (created_at, id) order, for server-side cursor streaming."""
+    stmt = (
+        select(*EXPORT_QUERY_COLUMNS)
+        .join(Item, InventoryTransaction.item_id == Item.id)
+        .join(Warehouse, InventoryTransaction.warehouse_id == Warehouse.id)
+        .order_by(InventoryTransaction.created_at.asc(), InventoryTransaction.id.asc())
+    )
+    return _apply_export_filters(stmt, filters)
+
+
+def get_export_filters(
+    created_from: datetime | None = Query(None, description="Only rows with created_at >= created_from"),
+    created_to: datetime | None = Query(None, description="Only rows with created_at < created_to"),
+    warehouse_id: list[int] = Query([], description="Repeatable: only these warehouses"),
+    item_id: list[int] = Query([], description="Repeatable: only these items"),
+    item_category: list[str] = Query([], description="Repeatable: only these item categories"),
+    transaction_type: list[SchemaTxType] = Query([], description="Repeatable: only these transaction types"),
+    id_from: int | None = Query(None, description="Only rows with id >= id_from (shard bounds from /export/shards)"),
+    id_to: int | None = Query(None, description="Only rows with id < id_to"),
+) -> MLExportFilters:
+    """Dependency: export filters from repeatable query params."""
+    return MLExportFilters(
+        created_from=created_from,
+        created_to=created_to,
+        warehouse_id=warehouse_id,
+        item_id=item_id,
+        item_category=item_category,
+        transaction_type=transaction_type,
+        id_from=id_from,
+        id_to=id_to,
+    )
+
+
+def _apply_export_filters(q, filters: MLExportFilters | None):
+    """Push filters into the WHERE clause of an export Query/Select (Item must already be joined)."""
+    if filters is None:
+        return q
+    if filters.created_from is not None:
+        q = q.filter(InventoryTransaction.created_at >= filters.created_from)
+    if filters.created_to is not None:
+        q = q.filter(InventoryTransaction.created_at < filters.created_to)
+    if filters.warehouse_id:
+        q = q.filter(InventoryTransaction.warehouse_id.in_(filters.warehouse_id))
+    if filters.item_id:
+        q = q.filter(InventoryTransaction.item_id.in_(filters.item_id))
+    if filters.item_category:
+        q = q.filter(Item.category.in_(filters.item_category))
+    if filters.transaction_type:
+        q = q.filter(InventoryTransaction.transaction_type.in_([TransactionType(t.value) for t in filters.transaction_type]))
+    # Id range shards: disjoint, each independently pageable with the same (created_at, id)
+    # cursor, and a primary key range the index can serve
+    if filters.id_from is not None:
+        q = q.filter(InventoryTransaction.id >= filters.id_from)
+    if filters.id_to is not None:
+        q = q.filter(InventoryTransaction.id < filters.id_to)
+    return q
+
+
+def _ml_row(r: Any) -> MLTransactionRow:
+    """Export query row → MLTransactionRow with signed quantity and timestamp."""
+    qty = float(r.quantity)
+    if r.transaction_type == TransactionType.OUT:
+        qty = -qty
+    elif r.transaction_type == TransactionType.ADJUST:
+        # Keep raw; pipeline can treat separately
+        pass
+    ts = r.created_at
+    created_at_ts = ts.timestamp() if ts else 0.0
+    return MLTransactionRow(
+        transaction_id=r.transaction_id,
+        item_id=r.item_id,
+        item_sku=r.item_sku,
+        item_category=r.item_category,
+        warehouse_id=r.warehouse_id,
+        warehouse_code=r.warehouse_code,
+        transaction_type=r.transaction_type.value,
+        quantity=qty,
+        unit_price=float(r.unit_price) if r.unit_price is not None else None,
+        total_amount=float(r.total_amount) if r.total_amount is not None else None,
+        reference_type=r.reference_type,
+        created_at=ts,
+        created_at_ts=created_at_ts,
+    )
+
+
+def _encode_token(payload: Any) -> str:
+    """Opaque URL-safe token (cursor / watermark) wrapping a small JSON payload."""
+    raw = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_token(token: str, detail: str) -> Any:
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _encode_cursor(created_at: datetime, transaction_id: int) -> str:
+    """Opaque keyset cursor for (created_at, id) of the last row on a page."""
+    return _encode_token([created_at.isoformat(), transaction_id])
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, transaction_id = _decode_token(cursor, "Invalid cursor")
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+class _ExportPage(NamedTuple):
+    rows: list[Any]
+    has_more: bool
+    next_cursor: str | None
+    total_count: int | None
+
+
+def _export_page(
+    db: Session,
+    offset: int,
+    limit: int,
+    cursor: str | None,
+    include_total: bool,
+    filters: MLExportFilters,
+) -> _ExportPage:
+    """One page of export query rows in (created_at, id) order (shared by /export and /export/compact)."""
+    max_rows = min(limit, settings.ml_export_max_rows)
+    q = _export_query(db).order_by(InventoryTransaction.created_at.asc(), InventoryTransaction.id.asc())
+    q = _apply_export_filters(q, filters)
+    if cursor is not None:
+        after_created_at, after_id = _decode_cursor(cursor)
+        q = q.filter(tuple_(InventoryTransaction.created_at, InventoryTransaction.id) > (after_created_at, after_id))
+    else:
+        q = q.offset(offset)
+    # Probe one extra row to learn has_more without counting
+    rows_data = q.limit(max_rows + 1).all()
+    has_more = len(rows_data) > max_rows
+    rows_data = rows_data[:max_rows]
+    total_count = None
+    if include_total and filters.is_empty():
+        total_count = get_row_count(db, InventoryTransaction)
+    elif include_total:
+        # Filtered totals can't come from the table counter
+        count_q = db.query(func.count(InventoryTransaction.id)).join(Item, InventoryTransaction.item_id == Item.id)
+        total_count = _apply_export_filters(count_q, filters).scalar() or 0
+
+    next_cursor = None
+    if has_more and rows_data:
+        last = rows_data[-1]
+        next_cursor = _encode_cursor(last.created_at, last.transaction_id)
+    return _ExportPage(rows_data, has_more, next_cursor, total_count)
 
 
 @router.get("/export", response_model=MLExportResponse)
@@ -44,121 +261,452 @@ def export_ml_transactions(
     current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
     offset: int = Query(0, ge=0),
     limit: int = Query(10_000, ge=1, le=100_000),
+    cursor: str | None = Query(None, description="Keyset cursor from a previous page's next_cursor (ignores offset)"),
+    include_total: bool = Query(False, description="Also return total_count (maintained counter, no COUNT(*))"),
+    filters: MLExportFilters = Depends(get_export_filters),
 ):
     """
     Export inventory transactions in ML-ready flat format (denormalized).
     For SageMaker training / feature engineering: item_sku, warehouse_code,
     transaction_type, quantity (signed), timestamps, etc.
+
+    Rows are ordered by (created_at, id). Pass the returned next_cursor as ?cursor=
+    to seek past the previous page on the (created_at, id) index, so every page
+    costs the same regardless of depth; offset paging is kept for compatibility.
+    has_more comes from fetching one row past the page, not from a count.
+    Optional filters (time range, warehouse, item, category, type) are applied in SQL;
+    send the same filters with every page.
     """
-    max_rows = min(limit, settings.ml_export_max_rows)
-    # Join to get item + warehouse attributes
+    page = _export_page(db, offset, limit, cursor, include_total, filters)
+    rows = [_ml_row(r) for r in page.rows]
+    return MLExportResponse(
+        rows=rows,
+        total_count=page.total_count,
+        offset=offset,
+        limit=len(rows),
+        has_more=page.has_more,
+        next_cursor=page.next_cursor,
+    )
+
+
+@router.get("/export/compact", response_model=MLCompactExportResponse)
+def export_ml_transactions_compact(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10_000, ge=1, le=100_000),
+    cursor: str | None = Query(None, description="Keyset cursor from a previous page's next_cursor (ignores offset)"),
+    include_total: bool = Query(False, description="Also return total_count (maintained counter, no COUNT(*))"),
+    dimensions_version: str | None = Query(
+        None, description="Version of the item/warehouse dictionaries the client already holds"
+    ),
+    filters: MLExportFilters = Depends(get_export_filters),
+):
+    """
+    Dictionary-encoded variant of /export (same paging and filters): a columnar fact
+    table of ids, type codes and numerics, plus the item / warehouse / transaction type
+    dictionaries. Dictionaries are only sent when the client's dimensions_version is
+    missing or stale, so a paged pull ships each SKU / warehouse string once.
+    """
+    page = _export_page(db, offset, limit, cursor, include_total, filters)
+    version = export_dimensions_version(db)
+    return MLCompactExportResponse(
+        columns=frame_to_compact_columns(rows_to_frame(page.rows)),
+        dimensions_version=version,
+        dimensions=load_export_dimensions(db, version) if dimensions_version != version else None,
+        total_count=page.total_count,
+        offset=offset,
+        limit=len(page.rows),
+        has_more=page.has_more,
+        next_cursor=page.next_cursor,
+    )
+
+
+@router.get("/export/shards", response_model=MLExportShardsResponse)
+def export_ml_shards(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    num_shards: int = Query(..., ge=1, le=1024),
+):
+    """
+    Split the transaction ids into num_shards contiguous ranges of equal id span, for
+    pulling /export or /export/compact concurrently (pass each range as id_from /
+    id_to, with the same filters and a cursor per shard). Bounds come from MIN/MAX(id)
+    on the primary key; the first and last ranges are open, so rows inserted during
+    the pull still belong to exactly one shard. Fetch the ranges once per pull.
+    """
+    lo, hi = db.query(func.min(InventoryTransaction.id), func.max(InventoryTransaction.id)).one()
+    lo, hi = (lo, hi) if lo is not None else (0, 0)
+    span = hi + 1 - lo
+    bounds = [None] + [lo + span * k // num_shards for k in range(1, num_shards)] + [None]
+    return MLExportShardsResponse(
+        shards=[MLIdRange(id_from=bounds[k], id_to=bounds[k + 1]) for k in range(num_shards)]
+    )
+
+
+@router.get("/export/stream")
+def stream_ml_transactions(
+    request: Request,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    fmt: Literal["ndjson", "arrow"] | None = Query(
+        None,
+        alias="format",
+        description="ndjson (default) or arrow; Accept: application/vnd.apache.arrow.stream also selects Arrow",
+    ),
+    chunk_size: int | None = Query(None, ge=1, le=100_000),
+    filters: MLExportFilters = Depends(get_export_filters),
+):
+    """
+    Stream the ML export (same columns, order and filters as /export) without building
+    per-row models: rows are read with a server-side cursor in chunks and written
+    as NDJSON lines or Arrow IPC record batches as each chunk is ready.
+    """
+    if fmt is None:
+        fmt = "arrow" if ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "") else "ndjson"
+    stmt = _export_query_statement(filters)
+    frames = iter_export_frames(stmt, chunk_size or settings.ml_export_stream_chunk_size)
+    if fmt == "arrow":
+        return StreamingResponse(encode_arrow_stream(frames), media_type=ARROW_STREAM_MEDIA_TYPE)
+    return StreamingResponse(encode_ndjson(frames), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/features", response_model=MLFeaturesResponse)
+def export_ml_features(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10_000, ge=1, le=100_000),
+    cursor: str | None = Query(None, description="Keyset cursor from a previous page's next_cursor (ignores offset)"),
+    include_total: bool = Query(False, description="Also return total_count (maintained counter, no COUNT(*))"),
+    filters: MLExportFilters = Depends(get_export_filters),
+):
+    """
+    Feature matrix computed server-side (same paging and filters as /export): the
+    pipeline's feature columns as float32, built column-wise with numpy from the
+    export query. Label encodings use global vocabularies (returned with the page)
+    so codes agree across pages.
+    """
+    page = _export_page(db, offset, limit, cursor, include_total, filters)
+    frame = rows_to_frame(page.rows)
+    vocabularies = feature_vocabularies(db)
+    X = build_feature_arrays(frame, vocabularies)
+    return MLFeaturesResponse(
+        feature_columns=FEATURE_COLUMNS,
+        transaction_id=frame["transaction_id"].tolist(),
+        features={c: X[:, j].tolist() for j, c in enumerate(FEATURE_COLUMNS)},
+        vocabularies=vocabularies,
+        total_count=page.total_count,
+        offset=offset,
+        limit=len(page.rows),
+        has_more=page.has_more,
+        next_cursor=page.next_cursor,
+    )
+
+
+@router.get("/features/stream")
+def stream_ml_features(
+    request: Request,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    fmt: Literal["ndjson", "arrow"] | None = Query(
+        None,
+        alias="format",
+        description="arrow (default) or ndjson",
+    ),
+    chunk_size: int | None = Query(None, ge=1, le=100_000),
+    filters: MLExportFilters = Depends(get_export_filters),
+):
+    """
+    Stream the server-computed feature matrix (transaction_id + float32 feature columns)
+    in (created_at, id) order, chunk by chunk from a server-side cursor. Training hosts
+    can write it straight to Parquet without pulling raw rows.
+    """
+    if fmt is None:
+        fmt = "ndjson" if NDJSON_MEDIA_TYPE in request.headers.get("accept", "") else "arrow"
+    vocabularies = feature_vocabularies(db)
+    stmt = _export_query_statement(filters)
+    frames = (
+        feature_frame(frame, vocabularies)
+        for frame in iter_export_frames(stmt, chunk_size or settings.ml_export_stream_chunk_size)
+    )
+    if fmt == "arrow":
+        return StreamingResponse(encode_arrow_stream(frames, feature_arrow_schema()), media_type=ARROW_STREAM_MEDIA_TYPE)
+    return StreamingResponse(encode_ndjson(frames), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/anomalies", response_model=MLAnomaliesResponse)
+def list_ml_anomalies(
+    request: Request,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    model_version: str | None = Query(None, description="Defaults to the loaded model's version"),
+    only_anomalies: bool = Query(True, description="Only rows flagged is_anomaly"),
+    min_score: float | None = Query(None, description="Only rows with anomaly_score >= min_score"),
+    limit: int = Query(100, ge=1, le=10_000),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    filters: MLExportFilters = Depends(get_export_filters),
+):
+    """
+    Persisted anomaly scores (transaction_scores), highest score first, joined with the
+    transaction / item / warehouse. Scores are written after each transaction create /
+    update, so this reads an index range instead of re-scoring. Same filters as /export.
+    """
+    if model_version is None:
+        inference: Any = getattr(request.app.state, "ml_inference", None)
+        if not inference:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No ML model loaded; pass model_version explicitly",
+            )
+        model_version = inference.model_version
+
     q = (
         db.query(
-            InventoryTransaction.id.label("transaction_id"),
+            TransactionScore.transaction_id,
+            TransactionScore.anomaly_score,
+            TransactionScore.cluster_id,
+            TransactionScore.is_anomaly,
+            TransactionScore.scored_at,
             InventoryTransaction.item_id,
             Item.sku.label("item_sku"),
-            Item.category.label("item_category"),
             InventoryTransaction.warehouse_id,
             Warehouse.code.label("warehouse_code"),
             InventoryTransaction.transaction_type,
             InventoryTransaction.quantity,
-            InventoryTransaction.unit_price,
-            InventoryTransaction.total_amount,
-            InventoryTransaction.reference_type,
             InventoryTransaction.created_at,
         )
+        .join(InventoryTransaction, TransactionScore.transaction_id == InventoryTransaction.id)
         .join(Item, InventoryTransaction.item_id == Item.id)
         .join(Warehouse, InventoryTransaction.warehouse_id == Warehouse.id)
-        .order_by(InventoryTransaction.created_at.asc())
-    )
-    total_count = db.query(func.count(InventoryTransaction.id)).scalar() or 0
-    rows_query = q.offset(offset).limit(max_rows)
-    rows_data = rows_query.all()
-
-    # Build ML rows with signed quantity and timestamp
-    rows = []
-    for r in rows_data:
-        qty = float(r.quantity)
-        if r.transaction_type == TransactionType.OUT:
-            qty = -qty
-        elif r.transaction_type == TransactionType.ADJUST:
-            # Keep raw; pipeline can treat separately
-            pass
-        ts = r.created_at
-        created_at_ts = ts.timestamp() if ts else 0.0
-        rows.append(
-            MLTransactionRow(
+        .filter(TransactionScore.model_version == model_version)
+        .order_by(TransactionScore.anomaly_score.desc(), TransactionScore.transaction_id.desc())
+    )
+    if only_anomalies:
+        q = q.filter(TransactionScore.is_anomaly.is_(True))
+    if min_score is not None:
+        q = q.filter(TransactionScore.anomaly_score >= min_score)
+    q = _apply_export_filters(q, filters)
+    if cursor is not None:
+        try:
+            after_score, after_id = _decode_token(cursor, "Invalid cursor")
+            after = (float(after_score), int(after_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        q = q.filter(tuple_(TransactionScore.anomaly_score, TransactionScore.transaction_id) < after)
+
+    rows_data = q.limit(limit + 1).all()
+    has_more = len(rows_data) > limit
+    rows_data = rows_data[:limit]
+    next_cursor = None
+    if has_more and rows_data:
+        next_cursor = _encode_token([rows_data[-1].anomaly_score, rows_data[-1].transaction_id])
+    return MLAnomaliesResponse(
+        model_version=model_version,
+        rows=[
+            MLAnomalyRow(
                 transaction_id=r.transaction_id,
+                anomaly_score=r.anomaly_score,
+                cluster_id=r.cluster_id,
+                is_anomaly=r.is_anomaly,
+                scored_at=r.scored_at,
                 item_id=r.item_id,
                 item_sku=r.item_sku,
-                item_category=r.item_category,
                 warehouse_id=r.warehouse_id,
                 warehouse_code=r.warehouse_code,
                 transaction_type=r.transaction_type.value,
-                quantity=qty,
-                unit_price=float(r.unit_price) if r.unit_price is not None else None,
-                total_amount=float(r.total_amount) if r.total_amount is not None else None,
-                reference_type=r.reference_type,
-                created_at=ts,
-                created_at_ts=created_at_ts,
+                quantity=-float(r.quantity) if r.transaction_type == TransactionType.OUT else float(r.quantity),
+                created_at=r.created_at,
             )
+            for r in rows_data
+        ],
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
+
+
+class _Watermark(NamedTuple):
+    """
+    Settled position (after_updated, after_tombstone_id): last (updated_at, id) of
+    changed rows and last tombstone id that every later call can start after. Within
+    one pass (until has_more is false) page_updated / page_tombstone_id also hold the
+    last row / tombstone returned once the pass has gone past unsettled changes, so
+    the next page continues there while the settled position stays behind them.
+    updated_at is kept as the text the token carries (see _timestamp_text).
+    """
+    after_updated: tuple[str, int] | None = None
+    after_tombstone_id: int = 0
+    page_updated: tuple[str, int] | None = None
+    page_tombstone_id: int | None = None
+
+
+def _decode_watermark(since: str | None) -> _Watermark:
+    if not since:
+        return _Watermark()
+
+    def position(value: Any) -> tuple[str, int] | None:
+        if not value:
+            return None
+        datetime.fromisoformat(value[0])
+        return str(value[0]), int(value[1])
+
+    try:
+        data = _decode_token(since, "Invalid watermark")
+        page_tombstone_id = data.get("pd")
+        return _Watermark(
+            position(data.get("u")),
+            int(data.get("d") or 0),
+            position(data.get("pu")),
+            int(page_tombstone_id) if page_tombstone_id is not None else None,
         )
+    except (AttributeError, ValueError, TypeError, IndexError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid watermark")
 
-    return MLExportResponse(
-        rows=rows,
-        total_count=total_count,
-        offset=offset,
-        limit=len(rows),
-        has_more=(offset + len(rows)) < total_count,
+
+def _encode_watermark(watermark: _Watermark) -> str:
+    data: dict[str, Any] = {
+        "u": list(watermark.after_updated) if watermark.after_updated else None,
+        "d": watermark.after_tombstone_id,
+    }
+    if watermark.page_updated is not None:
+        data["pu"] = list(watermark.page_updated)
+    if watermark.page_tombstone_id is not None:
+        data["pd"] = watermark.page_tombstone_id
+    return _encode_token(data)
+
+
+def _updated_at_text(row: Any) -> tuple[str, int]:
+    updated_at = row.updated_at
+    return (updated_at if isinstance(updated_at, str) else updated_at.isoformat()), row.transaction_id
+
+
+def _timestamp_text(db: Session, column: Any) -> Any:
+    """
+    A change timestamp (updated_at / deleted_at) as the watermark carries it. SQLite
+    stores DateTime as text in two shapes (server-side CURRENT_TIMESTAMP without
+    fraction, Python values with .ffffff) and compares it as text, so there the stored
+    text itself is carried and bound back unchanged; re-rendering the parsed datetime
+    would skip rows sharing its second.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(column, String)
+    return column
+
+
+def _updated_at_bound(db: Session, text: str) -> Any:
+    if db.get_bind().dialect.name == "sqlite":
+        return literal(text, String)
+    return literal(datetime.fromisoformat(text), InventoryTransaction.updated_at.type)
+
+
+def _settled_bound(db: Session) -> Any:
+    """
+    Change timestamps at or before this are settled, in _timestamp_text's form. A write
+    is stamped when its transaction starts (Postgres now()) or to the second (SQLite)
+    and only visible once it commits, so a watermark right at the newest change could
+    pass rows that show up later with an earlier stamp; ML_CHANGES_SETTLE_S behind the
+    database clock, only writes running longer than that can.
+    """
+    now = db.execute(select(func.now())).scalar()
+    settled = (now if isinstance(now, datetime) else datetime.fromisoformat(now)) - timedelta(
+        seconds=settings.ml_changes_settle_s
     )
+    if db.get_bind().dialect.name == "sqlite":
+        return settled.strftime("%Y-%m-%d %H:%M:%S")  # CURRENT_TIMESTAMP is UTC text
+    return settled
+
 
+@router.get("/changes", response_model=MLChangesResponse)
+def export_ml_changes(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    since: str | None = Query(None, description="next_watermark from the previous call; omit for a full initial load"),
+    limit: int = Query(10_000, ge=1, le=100_000),
+):
+    """
+    Change feed for incremental pipelines: transactions created or modified after the
+    watermark (by the indexed (updated_at, id)), plus ids deleted since then (tombstones).
+    Call repeatedly with next_watermark until has_more is false. Pages of one pass
+    move on past unsettled changes (see _settled_bound), but the watermark a pass ends
+    with only covers settled ones: newer changes are returned again by the next pass,
+    so consumers apply rows and deletes by transaction_id.
+    """
+    max_rows = min(limit, settings.ml_export_max_rows)
+    watermark = _decode_watermark(since)
+    after_updated, after_tombstone_id = watermark.after_updated, watermark.after_tombstone_id
+    page_updated, page_tombstone_id = watermark.page_updated, watermark.page_tombstone_id
+    settled = _settled_bound(db)
 
-def _export_rows_for_transaction_ids(db: Session, transaction_ids: list[int]) -> list[dict]:
-    """Fetch given transaction IDs and return list of dicts in ML export row format."""
-    if not transaction_ids:
-        return []
     q = (
-        db.query(
-            InventoryTransaction.id.label("transaction_id"),
-            InventoryTransaction.item_id,
-            Item.sku.label("item_sku"),
-            Item.category.label("item_category"),
-            InventoryTransaction.warehouse_id,
-            Warehouse.code.label("warehouse_code"),
-            InventoryTransaction.transaction_type,
-            InventoryTransaction.quantity,
-            InventoryTransaction.unit_price,
-            InventoryTransaction.total_amount,
-            InventoryTransaction.reference_type,
-            InventoryTransaction.created_at,
-        )
+        db.query(*EXPORT_QUERY_COLUMNS, _timestamp_text(db, InventoryTransaction.updated_at).label("updated_at"))
         .join(Item, InventoryTransaction.item_id == Item.id)
         .join(Warehouse, InventoryTransaction.warehouse_id == Warehouse.id)
-        .filter(InventoryTransaction.id.in_(transaction_ids))
-    )
-    rows_data = q.all()
-    out = []
-    for r in rows_data:
-        qty = float(r.quantity)
-        if r.transaction_type == TransactionType.OUT:
-            qty = -qty
-        ts = r.created_at
-        created_at_ts = ts.timestamp() if ts else 0.0
-        out.append({
-            "transaction_id": r.transaction_id,
-            "item_id": r.item_id,
-            "item_sku": r.item_sku,
-            "item_category": r.item_category,
-            "warehouse_id": r.warehouse_id,
-            "warehouse_code": r.warehouse_code,
-            "transaction_type": r.transaction_type.value,
-            "quantity": qty,
-            "unit_price": float(r.unit_price) if r.unit_price is not None else None,
-            "total_amount": float(r.total_amount) if r.total_amount is not None else None,
-            "reference_type": r.reference_type,
-            "created_at_ts": created_at_ts,
-        })
-    return out
+        .order_by(InventoryTransaction.updated_at.asc(), InventoryTransaction.id.asc())
+    )
+    start = page_updated or after_updated
+    if start is not None:
+        q = q.filter(
+            tuple_(InventoryTransaction.updated_at, InventoryTransaction.id)
+            > tuple_(_updated_at_bound(db, start[0]), literal(start[1]))
+        )
+    rows_data = q.limit(max_rows + 1).all()
+    tombstones = (
+        db.query(
+            TransactionTombstone.id,
+            TransactionTombstone.transaction_id,
+            _timestamp_text(db, TransactionTombstone.deleted_at).label("deleted_at"),
+        )
+        .filter(
+            TransactionTombstone.id > (page_tombstone_id if page_tombstone_id is not None else after_tombstone_id)
+        )
+        .order_by(TransactionTombstone.id.asc())
+        .limit(max_rows + 1)
+        .all()
+    )
+    more_rows = len(rows_data) > max_rows
+    more_tombstones = len(tombstones) > max_rows
+    rows_data = rows_data[:max_rows]
+    tombstones = tombstones[:max_rows]
+
+    # The settled position only follows a settled prefix: once a pass has gone past an
+    # unsettled change (page position set), it stays where it is until the next pass
+    if rows_data:
+        settled_rows = 0
+        if page_updated is None:
+            while settled_rows < len(rows_data) and rows_data[settled_rows].updated_at <= settled:
+                settled_rows += 1
+            if settled_rows:
+                after_updated = _updated_at_text(rows_data[settled_rows - 1])
+        if page_updated is not None or settled_rows < len(rows_data):
+            page_updated = _updated_at_text(rows_data[-1])
+    if tombstones:
+        settled_tombstones = 0
+        if page_tombstone_id is None:
+            while settled_tombstones < len(tombstones) and tombstones[settled_tombstones].deleted_at <= settled:
+                settled_tombstones += 1
+            if settled_tombstones:
+                after_tombstone_id = tombstones[settled_tombstones - 1].id
+        if page_tombstone_id is not None or settled_tombstones < len(tombstones):
+            page_tombstone_id = tombstones[-1].id
+    has_more = more_rows or more_tombstones
+    if not has_more:
+        # End of the pass: the next one starts over from the settled position
+        page_updated, page_tombstone_id = None, None
+    return MLChangesResponse(
+        rows=[_ml_row(r) for r in rows_data],
+        deleted_transaction_ids=[t.transaction_id for t in tombstones],
+        next_watermark=_encode_watermark(_Watermark(after_updated, after_tombstone_id, page_updated, page_tombstone_id)),
+        has_more=has_more,
+    )
+
+
+def _require_inference(request: Request) -> Any:
+    inference: Any = getattr(request.app.state, "ml_inference", None)
+    if not inference:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ML model not loaded. Set ML_MODEL_DIR to the trained model directory.",
+        )
+    return inference
 
 
 @router.post("/score", response_model=ScoreResponse)
@@ -172,27 +720,238 @@ def score_transactions(
     Run anomaly detection on transactions. Requires ML model loaded (set ML_MODEL_DIR).
     Provide either transaction_ids (fetch from DB) or transactions (inline ML-export format).
     """
-    inference: Any = getattr(request.app.state, "ml_inference", None)
-    if not inference:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="ML model not loaded. Set ML_MODEL_DIR to the trained model directory.",
-        )
+    inference = _require_inference(request)
     if body.transaction_ids is not None and body.transactions is not None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide only transaction_ids or transactions")
     if body.transaction_ids is None and body.transactions is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide transaction_ids or transactions")
 
-    if body.transaction_ids is not None:
-        rows = _export_rows_for_transaction_ids(db, body.transaction_ids)
-    else:
-        rows = body.transactions or []
-
-    if not rows:
-        return ScoreResponse(results=[], model_loaded=True)
-
-    results = inference.score_transactions(rows)
+    try:
+        if body.transaction_ids is not None:
+            results = score_ids_cached(inference, request.app.state, db, body.transaction_ids)
+        else:
+            rows = with_database_windows(db, inference, body.transactions or [])
+            results = score_rows_cached(inference, request.app.state, rows)
+    except ScoringQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Scoring queue is full, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    except ScoringAborted as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Scoring request was not completed ({e}), retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    except ScoringPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many large scoring requests in progress, retry shortly",
+            headers={"Retry-After": str(settings.ml_process_pool_retry_after_s)},
+        )
     return ScoreResponse(
         results=[ScoreResultItem(**r) for r in results],
         model_loaded=True,
+        model_version=inference.model_version,
     )
+
+
+class _RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body consumes request.stream(). The stock response also
+    calls receive() to watch for disconnects on ASGI < 2.4, which would swallow
+    request body messages; here a disconnect surfaces from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+@router.post("/score/stream")
+async def score_transactions_stream(
+    request: Request,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    fmt: Literal["ndjson", "arrow"] | None = Query(
+        None,
+        alias="format",
+        description="Response format: ndjson (default) or arrow; Accept: application/vnd.apache.arrow.stream also selects Arrow",
+    ),
+    chunk_size: int | None = Query(None, ge=1, le=100_000, description="Rows scored per chunk"),
+):
+    """
+    Score a large inline batch without buffering it: the body is NDJSON (one ML-export
+    row per line) or an Arrow IPC stream, per Content-Type. Rows are read as they
+    arrive, scored chunk_size at a time and {transaction_id, anomaly_score, cluster_id,
+    is_anomaly} streamed back per chunk, so memory is bounded by the chunk size.
+    """
+    inference = _require_inference(request)
+    input_media_type = media_type_of(request.headers.get("content-type", ""))
+    if input_media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be {NDJSON_MEDIA_TYPE} or {ARROW_STREAM_MEDIA_TYPE}",
+        )
+    if fmt is None:
+        fmt = "arrow" if ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "") else "ndjson"
+    output_media_type = ARROW_STREAM_MEDIA_TYPE if fmt == "arrow" else NDJSON_MEDIA_TYPE
+    body = score_stream(
+        inference,
+        request.stream(),
+        input_media_type,
+        output_media_type,
+        chunk_size or settings.ml_export_stream_chunk_size,
+    )
+    return _RequestStreamingResponse(
+        body, media_type=output_media_type, headers={"X-Model-Version": inference.model_version}
+    )
+
+
+@router.get("/score/query")
+def score_query_stream(
+    request: Request,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER, Role.VIEWER))],
+    fmt: Literal["ndjson", "arrow"] | None = Query(
+        None,
+        alias="format",
+        description="ndjson (default) or arrow; Accept: application/vnd.apache.arrow.stream also selects Arrow",
+    ),
+    chunk_size: int | None = Query(None, ge=1, le=100_000, description="Rows read and scored per chunk"),
+    filters: MLExportFilters = Depends(get_export_filters),
+):
+    """
+    Score every transaction matching the export filters without shipping ids: rows
+    are read with a server-side cursor in chunks (same order as /export/stream),
+    scored and {transaction_id, anomaly_score, cluster_id, is_anomaly} streamed back
+    per chunk. Use POST /score/query to store the scores instead.
+    """
+    inference = _require_inference(request)
+    if fmt is None:
+        fmt = "arrow" if ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "") else "ndjson"
+    stmt = _export_query_statement(filters)
+    frames = iter_score_frames(inference, stmt, chunk_size or settings.ml_export_stream_chunk_size)
+    headers = {"X-Model-Version": inference.model_version}
+    if fmt == "arrow":
+        return StreamingResponse(
+            encode_arrow_stream(frames, result_arrow_schema()), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers
+        )
+    return StreamingResponse(encode_ndjson(frames), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+@router.post("/score/query", status_code=status.HTTP_202_ACCEPTED)
+def score_query_job(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
+    chunk_size: int | None = Query(None, ge=1, le=100_000, description="Rows scored and committed per chunk"),
+    filters: MLExportFilters = Depends(get_export_filters),
+):
+    """
+    Start a background job that scores every transaction matching the export filters
+    with the current model and writes the results to the stored scores (see
+    /anomalies). Poll GET /score/query/jobs/{job_id} for progress.
+    """
+    inference = _require_inference(request)
+    try:
+        job = request.app.state.ml_score_jobs.create(
+            inference.model_version,
+            filters.model_dump(mode="json", exclude_defaults=True),
+            chunk_size or settings.ml_export_stream_chunk_size,
+        )
+    except ScoreJobLimit:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many bulk scoring jobs in progress, retry later",
+        )
+    background_tasks.add_task(run_score_job, job, inference, _export_query_statement(filters))
+    return job.to_dict()
+
+
+@router.get("/score/query/jobs")
+def list_score_query_jobs(
+    request: Request,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
+):
+    """Bulk scoring jobs of this API process, newest first."""
+    return [job.to_dict() for job in request.app.state.ml_score_jobs.list()]
+
+
+def _get_score_job(request: Request, job_id: str):
+    job = request.app.state.ml_score_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Score job not found")
+    return job
+
+
+@router.get("/score/query/jobs/{job_id}")
+def get_score_query_job(
+    request: Request,
+    job_id: str,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
+):
+    """Job status and progress: total_rows (once counted), scored_rows, anomalies, rows_per_s."""
+    return _get_score_job(request, job_id).to_dict()
+
+
+@router.delete("/score/query/jobs/{job_id}")
+def cancel_score_query_job(
+    request: Request,
+    job_id: str,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
+):
+    """Ask a job to stop after its current chunk; chunks already stored are kept."""
+    job = _get_score_job(request, job_id)
+    job.cancel_requested.set()
+    return job.to_dict()
+
+
+@router.get("/score/stats")
+def score_stats(
+    request: Request,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
+):
+    """Micro-batching and process-pool settings with latency / size histograms, plus score cache counters."""
+    batcher = getattr(request.app.state, "ml_batcher", None)
+    pool = getattr(request.app.state, "ml_pool", None)
+    inference: Any = getattr(request.app.state, "ml_inference", None)
+    return {
+        "batching": {"enabled": True, **batcher.stats()} if batcher is not None else {"enabled": False},
+        "process_pool": {"enabled": True, **pool.stats()} if pool is not None else {"enabled": False},
+        "cache": inference.score_cache.stats() if inference else None,
+    }
+
+
+@router.get("/model")
+def model_status(
+    request: Request,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN, Role.MANAGER))],
+):
+    """Loaded model version, registry versions and `current` pointer, reload state."""
+    return request.app.state.ml_models.status()
+
+
+@router.post("/model/reload")
+def reload_model(
+    request: Request,
+    body: ModelReloadRequest,
+    current_user: Annotated[User, Depends(require_roles(Role.ADMIN))],
+):
+    """
+    Load a model in the background, warm it with a dummy batch and swap it in.
+    Requests already running finish on the previous model. 202 unless wait=true.
+    """
+    manager = request.app.state.ml_models
+    try:
+        if body.wait:
+            manager.load(body.version, body.promote)
+        else:
+            manager.reload_async(body.version, body.promote)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ReloadInProgress as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Model load failed: {e}")
+    if body.wait:
+        return manager.status()
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=jsonable_encoder(manager.status()))
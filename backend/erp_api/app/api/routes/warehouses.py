@@ -1,7 +1,7 @@
 """Warehouses CRUD."""
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -10,6 +10,7 @@ from app.models.warehouse import Warehouse
 from app.schemas.warehouse import WarehouseCreate, WarehouseUpdate, WarehouseResponse
 from app.core.deps import get_current_active_user, require_roles
 from app.models.user import Role
+from app.services.score_cache import invalidate_scores
 
 router = APIRouter(prefix="/warehouses", tags=["warehouses"])
 
@@ -76,6 +77,7 @@ def update_warehouse(
 @router.delete("/{warehouse_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_warehouse(
     warehouse_id: int,
+    request: Request,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(require_roles(Role.ADMIN))],
 ):
@@ -84,4 +86,5 @@ def delete_warehouse(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Warehouse not found")
     db.delete(wh)
     db.commit()
+    invalidate_scores(request.app.state)  # transactions cascade
     return None
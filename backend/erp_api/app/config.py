@@ -33,9 +33,27 @@ class Settings(BaseSettings):
 
     # ML export
     ml_export_max_rows: int = 1_000_000
+    ml_export_stream_chunk_size: int = 10_000  # rows per server-side cursor fetch / Arrow batch
+    ml_changes_settle_s: float = 60.0  # /ml/changes watermarks stay this far behind the newest change
 
     # ML inference (optional: path to trained model dir from ml_pipeline)
     ml_model_dir: Optional[str] = None
+    ml_model_registry: Optional[str] = None  # dir of versioned models + `current` pointer; overrides ml_model_dir
+    ml_model_watch_interval_s: float = 0.0  # poll the pointer / config.json and hot-reload; 0 disables
+    ml_scoring_float32: bool = False  # fused scorer in float32 (scores within ~1e-4 relative)
+    # Micro-batching for /ml/score: coalesce concurrent requests into one kernel call
+    ml_batching_enabled: bool = True
+    ml_batch_window_ms: float = 2.0  # max wait for more requests after the first
+    ml_batch_max_rows: int = 2048  # flush at this many rows; larger requests bypass the queue
+    ml_batch_queue_depth: int = 256  # pending requests before /ml/score answers 503
+    ml_batch_wait_timeout_s: float = 30.0  # a queued request not scored by then fails with 503
+    # Process pool for large /ml/score requests (keeps the API process responsive); 0 workers disables
+    ml_process_pool_workers: int = 0
+    ml_process_pool_min_rows: int = 20_000  # requests with at least this many rows go to the pool
+    ml_process_pool_max_jobs: Optional[int] = None  # concurrent pool jobs before 429 (default: workers)
+    ml_process_pool_retry_after_s: int = 2
+    ml_score_cache_size: int = 100_000  # LRU entries of (transaction_id, model_version) → score; 0 disables
+    ml_score_jobs_max_active: int = 2  # queued/running /ml/score/query jobs before 429
 
 
 @lru_cache
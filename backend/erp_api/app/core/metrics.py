@@ -0,0 +1,39 @@
+"""In-process metrics: fixed-bucket histograms for tuning (no external exporter)."""
+import bisect
+import threading
+from typing import Sequence
+
+# Upper bounds; the last bucket is +Inf
+LATENCY_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+class Histogram:
+    """Thread-safe histogram with fixed upper-bound buckets."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """{"buckets": [{"le": bound, "count": n}, ...], "count", "sum", "mean"} (counts per bucket, not cumulative)."""
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+        bounds = [*self.buckets, "+Inf"]
+        return {
+            "buckets": [{"le": b, "count": c} for b, c in zip(bounds, counts)],
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else None,
+        }
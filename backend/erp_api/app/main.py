@@ -1,4 +1,5 @@
 """ML-Enabled ERP Inventory Intelligence API - FastAPI application."""
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -6,20 +7,57 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
 from app.database import Base, engine
+from app.models.row_count import seed_row_counts
 from app.api.routes import auth, items, warehouses, inventory_transactions, ml_export
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: ensure tables exist (for dev; use Alembic in production)
     Base.metadata.create_all(bind=engine)
-    # Optional: load ML inference model if ML_MODEL_DIR is set
-    from app.services.inference import load_inference_service
-    app.state.ml_inference = load_inference_service(settings.ml_model_dir)
+    seed_row_counts(engine)
+    # Optional: load ML inference model from ML_MODEL_REGISTRY / ML_MODEL_DIR
+    from app.services.batching import MicroBatchScorer
+    from app.services.bulk_scoring import ScoreJobRegistry
+    from app.services.model_registry import ModelManager
+    from app.services.scoring_pool import ProcessPoolScorer
+    app.state.ml_inference = None
+    app.state.ml_models = ModelManager(app.state, settings.ml_model_registry, settings.ml_model_dir)
+    if app.state.ml_models.configured:
+        try:
+            app.state.ml_models.load()
+        except FileNotFoundError as e:
+            logger.warning("ML model not loaded: %s", e)
+    app.state.ml_models.start_watcher(settings.ml_model_watch_interval_s)
+    app.state.ml_batcher = (
+        MicroBatchScorer(
+            settings.ml_batch_window_ms,
+            settings.ml_batch_max_rows,
+            settings.ml_batch_queue_depth,
+            settings.ml_batch_wait_timeout_s,
+        )
+        if settings.ml_batching_enabled else None
+    )
+    app.state.ml_pool = (
+        ProcessPoolScorer(
+            settings.ml_process_pool_workers,
+            settings.ml_process_pool_min_rows,
+            settings.ml_process_pool_max_jobs or settings.ml_process_pool_workers,
+            app.state.ml_inference,
+        )
+        if settings.ml_process_pool_workers > 0 else None
+    )
+    app.state.ml_score_jobs = ScoreJobRegistry(settings.ml_score_jobs_max_active)
     yield
     # Shutdown
+    app.state.ml_models.close()
+    if app.state.ml_pool is not None:
+        app.state.ml_pool.close()
+    if app.state.ml_batcher is not None:
+        app.state.ml_batcher.close()
     app.state.ml_inference = None
 
 
@@ -3,6 +3,9 @@ from app.models.user import User, Role
 from app.models.item import Item
 from app.models.warehouse import Warehouse
 from app.models.inventory_transaction import InventoryTransaction, TransactionType
+from app.models.row_count import TableRowCount, get_row_count, seed_row_counts
+from app.models.transaction_tombstone import TransactionTombstone
+from app.models.transaction_score import TransactionScore
 
 __all__ = [
     "User",
@@ -11,4 +14,9 @@ __all__ = [
     "Warehouse",
     "InventoryTransaction",
     "TransactionType",
+    "TableRowCount",
+    "TransactionTombstone",
+    "TransactionScore",
+    "get_row_count",
+    "seed_row_counts",
 ]
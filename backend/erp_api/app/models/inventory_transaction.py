@@ -4,10 +4,13 @@ from datetime import datetime
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Numeric, String, func
+from sqlalchemy import DateTime, ForeignKey, Index, Numeric, String, delete, event, func, insert
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
+from app.models.row_count import track_row_count
+from app.models.transaction_score import TransactionScore
+from app.models.transaction_tombstone import TransactionTombstone
 
 if TYPE_CHECKING:
     from app.models.user import User
@@ -23,6 +26,7 @@ class TransactionType(str, enum.Enum):
     TRANSFER = "transfer"  # Move between warehouses
 
 
+@track_row_count
 class InventoryTransaction(Base):
     """
     Each row is one inventory event. Primary data source for ML pipeline:
@@ -30,6 +34,17 @@ class InventoryTransaction(Base):
     - Clustering (item/warehouse/type patterns)
     """
     __tablename__ = "inventory_transactions"
+    __table_args__ = (
+        # Keyset pagination for /ml/export: ORDER BY (created_at, id) + seek predicate
+        Index("ix_inventory_transactions_created_at_id", "created_at", "id"),
+        # Change feed for /ml/changes: rows modified after an (updated_at, id) watermark
+        Index("ix_inventory_transactions_updated_at_id", "updated_at", "id"),
+        # Filtered ML export (per-warehouse / per-item time ranges) in export order
+        Index("ix_inventory_transactions_warehouse_created_at_id", "warehouse_id", "created_at", "id"),
+        Index("ix_inventory_transactions_item_created_at_id", "item_id", "created_at", "id"),
+        # Window features: one pair's rows in a time range (transaction_scores.with_database_windows)
+        Index("ix_inventory_transactions_item_warehouse_created_at", "item_id", "warehouse_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="RESTRICT"), index=True, nullable=False)
@@ -43,6 +58,10 @@ class InventoryTransaction(Base):
     notes: Mapped[str | None] = mapped_column(String(512), nullable=True)
     created_by: Mapped[int | None] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Also stamped by inserts from here: a column added to an existing SQLite table has no default
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now()
+    )
 
     item: Mapped["Item"] = relationship("Item", back_populates="transactions")
     warehouse: Mapped["Warehouse"] = relationship("Warehouse", back_populates="transactions")
@@ -50,3 +69,10 @@ class InventoryTransaction(Base):
 
     def __repr__(self) -> str:
         return f"<InventoryTransaction(id={self.id}, item_id={self.item_id}, type={self.transaction_type}, qty={self.quantity})>"
+
+
+@event.listens_for(InventoryTransaction, "after_delete")
+def _record_tombstone(mapper, connection, target: InventoryTransaction) -> None:
+    connection.execute(insert(TransactionTombstone).values(transaction_id=target.id))
+    # SQLite doesn't enforce the FK cascade; drop persisted scores explicitly
+    connection.execute(delete(TransactionScore).where(TransactionScore.transaction_id == target.id))
@@ -0,0 +1,95 @@
+"""Maintained per-table row counts, so list/export endpoints can report totals without COUNT(*)."""
+from collections import Counter
+
+from sqlalchemy import BigInteger, String, event, func, insert, literal, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from app.database import Base, SessionLocal
+
+
+class TableRowCount(Base):
+    """
+    One row per tracked table. Kept current by an after_flush hook that applies the
+    net number of ORM inserts/deletes in the same transaction (covers route CRUD,
+    cascades from Item/Warehouse deletes and the seed script).
+    """
+    __tablename__ = "table_row_counts"
+
+    table_name: Mapped[str] = mapped_column(String(128), primary_key=True)
+    row_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<TableRowCount(table_name={self.table_name}, row_count={self.row_count})>"
+
+
+_tracked_tables: set[str] = set()
+
+
+def track_row_count(model: type) -> type:
+    """Class decorator: maintain TableRowCount for this model's table."""
+    _tracked_tables.add(model.__tablename__)
+    return model
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _apply_row_count_deltas(session: Session, flush_context) -> None:
+    # new/deleted still hold the pre-flush state here
+    deltas: Counter[str] = Counter()
+    for obj in session.new:
+        table = getattr(obj, "__tablename__", None)
+        if table in _tracked_tables:
+            deltas[table] += 1
+    for obj in session.deleted:
+        table = getattr(obj, "__tablename__", None)
+        if table in _tracked_tables:
+            deltas[table] -= 1
+    conn = session.connection()
+    for table, delta in deltas.items():
+        if delta:
+            conn.execute(
+                update(TableRowCount)
+                .where(TableRowCount.table_name == table)
+                .values(row_count=TableRowCount.row_count + delta)
+            )
+
+
+def seed_row_counts(engine: Engine) -> None:
+    """
+    Startup step (after create_all): create the missing counters of tracked tables
+    with one COUNT(*) each. Writers are held off while a table is counted, so an
+    insert/delete is either in the count or applied to the counter, never both or
+    neither: on Postgres under a SHARE lock (which also waits for open write
+    transactions), elsewhere as a single INSERT ... SELECT statement.
+    """
+    for table in sorted(_tracked_tables):
+        try:
+            with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    conn.execute(text(f'LOCK TABLE "{table}" IN SHARE MODE'))
+                exists = conn.execute(
+                    select(TableRowCount.table_name).where(TableRowCount.table_name == table)
+                ).first()
+                if exists is None:
+                    conn.execute(
+                        insert(TableRowCount).from_select(
+                            ["table_name", "row_count"],
+                            select(literal(table), func.count()).select_from(Base.metadata.tables[table]),
+                        )
+                    )
+        except IntegrityError:
+            # Another worker seeded it first
+            pass
+
+
+def get_row_count(db: Session, model: type) -> int:
+    """
+    Maintained row count for a tracked model: a primary-key lookup of the counter
+    seeded at startup (seed_row_counts). Without a counter (tables created outside the
+    app) this falls back to COUNT(*) rather than seeding it off a racing read.
+    """
+    row = db.get(TableRowCount, model.__tablename__)
+    if row is None:
+        return db.execute(select(func.count()).select_from(model)).scalar() or 0
+    return row.row_count
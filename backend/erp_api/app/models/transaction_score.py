@@ -0,0 +1,35 @@
+"""Persisted anomaly scores - one row per (transaction, model version)."""
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, ForeignKey, Index, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class TransactionScore(Base):
+    """
+    Written after transaction create/update (and by bulk scoring); read by /ml/anomalies,
+    so listing top anomalies is an index range scan instead of a re-score.
+    """
+    __tablename__ = "transaction_scores"
+    __table_args__ = (
+        # Top anomalies for a model: ORDER BY (anomaly_score, transaction_id) DESC + seek predicate
+        Index("ix_transaction_scores_version_score_tx", "model_version", "anomaly_score", "transaction_id"),
+        Index("ix_transaction_scores_version_flag_score_tx", "model_version", "is_anomaly", "anomaly_score", "transaction_id"),
+    )
+
+    transaction_id: Mapped[int] = mapped_column(
+        ForeignKey("inventory_transactions.id", ondelete="CASCADE"), primary_key=True
+    )
+    model_version: Mapped[str] = mapped_column(String(64), primary_key=True)
+    anomaly_score: Mapped[float] = mapped_column(Float, nullable=False)
+    cluster_id: Mapped[int] = mapped_column(nullable=False)
+    is_anomaly: Mapped[bool] = mapped_column(nullable=False)
+    scored_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return (
+            f"<TransactionScore(transaction_id={self.transaction_id}, model_version={self.model_version}, "
+            f"anomaly_score={self.anomaly_score})>"
+        )
@@ -0,0 +1,19 @@
+"""Tombstones for deleted inventory transactions - lets the ML change feed report deletes."""
+from datetime import datetime
+
+from sqlalchemy import DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class TransactionTombstone(Base):
+    """One row per deleted InventoryTransaction (written by an after_delete hook, so cascades count too)."""
+    __tablename__ = "inventory_transaction_tombstones"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    transaction_id: Mapped[int] = mapped_column(index=True, nullable=False)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<TransactionTombstone(transaction_id={self.transaction_id}, deleted_at={self.deleted_at})>"
@@ -8,7 +8,17 @@ from app.schemas.inventory_transaction import (
     InventoryTransactionResponse,
     TransactionType as TransactionTypeSchema,
 )
-from app.schemas.ml_export import MLTransactionRow, MLExportResponse
+from app.schemas.ml_export import (
+    MLTransactionRow,
+    MLExportFilters,
+    MLExportResponse,
+    MLExportDimensions,
+    MLCompactExportResponse,
+    MLFeaturesResponse,
+    MLAnomalyRow,
+    MLAnomaliesResponse,
+    MLChangesResponse,
+)
 
 __all__ = [
     "Token",
@@ -27,5 +37,12 @@ __all__ = [
     "InventoryTransactionResponse",
     "TransactionTypeSchema",
     "MLTransactionRow",
+    "MLExportFilters",
     "MLExportResponse",
+    "MLExportDimensions",
+    "MLCompactExportResponse",
+    "MLFeaturesResponse",
+    "MLAnomalyRow",
+    "MLAnomaliesResponse",
+    "MLChangesResponse",
 ]
@@ -44,5 +44,6 @@ class InventoryTransactionResponse(BaseModel):
     notes: Optional[str] = None
     created_by: Optional[int] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
@@ -1,10 +1,12 @@
 """ML-ready export schemas - flat rows for feature engineering pipeline."""
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import BaseModel, Field
 
+from app.schemas.inventory_transaction import TransactionType
+
 
 class MLTransactionRow(BaseModel):
     """One row per transaction, denormalized for ML (SageMaker training / inference)."""
@@ -25,10 +27,128 @@ class MLTransactionRow(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class MLExportFilters(BaseModel):
+    """Filters pushed into the export WHERE clause (all optional; list filters match any value)."""
+    created_from: Optional[datetime] = Field(None, description="created_at >= created_from")
+    created_to: Optional[datetime] = Field(None, description="created_at < created_to")
+    warehouse_id: list[int] = Field(default_factory=list)
+    item_id: list[int] = Field(default_factory=list)
+    item_category: list[str] = Field(default_factory=list)
+    transaction_type: list[TransactionType] = Field(default_factory=list)
+    id_from: Optional[int] = Field(None, description="id >= id_from (a shard from /ml/export/shards)")
+    id_to: Optional[int] = Field(None, description="id < id_to")
+
+    def is_empty(self) -> bool:
+        return not (
+            self.created_from or self.created_to or self.warehouse_id
+            or self.item_id or self.item_category or self.transaction_type
+            or self.id_from is not None or self.id_to is not None
+        )
+
+
+class MLIdRange(BaseModel):
+    """Half-open transaction id range [id_from, id_to); None is unbounded."""
+    id_from: Optional[int] = None
+    id_to: Optional[int] = None
+
+
+class MLExportShardsResponse(BaseModel):
+    """Response for /api/v1/ml/export/shards - contiguous id ranges covering every transaction."""
+    shards: list[MLIdRange]
+
+
 class MLExportResponse(BaseModel):
     """Response for /api/v1/ml/export - paginated ML-ready transaction data."""
     rows: list[MLTransactionRow]
-    total_count: int
+    total_count: Optional[int] = Field(None, description="Only set when requested with include_total=true")
+    offset: int
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Opaque keyset cursor; pass as ?cursor= to fetch the next page (null on the last page)",
+    )
+
+
+class MLItemDimension(BaseModel):
+    id: int
+    sku: str
+    category: Optional[str] = None
+
+
+class MLWarehouseDimension(BaseModel):
+    id: int
+    code: str
+
+
+class MLExportDimensions(BaseModel):
+    """Dimension dictionaries for the compact export: join keys → strings."""
+    version: str
+    items: list[MLItemDimension]
+    warehouses: list[MLWarehouseDimension]
+    transaction_types: list[str] = Field(..., description="transaction_type code → value")
+
+
+class MLCompactExportResponse(BaseModel):
+    """Response for /api/v1/ml/export/compact - columnar fact table + dimensions when changed."""
+    columns: dict[str, list[Any]] = Field(
+        ...,
+        description="transaction_id, item_id, warehouse_id, transaction_type (code), quantity (signed), "
+        "unit_price, total_amount, reference_type, created_at_ts",
+    )
+    dimensions_version: str
+    dimensions: Optional[MLExportDimensions] = Field(
+        None, description="Present when the request's dimensions_version is missing or stale"
+    )
+    total_count: Optional[int] = None
+    offset: int
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+
+class MLFeaturesResponse(BaseModel):
+    """Response for /api/v1/ml/features - server-computed feature matrix, columnar."""
+    feature_columns: list[str] = Field(..., description="Same order as the pipeline's get_feature_columns()")
+    transaction_id: list[int]
+    features: dict[str, list[float]] = Field(..., description="Feature column → float32 values, row-aligned")
+    vocabularies: dict[str, list[str]] = Field(
+        ..., description="Label-encoding vocabularies (code = index) for transaction_type / item_category"
+    )
+    total_count: Optional[int] = None
     offset: int
     limit: int
     has_more: bool
+    next_cursor: Optional[str] = None
+
+
+class MLAnomalyRow(BaseModel):
+    """Stored score joined with the transaction it belongs to."""
+    transaction_id: int
+    anomaly_score: float
+    cluster_id: int
+    is_anomaly: bool
+    scored_at: datetime
+    item_id: int
+    item_sku: str
+    warehouse_id: int
+    warehouse_code: str
+    transaction_type: str
+    quantity: float = Field(..., description="Signed: +in, -out")
+    created_at: datetime
+
+
+class MLAnomaliesResponse(BaseModel):
+    """Response for /api/v1/ml/anomalies - persisted scores, highest first."""
+    model_version: str
+    rows: list[MLAnomalyRow]
+    has_more: bool
+    next_cursor: Optional[str] = Field(None, description="Opaque keyset cursor; pass as ?cursor= for the next page")
+
+
+class MLChangesResponse(BaseModel):
+    """Response for /api/v1/ml/changes - rows created/modified and ids deleted since a watermark."""
+    rows: list[MLTransactionRow]
+    deleted_transaction_ids: list[int]
+    next_watermark: str = Field(..., description="Opaque watermark; pass as ?since= on the next run")
+    has_more: bool
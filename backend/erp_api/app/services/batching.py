@@ -0,0 +1,159 @@
+"""
+Micro-batching in front of InferenceService: concurrent small /ml/score calls are
+queued, coalesced for up to a short window (or until a row budget is reached) and
+scored with one vectorized kernel call on a single worker thread, then the results
+are handed back to each waiting caller.
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+
+from app.core.metrics import LATENCY_MS_BUCKETS, SIZE_BUCKETS, Histogram
+
+
+class ScoringQueueFull(Exception):
+    """The bounded scoring queue is at capacity; the caller should retry later."""
+
+
+class ScoringAborted(Exception):
+    """A queued request was not scored: the wait timed out or the batcher stopped."""
+
+
+@dataclass
+class _Pending:
+    service: Any
+    X: np.ndarray
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[tuple[np.ndarray, np.ndarray]] = None
+    error: Optional[BaseException] = None
+
+
+class MicroBatchScorer:
+    """
+    Featurization runs in the calling (threadpool) thread; only the scoring kernel
+    is shared. Requests of at least max_batch_rows rows skip the queue. A batch is
+    only ever scored against the service its requests were featurized with. A caller
+    waits at most wait_timeout_s for its batch, then gets ScoringAborted.
+    """
+
+    def __init__(self, window_ms: float, max_batch_rows: int, queue_depth: int, wait_timeout_s: float = 30.0):
+        self.window_ms = window_ms
+        self.max_batch_rows = max_batch_rows
+        self.queue_depth = queue_depth
+        self.wait_timeout_s = wait_timeout_s
+        self._queue: queue.Queue[Optional[_Pending]] = queue.Queue(maxsize=queue_depth)
+        self.latency_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.batch_rows = Histogram(SIZE_BUCKETS)
+        self.batch_requests = Histogram(SIZE_BUCKETS)
+        self._closed = False
+        self._lock = threading.Lock()  # orders enqueueing against close()
+        self._thread = threading.Thread(target=self._run, name="ml-score-batcher", daemon=True)
+        self._thread.start()
+
+    def score_transactions(self, service: Any, rows: list[dict]) -> list[dict]:
+        """Same contract as InferenceService.score_transactions, scored in a shared batch."""
+        if not rows:
+            return []
+        start = time.perf_counter()
+        X = service.featurize(rows)
+        pending = None
+        if len(rows) < self.max_batch_rows:
+            with self._lock:
+                if not self._closed:
+                    pending = _Pending(service, X)
+                    try:
+                        self._queue.put_nowait(pending)
+                    except queue.Full:
+                        raise ScoringQueueFull()
+        if pending is None:
+            scores, labels = service.score_matrix(X)
+        else:
+            if not pending.done.wait(self.wait_timeout_s):
+                raise ScoringAborted(f"Not scored within {self.wait_timeout_s:g}s")
+            if pending.error is not None:
+                raise pending.error
+            scores, labels = pending.result
+        self.latency_ms.observe((time.perf_counter() - start) * 1000.0)
+        return service.format_results(rows, scores, labels)
+
+    def _run(self) -> None:
+        window = self.window_ms / 1000.0
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, n_rows, stop = [first], len(first.X), False
+            deadline = time.perf_counter() + window
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stop = True
+                    break
+                batch.append(pending)
+                n_rows += len(pending.X)
+            self._process(batch, n_rows)
+            if stop:
+                return
+
+    def _process(self, batch: list[_Pending], n_rows: int) -> None:
+        self.batch_rows.observe(n_rows)
+        self.batch_requests.observe(len(batch))
+        groups: dict[int, list[_Pending]] = {}
+        for pending in batch:
+            groups.setdefault(id(pending.service), []).append(pending)
+        for group in groups.values():
+            try:
+                results = group[0].service.score_segments([p.X for p in group])
+                for pending, result in zip(group, results):
+                    pending.result = result
+            except Exception as e:  # surface to every waiting caller
+                for pending in group:
+                    pending.error = e
+            finally:
+                for pending in group:
+                    pending.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_rows": self.max_batch_rows,
+            "queue_depth": self.queue_depth,
+            "queued": self._queue.qsize(),
+            "latency_ms": self.latency_ms.snapshot(),
+            "batch_rows": self.batch_rows.snapshot(),
+            "batch_requests": self.batch_requests.snapshot(),
+        }
+
+    def close(self) -> None:
+        """
+        Stop the worker after it drains what is already queued (up to 5s); requests still
+        queued after that fail with ScoringAborted. Later calls score inline.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self._queue.put(None, timeout=5)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=5)
+        error = ScoringAborted("Scoring batcher stopped")
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if pending is not None:
+                pending.error = error
+                pending.done.set()
@@ -0,0 +1,158 @@
+"""
+Bulk scoring by query for /ml/score/query: the rows matching export filters are
+read from the database in chunks and scored server-side, so clients don't list ids
+only to send them back. Results are either streamed back (iter_score_frames) or
+written to transaction_scores by a background ScoreJob whose progress is polled.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+
+from app.database import SessionLocal
+from app.services.ml_export import iter_export_frames, iter_keyset_frames
+from app.services.transaction_scores import frame_with_database_windows, store_scores
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+
+class ScoreJobLimit(Exception):
+    """Too many bulk scoring jobs are queued or running; the caller should retry later."""
+
+
+def iter_score_frames(inference: Any, stmt: Select, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Score stmt's rows chunk by chunk (server-side cursor) → results frames. Window
+    features come from the whole table, not just the rows stmt selects.
+    """
+    db = SessionLocal()
+    try:
+        for frame in iter_export_frames(stmt, chunk_size):
+            if not frame.empty:
+                yield inference.score_frame(frame_with_database_windows(db, inference, frame))
+    finally:
+        db.close()
+
+
+def count_rows(db: Any, stmt: Select) -> int:
+    return db.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar_one()
+
+
+@dataclass
+class ScoreJob:
+    id: str
+    model_version: str
+    filters: dict
+    chunk_size: int
+    status: str = "queued"
+    total_rows: Optional[int] = None
+    scored_rows: int = 0
+    anomalies: int = 0
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    cancel_requested: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = ((self.finished_at or datetime.now(timezone.utc)) - self.started_at).total_seconds()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "model_version": self.model_version,
+            "filters": self.filters,
+            "chunk_size": self.chunk_size,
+            "total_rows": self.total_rows,
+            "scored_rows": self.scored_rows,
+            "anomalies": self.anomalies,
+            "progress": (self.scored_rows / self.total_rows if self.total_rows else (1.0 if self.finished else 0.0)),
+            "rows_per_s": (self.scored_rows / elapsed if elapsed else None),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class ScoreJobRegistry:
+    """
+    In-memory (per API process) job table. At most max_active jobs are queued or
+    running at once; finished jobs beyond max_jobs are forgotten oldest first.
+    """
+
+    def __init__(self, max_active: int = 2, max_jobs: int = 100):
+        self.max_active = max_active
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, ScoreJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, model_version: str, filters: dict, chunk_size: int) -> ScoreJob:
+        with self._lock:
+            if sum(not j.finished for j in self._jobs.values()) >= self.max_active:
+                raise ScoreJobLimit()
+            job = ScoreJob(uuid.uuid4().hex, model_version, filters, chunk_size)
+            self._jobs[job.id] = job
+            for old in [j for j in self._jobs.values() if j.finished][: max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[old.id]
+            return job
+
+    def get(self, job_id: str) -> Optional[ScoreJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list[ScoreJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+
+def run_score_job(job: ScoreJob, inference: Any, stmt: Select) -> None:
+    """
+    Background task: score stmt's rows with inference (the model the job was created
+    with, even if a reload happens meanwhile) and store them under its version.
+    Each chunk is its own keyset query and committed before the next, so progress is
+    durable and a failure or cancel keeps the chunks already written.
+    """
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc)
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        job.total_rows = count_rows(db, stmt)
+        for frame in iter_keyset_frames(db, stmt, job.chunk_size):
+            if job.cancel_requested.is_set():
+                job.status = "cancelled"
+                break
+            results = inference.score_frame(frame_with_database_windows(db, inference, frame))
+            store_scores(db, job.model_version, results.to_dict("records"))
+            db.commit()
+            job.scored_rows += len(results)
+            job.anomalies += int(results["is_anomaly"].sum())
+        else:
+            job.status = "succeeded"
+        logger.info(
+            "Score job %s %s: %d rows in %.1f s", job.id, job.status, job.scored_rows, time.perf_counter() - started
+        )
+    except Exception as e:
+        db.rollback()
+        job.status = "failed"
+        job.error = f"{type(e).__name__}: {e}"
+        logger.exception("Score job %s failed", job.id)
+    finally:
+        job.finished_at = datetime.now(timezone.utc)
+        db.close()
@@ -0,0 +1,217 @@
+"""
+Vectorized feature matrix over export column arrays (numpy only, no per-row work).
+Column order and encoding match ml_pipeline pipeline.feature_engineering.features
+(FeatureTransformer / feature_spec.json), window features included when the spec
+has window_hours (see window_features; callers read them from the database).
+"""
+import json
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.inventory_transaction import TransactionType
+from app.models.item import Item
+from app.services.window_features import WINDOW_FEATURE_COLUMNS, window_features
+
+# Must match pipeline.feature_engineering.features.get_feature_columns()
+FEATURE_COLUMNS = [
+    "quantity", "abs_quantity", "unit_price", "total_amount",
+    "hour", "day_of_week", "day_of_month",
+    "item_id", "warehouse_id", "transaction_type_enc", "item_category_enc",
+]
+
+FEATURE_SPEC_FILENAME = "feature_spec.json"
+UNKNOWN = "unknown"
+
+
+def feature_vocabularies(db: Session) -> dict[str, list[str]]:
+    """
+    Global sorted vocabularies for the label-encoded columns, so codes are stable
+    across pages/chunks and filters. The pipeline builds its feature spec from these
+    (GET /ml/features) for every API pull, and reads the same lists for database pulls.
+    """
+    categories = db.execute(select(Item.category).distinct()).scalars().all()
+    return {
+        "transaction_type": sorted(t.value for t in TransactionType),
+        "item_category": sorted({c if c is not None else UNKNOWN for c in categories}),
+    }
+
+
+def load_feature_spec(model_dir: str | Path) -> Optional[dict[str, Any]]:
+    """feature_spec.json written by training, or None for models trained before specs existed."""
+    path = Path(model_dir) / FEATURE_SPEC_FILENAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def encode_labels(values: Any, vocab: Sequence[str]) -> np.ndarray:
+    """Map values (None → "unknown") to their index in vocab; unseen values → -1."""
+    values = pd.Series(values, dtype=object).fillna(UNKNOWN).astype(str)
+    return pd.Index(list(vocab)).get_indexer(values).astype(np.float64)
+
+
+def calendar_parts(created_at_ts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(hour, day_of_week Monday=0, day_of_month) in UTC from Unix seconds; NaN stays NaN."""
+    ts = np.asarray(created_at_ts, dtype=np.float64)
+    valid = np.isfinite(ts)
+    seconds = np.floor(np.where(valid, ts, 0.0)).astype("datetime64[s]")
+    days = seconds.astype("datetime64[D]")
+    hour = ((seconds - days).astype(np.int64) // 3600).astype(np.float64)
+    day_of_week = ((days.astype(np.int64) + 3) % 7).astype(np.float64)  # 1970-01-01 was a Thursday
+    day_of_month = ((days - days.astype("datetime64[M]")).astype(np.int64) + 1).astype(np.float64)
+    for part in (hour, day_of_week, day_of_month):
+        part[~valid] = np.nan
+    return hour, day_of_week, day_of_month
+
+
+def _to_float(value: Any) -> float:
+    return np.nan if value is None else float(value)
+
+
+class FeatureTransformer:
+    """
+    Compiled vocabularies: category → code via lookups built once, so featurizing a
+    batch is a few vectorized gathers with codes that don't depend on the batch.
+    Unseen categories encode as -1. Without vocabularies (models trained before
+    feature_spec.json) codes fall back to sorted(unique()) of each batch.
+    With window_hours the window features are appended, taken from the frame / rows
+    (see transaction_scores.with_database_windows); a frame without them is windowed
+    over itself.
+    """
+
+    def __init__(self, vocabularies: Optional[dict[str, list[str]]] = None, window_hours: Optional[float] = None):
+        self.vocabularies = vocabularies
+        self.window_hours = window_hours
+        self.feature_columns = FEATURE_COLUMNS + WINDOW_FEATURE_COLUMNS if window_hours else FEATURE_COLUMNS
+        self._codes = (
+            {source: {v: i for i, v in enumerate(vocab)} for source, vocab in vocabularies.items()}
+            if vocabularies else None
+        )
+
+    @classmethod
+    def from_model_dir(cls, model_dir: str | Path) -> "FeatureTransformer":
+        spec = load_feature_spec(model_dir)
+        return cls(spec.get("vocabularies"), spec.get("window_hours")) if spec else cls()
+
+    def _vocab(self, values: list[str], source: str) -> Sequence[str]:
+        if self.vocabularies is not None:
+            return self.vocabularies[source]
+        return sorted(set(values))
+
+    def transform_frame(self, frame: pd.DataFrame, dtype: Any = np.float64) -> np.ndarray:
+        """Export frame (see services.ml_export.rows_to_frame) → (n, len(feature_columns))."""
+        n = len(frame)
+        if n == 0:
+            return np.empty((0, len(self.feature_columns)), dtype=dtype)
+        labels = {
+            source: frame[source].astype(object).fillna(UNKNOWN).astype(str)
+            for source in ("transaction_type", "item_category")
+        }
+        cols = {
+            "quantity": frame["quantity"].to_numpy(dtype=np.float64),
+            "unit_price": frame["unit_price"].to_numpy(dtype=np.float64),
+            "total_amount": frame["total_amount"].to_numpy(dtype=np.float64),
+            "created_at_ts": frame["created_at_ts"].to_numpy(dtype=np.float64),
+            "item_id": frame["item_id"].to_numpy(dtype=np.float64),
+            "warehouse_id": frame["warehouse_id"].to_numpy(dtype=np.float64),
+            "transaction_type": encode_labels(
+                labels["transaction_type"], self._vocab(labels["transaction_type"].tolist(), "transaction_type")
+            ),
+            "item_category": encode_labels(
+                labels["item_category"], self._vocab(labels["item_category"].tolist(), "item_category")
+            ),
+        }
+        if self.window_hours and all(c in frame.columns for c in WINDOW_FEATURE_COLUMNS):
+            cols.update({c: frame[c].to_numpy(dtype=np.float64) for c in WINDOW_FEATURE_COLUMNS})
+        elif self.window_hours:
+            cols.update(window_features(
+                cols["item_id"], cols["warehouse_id"], cols["created_at_ts"], cols["quantity"],
+                frame["transaction_id"].to_numpy(dtype=np.float64), self.window_hours,
+            ))
+        return self.assemble(cols, dtype)
+
+    def row_columns(self, rows: list[dict]) -> dict[str, np.ndarray]:
+        """
+        ML export-style dicts → float64 input columns (categories already encoded),
+        the columnar form assemble() takes. Cheap to pickle to a worker process.
+        Window features are taken from the rows (NaN when missing).
+        """
+        n = len(rows)
+
+        def column(key: str, default: Any = None) -> np.ndarray:
+            return np.fromiter((_to_float(r.get(key, default)) for r in rows), dtype=np.float64, count=n)
+
+        def codes(source: str) -> np.ndarray:
+            labels = [UNKNOWN if r.get(source) is None else str(r.get(source)) for r in rows]
+            if self._codes is not None:
+                lookup = self._codes[source]
+            else:
+                lookup = {v: i for i, v in enumerate(self._vocab(labels, source))}
+            return np.fromiter((lookup.get(v, -1) for v in labels), dtype=np.float64, count=n)
+
+        cols = {
+            "quantity": column("quantity"),
+            "unit_price": column("unit_price", 0.0),
+            "total_amount": column("total_amount", 0.0),
+            "created_at_ts": column("created_at_ts"),
+            "item_id": column("item_id"),
+            "warehouse_id": column("warehouse_id"),
+            "transaction_type": codes("transaction_type"),
+            "item_category": codes("item_category"),
+        }
+        if self.window_hours:
+            cols.update({c: column(c) for c in WINDOW_FEATURE_COLUMNS})
+        return cols
+
+    def transform_rows(self, rows: list[dict], dtype: Any = np.float64) -> np.ndarray:
+        """ML export-style dicts → (n, len(feature_columns)) without building a DataFrame."""
+        if not rows:
+            return np.empty((0, len(self.feature_columns)), dtype=dtype)
+        return self.assemble(self.row_columns(rows), dtype)
+
+    @staticmethod
+    def assemble(cols: dict[str, np.ndarray], dtype: Any = np.float64) -> np.ndarray:
+        """Input columns (see row_columns) → (n, len(feature_columns)), NaN/inf → 0."""
+        hour, day_of_week, day_of_month = calendar_parts(cols["created_at_ts"])
+        quantity = cols["quantity"]
+        window = WINDOW_FEATURE_COLUMNS if WINDOW_FEATURE_COLUMNS[0] in cols else []
+        X = np.empty((len(quantity), len(FEATURE_COLUMNS) + len(window)), dtype=dtype)
+        X[:, 0] = quantity
+        X[:, 1] = np.abs(quantity)
+        X[:, 2] = cols["unit_price"]
+        X[:, 3] = cols["total_amount"]
+        X[:, 4] = hour
+        X[:, 5] = day_of_week
+        X[:, 6] = day_of_month
+        X[:, 7] = cols["item_id"]
+        X[:, 8] = cols["warehouse_id"]
+        X[:, 9] = cols["transaction_type"]
+        X[:, 10] = cols["item_category"]
+        for j, c in enumerate(window, len(FEATURE_COLUMNS)):
+            X[:, j] = cols[c]
+        return np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0, copy=False)
+
+
+def build_feature_arrays(frame: pd.DataFrame, vocabularies: dict[str, list[str]]) -> np.ndarray:
+    """Export frame → float32 (n, len(FEATURE_COLUMNS)) with the given vocabularies."""
+    return FeatureTransformer(vocabularies).transform_frame(frame, dtype=np.float32)
+
+
+def feature_frame(frame: pd.DataFrame, vocabularies: dict[str, list[str]]) -> pd.DataFrame:
+    """transaction_id + float32 feature columns, in get_feature_columns() order."""
+    X = build_feature_arrays(frame, vocabularies)
+    out = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    out.insert(0, "transaction_id", frame["transaction_id"].to_numpy(dtype=np.int64))
+    return out
+
+
+def feature_arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([("transaction_id", pa.int64())] + [(c, pa.float32()) for c in FEATURE_COLUMNS])
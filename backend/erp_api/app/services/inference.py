@@ -1,84 +1,103 @@
 """
-In-process ML inference: load trained scaler/PCA/KMeans and score transactions.
-Feature building matches ml_pipeline/feature_engineering/features.py.
+In-process ML inference: load trained scaler/PCA/KMeans parameters and score transactions.
+Models with model_params.bin are memory-mapped (no sklearn import); older model dirs
+fall back to the joblib pickles. Feature building matches
+ml_pipeline/feature_engineering/features.py, with the category vocabularies
+persisted by training (feature_spec.json). Window features, for models that have
+them, are read from the database by the callers (see transaction_scores).
 """
+import hashlib
+import json
+import logging
 from pathlib import Path
-from typing import Any, Optional
+from typing import Optional
 
-import joblib
 import numpy as np
 import pandas as pd
 
-# Must match pipeline.feature_engineering.features.get_feature_columns()
-FEATURE_COLUMNS = [
-    "quantity", "abs_quantity", "unit_price", "total_amount",
-    "hour", "day_of_week", "day_of_month",
-    "item_id", "warehouse_id", "transaction_type_enc", "item_category_enc",
-]
-
-
-def _build_features_from_rows(rows: list[dict]) -> np.ndarray:
-    """Build feature matrix from list of ML export-style rows (created_at_ts, quantity, etc.)."""
-    if not rows:
-        return np.zeros((0, len(FEATURE_COLUMNS)))
-    df = pd.DataFrame(rows)
-    ts = df["created_at_ts"].astype(float)
-    dt = pd.to_datetime(ts, unit="s", utc=True)
-    quantity = df["quantity"].astype(float)
-    unit_price = df["unit_price"].fillna(0).astype(float) if "unit_price" in df.columns else pd.Series(0.0, index=df.index)
-    total_amount = df["total_amount"].fillna(0).astype(float) if "total_amount" in df.columns else pd.Series(0.0, index=df.index)
-    tx_type = df["transaction_type"].fillna("unknown").astype(str) if "transaction_type" in df.columns else pd.Series(["unknown"] * len(df))
-    uniq = sorted(tx_type.unique())
-    tx_map = {v: i for i, v in enumerate(uniq)}
-    cat = df["item_category"].fillna("unknown").astype(str) if "item_category" in df.columns else pd.Series(["unknown"] * len(df))
-    cat_uniq = sorted(cat.unique())
-    cat_map = {v: i for i, v in enumerate(cat_uniq)}
-    X = np.column_stack([
-        quantity,
-        np.abs(quantity),
-        unit_price,
-        total_amount,
-        dt.dt.hour.astype(float),
-        dt.dt.dayofweek.astype(float),
-        dt.dt.day.astype(float),
-        df["item_id"].astype(np.int64),
-        df["warehouse_id"].astype(np.int64),
-        tx_type.map(tx_map).astype(float),
-        cat.map(cat_map).astype(float),
-    ])
-    return np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
-
-
-def _score(X: np.ndarray, scaler: Any, pca: Any, kmeans: Any) -> tuple[np.ndarray, np.ndarray]:
-    X_scaled = scaler.transform(X)
-    X_embed = pca.transform(X_scaled)
-    labels = kmeans.predict(X_embed)
-    centroids = kmeans.cluster_centers_
-    X_recon = pca.inverse_transform(X_embed)
-    recon_error = np.mean((X_scaled - X_recon) ** 2, axis=1)
-    dist = np.linalg.norm(X_embed - centroids[labels], axis=1)
-    scale = np.std(dist) + 1e-8
-    anomaly_score = recon_error + 0.5 * (dist / scale)
-    return anomaly_score, labels
+from app.config import get_settings
+from app.services.features import FeatureTransformer
+from app.services.model_artifact import MODEL_PARAMS_FILENAME, load_model_params
+from app.services.score_cache import ScoreCache
+from app.services.scoring import FusedScorer, combine_anomaly_scores, distance_scale_of
+
+logger = logging.getLogger(__name__)
 
 
 class InferenceService:
-    def __init__(self, model_dir: str | Path):
+    def __init__(self, model_dir: str | Path, model_version: Optional[str] = None):
         self.model_dir = Path(model_dir)
-        self.scaler = joblib.load(self.model_dir / "scaler.joblib")
-        self.pca = joblib.load(self.model_dir / "pca.joblib")
-        self.kmeans = joblib.load(self.model_dir / "kmeans.joblib")
-        with open(self.model_dir / "config.json") as f:
-            import json
-            self.config = json.load(f)
+        dtype = np.float32 if get_settings().ml_scoring_float32 else np.float64
+        config_path = self.model_dir / "config.json"
+        params_path = self.model_dir / MODEL_PARAMS_FILENAME
+        if params_path.exists():
+            header, arrays = load_model_params(params_path)
+            self.config = header["config"]
+            config_bytes = (
+                config_path.read_bytes() if config_path.exists() else json.dumps(self.config, sort_keys=True).encode()
+            )
+            self.scorer = FusedScorer.from_model_params(arrays, dtype, distance_scale_of(self.config))
+            spec = header.get("feature_spec")
+            self.transformer = (
+                FeatureTransformer(spec.get("vocabularies"), spec.get("window_hours")) if spec
+                else FeatureTransformer.from_model_dir(self.model_dir)
+            )
+        else:
+            import joblib
+
+            scaler = joblib.load(self.model_dir / "scaler.joblib")
+            pca = joblib.load(self.model_dir / "pca.joblib")
+            kmeans = joblib.load(self.model_dir / "kmeans.joblib")
+            config_bytes = config_path.read_bytes()
+            self.config = json.loads(config_bytes)
+            self.scorer = FusedScorer.from_sklearn(scaler, pca, kmeans, dtype, distance_scale_of(self.config))
+            self.transformer = FeatureTransformer.from_model_dir(self.model_dir)
+        # Key for persisted scores: registry version, else the one from training, else a hash of the config
+        self.model_version = str(
+            model_version or self.config.get("model_version") or hashlib.sha1(config_bytes).hexdigest()[:12]
+        )
+        if self.scorer.distance_scale is None:
+            logger.warning(
+                "Model %s has no persisted distance scale; scores depend on the batch they are scored in. "
+                "Retrain, or backfill with "
+                "`python -m pipeline.training.export_params MODEL_DIR --features FEATURES_PARQUET`",
+                self.model_dir,
+            )
         self.threshold = self.config.get("anomaly_score_threshold")
+        self.score_cache = ScoreCache(get_settings().ml_score_cache_size)
 
-    def score_transactions(self, rows: list[dict]) -> list[dict]:
-        """Rows = ML export format. Returns list of {transaction_id, anomaly_score, cluster_id, is_anomaly}."""
-        if not rows:
-            return []
-        X = _build_features_from_rows(rows)
-        scores, labels = _score(X, self.scaler, self.pca, self.kmeans)
+    @property
+    def window_hours(self) -> Optional[float]:
+        """Trailing window of the model's window features; None when it has none."""
+        return self.transformer.window_hours
+
+    def featurize(self, rows: list[dict]) -> np.ndarray:
+        return self.transformer.transform_rows(rows)
+
+    def score_matrix(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return self.scorer.score(X)
+
+    @property
+    def batch_independent(self) -> bool:
+        """True when a row's score depends only on the row and the model (persisted distance scale)."""
+        return self.scorer.distance_scale is not None
+
+    def score_segments(self, matrices: list[np.ndarray]) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Score several requests' feature matrices with one kernel call; results match
+        scoring each one alone (legacy models without a persisted distance scale take
+        the batch std per request).
+        """
+        bounds = np.cumsum([0] + [len(X) for X in matrices])
+        if self.batch_independent:
+            scores, labels = self.scorer.score(np.concatenate(matrices))
+            return [(scores[s:e], labels[s:e]) for s, e in zip(bounds[:-1], bounds[1:])]
+        recon_error, dist, labels = self.scorer.score_parts(np.concatenate(matrices))
+        return [
+            (combine_anomaly_scores(recon_error[s:e], dist[s:e]), labels[s:e]) for s, e in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def format_results(self, rows: list[dict], scores: np.ndarray, labels: np.ndarray) -> list[dict]:
         ids = [r.get("transaction_id", i) for i, r in enumerate(rows)]
         return [
             {
@@ -90,11 +109,32 @@ class InferenceService:
             for tid, s, l in zip(ids, scores, labels)
         ]
 
+    def results_frame(self, ids: np.ndarray, scores: np.ndarray, labels: np.ndarray) -> pd.DataFrame:
+        """Columnar format_results: transaction_id, anomaly_score, cluster_id, is_anomaly."""
+        return pd.DataFrame({
+            "transaction_id": np.asarray(ids, dtype=np.int64),
+            "anomaly_score": scores,
+            "cluster_id": np.asarray(labels, dtype=np.int64),
+            "is_anomaly": scores > self.threshold if self.threshold else np.zeros(len(scores), dtype=bool),
+        })
+
+    def score_frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Export frame (services.ml_export.rows_to_frame columns) → results_frame."""
+        scores, labels = self.score_matrix(self.transformer.transform_frame(frame, self.scorer.dtype))
+        return self.results_frame(frame["transaction_id"].to_numpy(dtype=np.int64), scores, labels)
+
+    def score_transactions(self, rows: list[dict]) -> list[dict]:
+        """Rows = ML export format. Returns list of {transaction_id, anomaly_score, cluster_id, is_anomaly}."""
+        if not rows:
+            return []
+        scores, labels = self.score_matrix(self.featurize(rows))
+        return self.format_results(rows, scores, labels)
+
 
 def load_inference_service(model_dir: Optional[str | Path]) -> Optional[InferenceService]:
     if not model_dir:
         return None
     path = Path(model_dir)
-    if not (path / "config.json").exists():
+    if not (path / "config.json").exists() and not (path / MODEL_PARAMS_FILENAME).exists():
         return None
     return InferenceService(path)
@@ -0,0 +1,274 @@
+"""
+Columnar ML export: read the denormalized transaction query with a server-side
+cursor in chunks and encode each chunk as NDJSON lines or Arrow IPC record batches,
+or as a dictionary-encoded fact table (ids + numerics) with separate dimensions.
+Row values are converted column-wise (no per-row Pydantic models).
+"""
+import hashlib
+import io
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.database import SessionLocal
+from app.models.inventory_transaction import InventoryTransaction, TransactionType
+from app.models.item import Item
+from app.models.warehouse import Warehouse
+
+# Same columns / order as app.schemas.ml_export.MLTransactionRow
+EXPORT_COLUMNS = [
+    "transaction_id", "item_id", "item_sku", "item_category",
+    "warehouse_id", "warehouse_code", "transaction_type",
+    "quantity", "unit_price", "total_amount", "reference_type",
+    "created_at", "created_at_ts",
+]
+
+# Compact export fact columns; strings live in the dimension dictionaries
+COMPACT_COLUMNS = [
+    "transaction_id", "item_id", "warehouse_id", "transaction_type",
+    "quantity", "unit_price", "total_amount", "reference_type", "created_at_ts",
+]
+TRANSACTION_TYPE_CODES = [t.value for t in TransactionType]
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Joined transaction + item + warehouse columns behind every export / scoring query
+EXPORT_QUERY_COLUMNS = (
+    InventoryTransaction.id.label("transaction_id"),
+    InventoryTransaction.item_id,
+    Item.sku.label("item_sku"),
+    Item.category.label("item_category"),
+    InventoryTransaction.warehouse_id,
+    Warehouse.code.label("warehouse_code"),
+    InventoryTransaction.transaction_type,
+    InventoryTransaction.quantity,
+    InventoryTransaction.unit_price,
+    InventoryTransaction.total_amount,
+    InventoryTransaction.reference_type,
+    InventoryTransaction.created_at,
+)
+
+_TX_TYPE_VALUES = {t: t.value for t in TransactionType}
+_EPOCH = pd.Timestamp(0, tz="UTC")
+
+
+def _float_column(values: tuple) -> np.ndarray:
+    """Decimal/None column → float64 with NaN for missing."""
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def rows_to_frame(rows: list[Any]) -> pd.DataFrame:
+    """
+    Convert one chunk of export query rows (see ml_export._export_query) into
+    an ML export frame: signed quantity, created_at (UTC) and created_at_ts.
+    """
+    if not rows:
+        return pd.DataFrame(columns=EXPORT_COLUMNS)
+    (
+        transaction_id, item_id, item_sku, item_category,
+        warehouse_id, warehouse_code, transaction_type,
+        quantity, unit_price, total_amount, reference_type, created_at,
+    ) = zip(*rows)
+
+    tx_type = np.array([_TX_TYPE_VALUES.get(t, t) for t in transaction_type], dtype=object)
+    qty = _float_column(quantity)
+    qty = np.where(tx_type == TransactionType.OUT.value, -qty, qty)
+
+    created = pd.to_datetime(pd.Series(created_at))
+    created = created.dt.tz_localize("UTC") if created.dt.tz is None else created.dt.tz_convert("UTC")
+
+    return pd.DataFrame({
+        "transaction_id": np.array(transaction_id, dtype=np.int64),
+        "item_id": np.array(item_id, dtype=np.int64),
+        "item_sku": np.array(item_sku, dtype=object),
+        "item_category": np.array(item_category, dtype=object),
+        "warehouse_id": np.array(warehouse_id, dtype=np.int64),
+        "warehouse_code": np.array(warehouse_code, dtype=object),
+        "transaction_type": tx_type,
+        "quantity": qty,
+        "unit_price": _float_column(unit_price),
+        "total_amount": _float_column(total_amount),
+        "reference_type": np.array(reference_type, dtype=object),
+        "created_at": created.to_numpy(),
+        "created_at_ts": ((created - _EPOCH) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64),
+    })
+
+
+def export_rows_for_transaction_ids(db: Session, transaction_ids: list[int]) -> list[dict]:
+    """Fetch given transaction IDs and return list of dicts in ML export row format."""
+    if not transaction_ids:
+        return []
+    rows_data = db.execute(
+        select(*EXPORT_QUERY_COLUMNS)
+        .join(Item, InventoryTransaction.item_id == Item.id)
+        .join(Warehouse, InventoryTransaction.warehouse_id == Warehouse.id)
+        .where(InventoryTransaction.id.in_(transaction_ids))
+    ).all()
+    out = []
+    for r in rows_data:
+        qty = float(r.quantity)
+        if r.transaction_type == TransactionType.OUT:
+            qty = -qty
+        ts = r.created_at
+        created_at_ts = ts.timestamp() if ts else 0.0
+        out.append({
+            "transaction_id": r.transaction_id,
+            "item_id": r.item_id,
+            "item_sku": r.item_sku,
+            "item_category": r.item_category,
+            "warehouse_id": r.warehouse_id,
+            "warehouse_code": r.warehouse_code,
+            "transaction_type": r.transaction_type.value,
+            "quantity": qty,
+            "unit_price": float(r.unit_price) if r.unit_price is not None else None,
+            "total_amount": float(r.total_amount) if r.total_amount is not None else None,
+            "reference_type": r.reference_type,
+            "created_at_ts": created_at_ts,
+        })
+    return out
+
+
+def _json_column(values: pd.Series) -> list:
+    """Column → JSON-ready list (NaN/None → null)."""
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def frame_to_compact_columns(frame: pd.DataFrame) -> dict[str, list]:
+    """Export frame → columnar fact table with transaction_type as an integer code."""
+    out = {c: _json_column(frame[c]) for c in COMPACT_COLUMNS if c != "transaction_type"}
+    out["transaction_type"] = pd.Categorical(frame["transaction_type"], categories=TRANSACTION_TYPE_CODES).codes.tolist()
+    return {c: out[c] for c in COMPACT_COLUMNS}
+
+
+def export_dimensions_version(db: Session) -> str:
+    """Cheap fingerprint of the item/warehouse dictionaries (count, max id, max updated_at)."""
+    parts = []
+    for model in (Item, Warehouse):
+        parts.append(db.execute(select(func.count(model.id), func.max(model.id), func.max(model.updated_at))).one())
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def load_export_dimensions(db: Session, version: str) -> dict:
+    """Item / warehouse / transaction type dictionaries for the compact export."""
+    items = db.execute(select(Item.id, Item.sku, Item.category).order_by(Item.id)).all()
+    warehouses = db.execute(select(Warehouse.id, Warehouse.code).order_by(Warehouse.id)).all()
+    return {
+        "version": version,
+        "items": [{"id": i.id, "sku": i.sku, "category": i.category} for i in items],
+        "warehouses": [{"id": w.id, "code": w.code} for w in warehouses],
+        "transaction_types": TRANSACTION_TYPE_CODES,
+    }
+
+
+def iter_export_frames(stmt: Select, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Execute stmt with a server-side cursor (stream_results / yield_per) and yield
+    one DataFrame per chunk. Opens its own session: StreamingResponse bodies run
+    after request-scoped dependencies have been torn down.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=chunk_size))
+        for part in result.partitions():
+            yield rows_to_frame(part)
+    finally:
+        db.close()
+
+
+def iter_keyset_frames(db: Session, stmt: Select, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield stmt (ordered by created_at, id) one chunk at a time, each chunk a separate
+    keyset query (created_at, id) > last row. Unlike iter_export_frames no cursor stays
+    open between chunks, so the caller can write and commit on db in between.
+    """
+    after = None
+    while True:
+        page = stmt
+        if after is not None:
+            page = page.where(tuple_(InventoryTransaction.created_at, InventoryTransaction.id) > after)
+        rows = db.execute(page.limit(chunk_size)).all()
+        if not rows:
+            return
+        after = (rows[-1].created_at, rows[-1].transaction_id)
+        yield rows_to_frame(rows)
+        if len(rows) < chunk_size:
+            return
+
+
+def ndjson_bytes(frame: pd.DataFrame) -> bytes:
+    """A frame as NDJSON lines; created_at as ISO-8601 UTC."""
+    if frame.empty:
+        return b""
+    text = frame.to_json(orient="records", lines=True, date_format="iso", date_unit="us")
+    return text.encode() if text.endswith("\n") else (text + "\n").encode()
+
+
+def encode_ndjson(frames: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    """One JSON object per line; created_at as ISO-8601 UTC."""
+    for frame in frames:
+        if frame.empty:
+            continue
+        yield ndjson_bytes(frame)
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("transaction_id", pa.int64()),
+        ("item_id", pa.int64()),
+        ("item_sku", pa.string()),
+        ("item_category", pa.string()),
+        ("warehouse_id", pa.int64()),
+        ("warehouse_code", pa.string()),
+        ("transaction_type", pa.string()),
+        ("quantity", pa.float64()),
+        ("unit_price", pa.float64()),
+        ("total_amount", pa.float64()),
+        ("reference_type", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("created_at_ts", pa.float64()),
+    ])
+
+
+class ArrowStreamEncoder:
+    """Incremental Arrow IPC stream writer: write() returns the bytes for each batch (the first also carries the schema)."""
+
+    def __init__(self, schema: Any = None):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.schema = schema or arrow_schema()
+        self._sink = io.BytesIO()
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def write(self, frame: pd.DataFrame) -> bytes:
+        if not frame.empty:
+            self._writer.write_batch(self._pa.RecordBatch.from_pandas(frame, schema=self.schema, preserve_index=False))
+        return self._drain()
+
+    def close(self) -> bytes:
+        """End-of-stream marker (and the schema, if nothing was written)."""
+        self._writer.close()
+        return self._drain()
+
+
+def encode_arrow_stream(frames: Iterator[pd.DataFrame], schema: Any = None) -> Iterator[bytes]:
+    """Arrow IPC stream: schema message, then one record batch per chunk, then EOS."""
+    encoder = ArrowStreamEncoder(schema)
+    for frame in frames:
+        if frame.empty:
+            continue
+        yield encoder.write(frame)
+    yield encoder.close()
@@ -0,0 +1,39 @@
+"""
+Reader for model_params.bin, the single-file numeric model written by ml_pipeline
+training (pipeline.training.model.export_model_params):
+
+    MODEL_PARAMS_MAGIC | uint64 LE header length | JSON header | arrays (64-byte aligned)
+
+The header carries config (including the distance normalization), feature_spec,
+threshold and the array table (dtype, shape, absolute offset). The file is
+memory-mapped read-only and the arrays are views into the map, so loading needs
+neither unpickling nor sklearn. Besides the fitted parameters, version 2 files hold
+FusedScorer's folded weights per dtype, which FusedScorer.from_model_params scores
+from in place: worker processes share one page-cache copy of the model.
+"""
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# Must match pipeline.training.model
+MODEL_PARAMS_FILENAME = "model_params.bin"
+MODEL_PARAMS_MAGIC = b"ERPMDL\x00\x01"
+MODEL_PARAMS_FORMAT_VERSION = 2  # 2 adds the folded scorer weights; 1 (raw arrays only) is still read
+
+
+def load_model_params(path: str | Path) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """(header, arrays) with arrays as read-only views of a memory map of path."""
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buf[:8]) != MODEL_PARAMS_MAGIC:
+        raise ValueError(f"Not a model params file: {path}")
+    header_len = int(buf[8:16].view("<u8")[0])
+    header = json.loads(bytes(buf[16:16 + header_len]))
+    if header.get("format_version") not in (1, MODEL_PARAMS_FORMAT_VERSION):
+        raise ValueError(f"Unsupported model params format_version: {header.get('format_version')}")
+    arrays = {
+        name: np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=buf, offset=spec["offset"])
+        for name, spec in header["arrays"].items()
+    }
+    return header, arrays
@@ -0,0 +1,226 @@
+"""
+Model registry and hot reload. A registry is a directory of versioned model dirs
+(as written by ml_pipeline training with --registry) plus a `current` pointer
+file naming the active version:
+
+    registry/
+      current                 # "20260301T120000Z"
+      20260301T120000Z/       # scaler/pca/kmeans joblibs, config.json, feature_spec.json
+      20260215T090000Z/
+
+ModelManager loads a version off the request path, warms it with a dummy batch and
+then swaps app.state.ml_inference in one assignment. Requests read the attribute
+once, so in-flight requests finish on the model they started with. Without a
+registry, ML_MODEL_DIR is reloaded in place.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from app.services.inference import InferenceService
+
+logger = logging.getLogger(__name__)
+
+CURRENT_POINTER = "current"
+WARMUP_ROWS = 64
+
+
+class ReloadInProgress(RuntimeError):
+    pass
+
+
+def read_current_version(registry: str | Path) -> Optional[str]:
+    """Version named by registry/current (a text file, or a symlink to the version dir)."""
+    pointer = Path(registry) / CURRENT_POINTER
+    if pointer.is_symlink():
+        return Path(os.readlink(pointer)).name
+    if not pointer.is_file():
+        return None
+    return pointer.read_text().strip() or None
+
+
+def write_current_version(registry: str | Path, version: str) -> None:
+    """Point registry/current at version (write + rename, so readers never see a partial file)."""
+    pointer = Path(registry) / CURRENT_POINTER
+    tmp = pointer.with_name(f".{CURRENT_POINTER}.tmp")
+    tmp.write_text(version + "\n")
+    os.replace(tmp, pointer)
+
+
+def list_versions(registry: str | Path) -> list[str]:
+    """Version dirs that contain a config.json, sorted by name (timestamps sort chronologically)."""
+    root = Path(registry)
+    if not root.is_dir():
+        return []
+    return sorted(p.name for p in root.iterdir() if p.is_dir() and (p / "config.json").exists())
+
+
+def warm_up(service: InferenceService, n_rows: int = WARMUP_ROWS) -> None:
+    """Score a synthetic batch so the first real request doesn't pay first-call costs (and a broken model fails here)."""
+    vocab = (service.transformer.vocabularies or {}).get("transaction_type") or ["receipt"]
+    rows = [
+        {
+            "transaction_id": i,
+            "item_id": 1 + i % 4,
+            "warehouse_id": 1 + i % 2,
+            "transaction_type": vocab[i % len(vocab)],
+            "item_category": None,
+            "quantity": float(i + 1),
+            "unit_price": 1.0,
+            "total_amount": float(i + 1),
+            "created_at_ts": 1_700_000_000.0 + 3600.0 * i,
+        }
+        for i in range(n_rows)
+    ]
+    service.score_transactions(rows)
+
+
+class ModelManager:
+    """Owns app_state.ml_inference: initial load, background reloads and the optional pointer watcher."""
+
+    def __init__(self, app_state: Any, registry: Optional[str] = None, model_dir: Optional[str] = None):
+        self.app_state = app_state
+        self.registry = Path(registry) if registry else None
+        self.model_dir = Path(model_dir) if model_dir else None
+        self.loading: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.loaded_at: Optional[datetime] = None
+        self._watched: Optional[tuple[str, int]] = None  # (model dir, config.json mtime) the pointer last named
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        if not hasattr(app_state, "ml_inference"):
+            app_state.ml_inference = None
+
+    @property
+    def configured(self) -> bool:
+        return self.registry is not None or self.model_dir is not None
+
+    def _resolve(self, version: Optional[str] = None) -> tuple[Path, Optional[str]]:
+        """(model dir, registry version or None) to load."""
+        if self.registry is None:
+            if version is not None:
+                raise FileNotFoundError("No model registry configured (set ML_MODEL_REGISTRY)")
+            if self.model_dir is None:
+                raise FileNotFoundError("No model configured (set ML_MODEL_REGISTRY or ML_MODEL_DIR)")
+            return self.model_dir, None
+        version = version or read_current_version(self.registry)
+        if version is None:
+            raise FileNotFoundError(f"No '{CURRENT_POINTER}' pointer in {self.registry}")
+        path = self.registry / version
+        if Path(version).name != version or not (path / "config.json").exists():
+            raise FileNotFoundError(f"Model version not found: {version}")
+        return path, version
+
+    @staticmethod
+    def _source_of(path: Path) -> tuple[str, int]:
+        return str(path.resolve()), (path / "config.json").stat().st_mtime_ns
+
+    def _begin(self, version: Optional[str]) -> tuple[Path, Optional[str]]:
+        """Take the reload lock and resolve the target (lock released on failure)."""
+        if not self._lock.acquire(blocking=False):
+            raise ReloadInProgress(f"Model {self.loading} is already loading")
+        try:
+            path, registry_version = self._resolve(version)
+        except Exception:
+            self._lock.release()
+            raise
+        self.loading = registry_version or str(path)
+        return path, registry_version
+
+    def _load_locked(self, path: Path, registry_version: Optional[str], promote: bool) -> InferenceService:
+        """Load with the lock held by _begin; releases it."""
+        try:
+            started = time.perf_counter()
+            try:
+                source = self._source_of(path)
+                service = InferenceService(path, model_version=registry_version)
+                warm_up(service)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            if promote and registry_version is not None:
+                write_current_version(self.registry, registry_version)
+            self.app_state.ml_inference = service
+            if registry_version is None or promote or registry_version == read_current_version(self.registry):
+                # A pinned non-current version is kept until the pointer itself changes
+                self._watched = source
+            self.last_error = None
+            self.loaded_at = datetime.now(timezone.utc)
+            logger.info(
+                "Loaded model %s from %s in %.0f ms", service.model_version, path, (time.perf_counter() - started) * 1000
+            )
+            return service
+        finally:
+            self.loading = None
+            self._lock.release()
+
+    def load(self, version: Optional[str] = None, promote: bool = False) -> InferenceService:
+        """Load, warm and swap in a model (blocking). Raises on failure; the live model is kept."""
+        path, registry_version = self._begin(version)
+        return self._load_locked(path, registry_version, promote)
+
+    def reload_async(self, version: Optional[str] = None, promote: bool = False) -> None:
+        """Resolve the target now (so bad versions fail the request), load it on a background thread."""
+        path, registry_version = self._begin(version)
+
+        def run() -> None:
+            try:
+                self._load_locked(path, registry_version, promote)
+            except Exception:
+                logger.exception("Model reload failed")
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+
+    def _pointer_source(self) -> Optional[tuple[str, int]]:
+        try:
+            return self._source_of(self._resolve()[0])
+        except FileNotFoundError:
+            return None
+
+    def start_watcher(self, interval_s: float) -> None:
+        """Poll the current pointer (or ML_MODEL_DIR/config.json) and reload when it changes."""
+        if interval_s <= 0 or not self.configured or self._watcher is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.wait(interval_s):
+                source = self._pointer_source()
+                if source is None or source == self._watched or self._lock.locked():
+                    continue
+                try:
+                    self.load()
+                except ReloadInProgress:
+                    pass
+                except Exception:
+                    # Keep serving the old model; retry only once the source changes again
+                    logger.exception("Model reload from watcher failed")
+                    self._watched = source
+
+        self._watcher = threading.Thread(target=run, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self) -> dict:
+        inference: Optional[InferenceService] = self.app_state.ml_inference
+        return {
+            "model_loaded": inference is not None,
+            "model_version": inference.model_version if inference else None,
+            "model_dir": str(inference.model_dir) if inference else None,
+            "loaded_at": self.loaded_at,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "registry": str(self.registry) if self.registry else None,
+            "current": read_current_version(self.registry) if self.registry else None,
+            "versions": list_versions(self.registry) if self.registry else [],
+            "watching": self._watcher is not None,
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
@@ -0,0 +1,97 @@
+"""
+In-process LRU cache of score results, owned by an InferenceService (so a model
+swap starts with an empty cache). Keyed by (transaction_id, model_version); the
+entry also records a fingerprint of the feature inputs so inline rows only hit
+when they match what was scored. Id lookups rely on write invalidation from the
+transaction / item / warehouse handlers (per process: other workers keep their
+entries until evicted).
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from app.services.window_features import WINDOW_FEATURE_COLUMNS
+
+# Row fields that feed the feature matrix (window features: only on rows of windowed models)
+FINGERPRINT_FIELDS = (
+    "item_id", "warehouse_id", "transaction_type", "item_category",
+    "quantity", "unit_price", "total_amount", "created_at_ts",
+    *WINDOW_FEATURE_COLUMNS,
+)
+
+
+def row_fingerprint(row: dict) -> int:
+    return hash(tuple(row.get(k) for k in FINGERPRINT_FIELDS))
+
+
+class ScoreCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[int, str], tuple[int, dict]] = OrderedDict()
+        self._versions: set[str] = set()  # normally just the owning model's
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, transaction_id: int, model_version: str, fingerprint: Optional[int] = None) -> Optional[dict]:
+        """Cached result, or None. With a fingerprint, only an entry scored from the same inputs hits."""
+        key = (transaction_id, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (fingerprint is not None and entry[0] != fingerprint):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, transaction_id: int, model_version: str, fingerprint: int, result: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        key = (transaction_id, model_version)
+        with self._lock:
+            self._versions.add(model_version)
+            self._entries[key] = (fingerprint, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, transaction_ids: Iterable[int]) -> None:
+        with self._lock:
+            for transaction_id in transaction_ids:
+                for version in self._versions:
+                    if self._entries.pop((transaction_id, version), None) is not None:
+                        self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def invalidate_scores(app_state: Any, transaction_ids: Optional[Iterable[int]] = None) -> None:
+    """Drop cached scores for transaction_ids (all entries when None) of the loaded model."""
+    inference = getattr(app_state, "ml_inference", None)
+    cache: Optional[ScoreCache] = getattr(inference, "score_cache", None)
+    if cache is None:
+        return
+    if transaction_ids is None:
+        cache.clear()
+    else:
+        cache.invalidate(transaction_ids)
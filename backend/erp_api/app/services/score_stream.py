@@ -0,0 +1,224 @@
+"""
+Streaming scoring for /ml/score/stream: the request body (NDJSON lines or an Arrow
+IPC stream of ML-export rows) is decoded incrementally as it arrives, scored in
+fixed-size chunks and each chunk's results are encoded and streamed back as soon
+as they are ready. Input memory is bounded by the chunk size, not the request size.
+Window features (models that have them) are read from the database per chunk.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Optional
+
+import numpy as np
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from app.database import SessionLocal
+from app.services.ml_export import ARROW_STREAM_MEDIA_TYPE, NDJSON_MEDIA_TYPE, ArrowStreamEncoder, ndjson_bytes
+from app.services.transaction_scores import frame_with_database_windows, with_database_windows
+
+_ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+class ScoreStreamError(ValueError):
+    """Malformed request body (bad JSON line, truncated or unsupported Arrow stream)."""
+
+
+def result_arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("transaction_id", pa.int64()),
+        ("anomaly_score", pa.float64()),
+        ("cluster_id", pa.int64()),
+        ("is_anomaly", pa.bool_()),
+    ])
+
+
+class NdjsonDecoder:
+    """Splits body bytes into complete lines; a partial trailing line is kept for the next feed."""
+
+    def __init__(self):
+        self._tail = b""
+
+    def feed(self, data: bytes) -> list[bytes]:
+        lines = (self._tail + data).split(b"\n")
+        self._tail = lines.pop()
+        return [line for line in lines if line.strip()]
+
+    def close(self) -> list[bytes]:
+        tail, self._tail = self._tail, b""
+        return [tail] if tail.strip() else []
+
+
+class ArrowStreamDecoder:
+    """
+    Decodes an Arrow IPC stream from body bytes one message at a time. A parse is only
+    retried once the buffer has doubled, so large messages arriving in small pieces
+    stay linear. Dictionary-encoded columns are not supported.
+    """
+
+    def __init__(self):
+        import pyarrow as pa
+
+        self._pa = pa
+        self._buf = bytearray()
+        self._retry_at = 0
+        self.schema = None
+        self.ended = False
+
+    def feed(self, data: bytes) -> list[Any]:
+        self._buf += data
+        if len(self._buf) < self._retry_at:
+            return []
+        return self._drain()
+
+    def _drain(self) -> list[Any]:
+        pa = self._pa
+        batches = []
+        while self._buf and not self.ended:
+            if self._buf[:8] == _ARROW_EOS or self._buf[:4] == b"\x00\x00\x00\x00":
+                self.ended = True
+                break
+            reader = pa.BufferReader(pa.py_buffer(bytes(self._buf)))
+            try:
+                message = pa.ipc.read_message(reader)
+            except (pa.ArrowInvalid, OSError, EOFError):
+                self._retry_at = 2 * len(self._buf)
+                break
+            del self._buf[:reader.tell()]
+            self._retry_at = 0
+            if self.schema is None:
+                if message.type != "schema":
+                    raise ScoreStreamError("Arrow stream must start with a schema message")
+                self.schema = pa.ipc.read_schema(message)
+            elif message.type == "record batch":
+                batches.append(pa.ipc.read_record_batch(message, self.schema))
+            else:
+                raise ScoreStreamError(f"Unsupported Arrow message: {message.type}")
+        return batches
+
+    def close(self) -> list[Any]:
+        batches = self._drain()
+        if self._buf and not self.ended:
+            raise ScoreStreamError("Truncated Arrow stream")
+        return batches
+
+
+def _score_lines(inference: Any, lines: list[bytes], first_line: int) -> pd.DataFrame:
+    rows = []
+    for i, line in enumerate(lines):
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise ScoreStreamError(f"Line {first_line + i}: invalid JSON ({e})")
+        if not isinstance(row, dict):
+            raise ScoreStreamError(f"Line {first_line + i}: expected a JSON object")
+        rows.append(row)
+    if inference.window_hours:
+        with SessionLocal() as db:
+            rows = with_database_windows(db, inference, rows)
+    scores, labels = inference.score_matrix(inference.featurize(rows))
+    ids = np.fromiter(
+        (r.get("transaction_id", first_line + i - 1) for i, r in enumerate(rows)), dtype=np.int64, count=len(rows)
+    )
+    return inference.results_frame(ids, scores, labels)
+
+
+def _score_batches(inference: Any, batches: list[Any], first_row: int) -> pd.DataFrame:
+    import pyarrow as pa
+
+    frame = pa.Table.from_batches(batches).to_pandas()
+    n = len(frame)
+    for c in ("quantity", "item_id", "warehouse_id"):
+        if c not in frame.columns:
+            raise ScoreStreamError(f"Missing column: {c}")
+    defaults = {"unit_price": 0.0, "total_amount": 0.0, "created_at_ts": np.nan, "transaction_type": None, "item_category": None}
+    for c, default in defaults.items():
+        if c not in frame.columns:
+            frame[c] = default
+    for c in ("quantity", "unit_price", "total_amount", "created_at_ts", "item_id", "warehouse_id"):
+        frame[c] = pd.to_numeric(frame[c], errors="coerce").astype(np.float64)
+    if inference.window_hours:
+        with SessionLocal() as db:
+            frame = frame_with_database_windows(db, inference, frame)
+    if "transaction_id" not in frame.columns:
+        frame["transaction_id"] = np.arange(first_row, first_row + n, dtype=np.int64)
+    return inference.score_frame(frame)
+
+
+async def score_stream(
+    inference: Any,
+    body: AsyncIterator[bytes],
+    input_media_type: str,
+    output_media_type: str,
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    """
+    Decode body incrementally, score every chunk_size rows in the threadpool and yield
+    the encoded results. Reading runs as its own task that hands encoded chunks to
+    the response through a queue: most HTTP/1.1 clients upload the whole body before
+    reading, and a reader blocked behind unread results would never finish the upload.
+    Input memory is bounded by chunk_size; results (tens of bytes per row) wait in the
+    queue until the client reads. On a malformed body NDJSON output ends with an
+    {"error": ...} line; Arrow output ends without its end-of-stream marker.
+    """
+    arrow_in = input_media_type == ARROW_STREAM_MEDIA_TYPE
+    decoder: Any = ArrowStreamDecoder() if arrow_in else NdjsonDecoder()
+    encoder = ArrowStreamEncoder(result_arrow_schema()) if output_media_type == ARROW_STREAM_MEDIA_TYPE else None
+    out: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+    failure: list[BaseException] = []
+
+    async def score(units: list[Any], first_row: int) -> None:
+        if arrow_in:
+            frame = await run_in_threadpool(_score_batches, inference, units, first_row)
+        else:
+            frame = await run_in_threadpool(_score_lines, inference, units, first_row + 1)
+        await out.put(encoder.write(frame) if encoder else ndjson_bytes(frame))
+
+    async def produce() -> None:
+        pending: list[Any] = []
+        n_pending = n_scored = 0  # rows (NDJSON: lines); n_scored drives default ids / error positions
+        try:
+            async for data in body:
+                for unit in decoder.feed(data):
+                    pending.append(unit)
+                    n_pending += unit.num_rows if arrow_in else 1
+                    if n_pending >= chunk_size:
+                        await score(pending, n_scored)
+                        pending, n_scored, n_pending = [], n_scored + n_pending, 0
+            pending.extend(decoder.close())
+            if pending:
+                await score(pending, n_scored)
+            if encoder is not None:
+                await out.put(encoder.close())
+        except ScoreStreamError as e:
+            if encoder is None:
+                await out.put((json.dumps({"error": str(e)}) + "\n").encode())
+        except ClientDisconnect:
+            pass
+        except BaseException as e:
+            failure.append(e)
+            raise
+        finally:
+            out.put_nowait(None)
+
+    task = asyncio.create_task(produce())
+    try:
+        while (data := await out.get()) is not None:
+            yield data
+        if failure:
+            raise failure[0]
+    finally:
+        task.cancel()
+
+
+def media_type_of(content_type: str) -> Optional[str]:
+    """NDJSON / Arrow stream media type named by a Content-Type header, else None."""
+    base = content_type.split(";")[0].strip().lower()
+    if base in (NDJSON_MEDIA_TYPE, "application/jsonl", "application/json-lines"):
+        return NDJSON_MEDIA_TYPE
+    if base == ARROW_STREAM_MEDIA_TYPE:
+        return ARROW_STREAM_MEDIA_TYPE
+    return None
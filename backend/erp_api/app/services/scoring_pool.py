@@ -0,0 +1,139 @@
+"""
+Process-pool offload for large scoring requests. The API process only walks the
+request rows into float64 input columns (FeatureTransformer.row_columns); a pool
+worker assembles the feature matrix and runs the kernel, so a 50k-row request
+doesn't hold the GIL that auth / CRUD / health share. Workers load the model in
+their initializer (model_params.bin is memory-mapped and scored from in place, so
+they share one copy) and load a new version on first use after a hot reload.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Optional
+
+import numpy as np
+
+from app.core.metrics import LATENCY_MS_BUCKETS, SIZE_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Per worker process: (model_dir, model_version) → InferenceService
+_worker_services: dict[tuple[str, str], Any] = {}
+_WORKER_MAX_MODELS = 2  # current model + the one being replaced by a reload
+
+
+class ScoringPoolBusy(Exception):
+    """All heavy-scoring slots are taken; the caller should retry later."""
+
+
+def _worker_service(model_dir: str, model_version: str) -> Any:
+    from app.services.inference import InferenceService
+
+    key = (model_dir, model_version)
+    service = _worker_services.get(key)
+    if service is None:
+        service = InferenceService(model_dir, model_version=model_version)
+        _worker_services[key] = service
+        while len(_worker_services) > _WORKER_MAX_MODELS:
+            _worker_services.pop(next(iter(_worker_services)))
+    return service
+
+
+def _init_worker(model_dir: Optional[str], model_version: Optional[str]) -> None:
+    if model_dir and model_version:
+        _worker_service(model_dir, model_version)
+
+
+def _noop() -> None:
+    return None
+
+
+def _score_columns(model_dir: str, model_version: str, columns: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    service = _worker_service(model_dir, model_version)
+    X = service.transformer.assemble(columns, service.scorer.dtype)
+    return service.score_matrix(X)
+
+
+class ProcessPoolScorer:
+    """
+    Scores requests of at least min_rows rows in a process pool. At most max_jobs run
+    or wait at once; beyond that score_transactions raises ScoringPoolBusy (429).
+    """
+
+    def __init__(self, workers: int, min_rows: int, max_jobs: int, service: Any = None):
+        self.workers = workers
+        self.min_rows = min_rows
+        self.max_jobs = max_jobs
+        self._slots = threading.BoundedSemaphore(max_jobs)
+        self._active = 0
+        self.rejected = 0
+        self.latency_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.job_rows = Histogram(SIZE_BUCKETS)
+        self._lock = threading.Lock()
+        self._initargs = (str(service.model_dir), service.model_version) if service is not None else (None, None)
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: the API process has threads (batcher, watcher), which fork would copy mid-state
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+        # Start the workers (and their model load) now rather than on the first heavy request
+        for _ in range(self.workers):
+            executor.submit(_noop)
+        return executor
+
+    def handles(self, n_rows: int) -> bool:
+        return n_rows >= self.min_rows
+
+    def score_transactions(self, service: Any, rows: list[dict]) -> list[dict]:
+        """Same contract as InferenceService.score_transactions, scored in a worker process."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ScoringPoolBusy()
+        start = time.perf_counter()
+        with self._lock:
+            self._active += 1
+        try:
+            columns = service.transformer.row_columns(rows)
+            executor = self._executor
+            try:
+                scores, labels = executor.submit(
+                    _score_columns, str(service.model_dir), service.model_version, columns
+                ).result()
+            except BrokenProcessPool:
+                logger.exception("Scoring pool broke; restarting it and scoring in-process")
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = self._new_executor()
+                scores, labels = service.score_matrix(service.transformer.assemble(columns, service.scorer.dtype))
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+        self.job_rows.observe(len(rows))
+        self.latency_ms.observe((time.perf_counter() - start) * 1000.0)
+        return service.format_results(rows, scores, labels)
+
+    def stats(self) -> dict:
+        with self._lock:
+            active, rejected = self._active, self.rejected
+        return {
+            "workers": self.workers,
+            "min_rows": self.min_rows,
+            "max_jobs": self.max_jobs,
+            "active_jobs": active,
+            "rejected": rejected,
+            "latency_ms": self.latency_ms.snapshot(),
+            "job_rows": self.job_rows.snapshot(),
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,289 @@
+"""
+Scoring on top of the loaded InferenceService: cached scoring for /ml/score and
+score-on-write (after a transaction is created/updated, score it and upsert into
+transaction_scores, keyed by transaction_id + model_version). For models with window
+features every scored row's window is read from the database (range queries per
+(item, warehouse) over (ts - W, ts]), so scores don't depend on which worker wrote
+the neighbouring rows.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.inventory_transaction import InventoryTransaction, TransactionType
+from app.models.transaction_score import TransactionScore
+from app.services.batching import ScoringAborted, ScoringQueueFull
+from app.services.scoring_pool import ScoringPoolBusy
+from app.services.ml_export import export_rows_for_transaction_ids
+from app.services.score_cache import row_fingerprint
+from app.services.window_features import WINDOW_FEATURE_COLUMNS, window_features_at
+
+logger = logging.getLogger(__name__)
+
+WINDOW_QUERY_RANGES = 200  # (item, warehouse, time range) predicates OR-ed into one window query
+
+
+def _window_ranges(window_s: float, item_id: np.ndarray, warehouse_id: np.ndarray, ts: np.ndarray) -> list[list]:
+    """[(item, warehouse), lo, hi] per pair: the union of the rows' windows (ts - W, ts] as disjoint ranges."""
+    ranges: list[list] = []
+    for i in np.lexsort((ts, warehouse_id, item_id)):
+        key, lo, hi = (int(item_id[i]), int(warehouse_id[i])), ts[i] - window_s, ts[i]
+        if ranges and ranges[-1][0] == key and lo <= ranges[-1][2]:
+            ranges[-1][2] = hi
+        else:
+            ranges.append([key, lo, hi])
+    return ranges
+
+
+def _window_members(db: Session, ranges: list[list]) -> tuple[np.ndarray, ...]:
+    """
+    Stored transactions in the ranges as (item_id, warehouse_id, created_at_ts, signed
+    quantity, transaction_id) arrays. Bounds get a second of slack; rows outside a
+    window are ignored by window_features_at.
+    """
+    found = []
+    for i in range(0, len(ranges), WINDOW_QUERY_RANGES):
+        found += db.execute(
+            select(
+                InventoryTransaction.item_id, InventoryTransaction.warehouse_id, InventoryTransaction.created_at,
+                InventoryTransaction.quantity, InventoryTransaction.transaction_type, InventoryTransaction.id,
+            ).where(or_(*(
+                and_(
+                    InventoryTransaction.item_id == item_id,
+                    InventoryTransaction.warehouse_id == warehouse_id,
+                    InventoryTransaction.created_at > datetime.fromtimestamp(lo - 1, timezone.utc),
+                    InventoryTransaction.created_at <= datetime.fromtimestamp(hi + 1, timezone.utc),
+                )
+                for (item_id, warehouse_id), lo, hi in ranges[i : i + WINDOW_QUERY_RANGES]
+            )))
+        ).all()
+    if not found:
+        return tuple(np.empty(0) for _ in range(5))
+    item_id, warehouse_id, created_at, quantity, transaction_type, transaction_id = zip(*found)
+    created = pd.to_datetime(pd.Series(created_at))
+    created = created.dt.tz_localize("UTC") if created.dt.tz is None else created.dt.tz_convert("UTC")
+    qty = np.array([float(q) for q in quantity])
+    qty[np.array([t == TransactionType.OUT for t in transaction_type])] *= -1
+    return (
+        np.array(item_id, dtype=np.float64),
+        np.array(warehouse_id, dtype=np.float64),
+        (created - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy(dtype=np.float64),
+        qty,
+        np.array(transaction_id, dtype=np.float64),
+    )
+
+
+def database_window_columns(
+    db: Session,
+    window_hours: float,
+    item_id: Any,
+    warehouse_id: Any,
+    created_at_ts: Any,
+    quantity: Any,
+    transaction_id: Any,
+) -> dict[str, np.ndarray]:
+    """
+    WINDOW_FEATURE_COLUMNS for rows (any order, not necessarily stored) against the
+    stored transactions of their pairs. A row with a transaction_id stands for that
+    transaction (it replaces the stored version in every window); rows without one
+    (NaN) are scored as new transactions and don't enter each other's windows.
+    """
+    queries = tuple(
+        np.asarray(a, dtype=np.float64) for a in (item_id, warehouse_id, created_at_ts, quantity, transaction_id)
+    )
+    valid = np.isfinite(queries[2]) & np.isfinite(queries[3])
+    members = _window_members(
+        db, _window_ranges(window_hours * 3600.0, queries[0][valid], queries[1][valid], queries[2][valid])
+    )
+    with_id = valid & np.isfinite(queries[4])
+    if with_id.any():
+        _, last = np.unique(queries[4][with_id][::-1], return_index=True)
+        own = tuple(a[with_id][::-1][last] for a in queries)
+        stored = ~np.isin(members[4], own[4])
+        members = tuple(np.concatenate([a[stored], b]) for a, b in zip(members, own))
+    return window_features_at(members, queries, window_hours)
+
+
+def _float_values(rows: list[dict], key: str) -> np.ndarray:
+    return np.array([np.nan if r.get(key) is None else float(r[key]) for r in rows], dtype=np.float64)
+
+
+def with_database_windows(db: Session, inference: Any, rows: list[dict]) -> list[dict]:
+    """ML export-style rows with their window features added (see database_window_columns); as is without windows."""
+    if not inference.window_hours or not rows:
+        return rows
+    cols = database_window_columns(
+        db, inference.window_hours,
+        *(_float_values(rows, k) for k in ("item_id", "warehouse_id", "created_at_ts", "quantity", "transaction_id")),
+    )
+    return [{**r, **{c: float(cols[c][i]) for c in WINDOW_FEATURE_COLUMNS}} for i, r in enumerate(rows)]
+
+
+def frame_with_database_windows(db: Session, inference: Any, frame: pd.DataFrame) -> pd.DataFrame:
+    """Export frame with its window feature columns added (see database_window_columns); as is without windows."""
+    if not inference.window_hours or frame.empty:
+        return frame
+    return frame.assign(**database_window_columns(
+        db, inference.window_hours,
+        frame["item_id"], frame["warehouse_id"], frame["created_at_ts"], frame["quantity"],
+        frame["transaction_id"] if "transaction_id" in frame.columns else np.full(len(frame), np.nan),
+    ))
+
+
+def window_dependents(db: Session, app_state: Any, points: list[tuple[int, int, datetime]]) -> list[int]:
+    """
+    Ids of the transactions whose windows contain any of points (item_id, warehouse_id,
+    created_at): the pair's rows in (created_at, created_at + W]. A write at a point
+    changes their window features, so they are rescored with it. Empty without a
+    loaded model with window features.
+    """
+    inference = getattr(app_state, "ml_inference", None)
+    if inference is None or not inference.window_hours or not points:
+        return []
+    span = timedelta(hours=inference.window_hours)
+    return list(db.execute(
+        select(InventoryTransaction.id).where(or_(*(
+            and_(
+                InventoryTransaction.item_id == item_id,
+                InventoryTransaction.warehouse_id == warehouse_id,
+                InventoryTransaction.created_at > created_at,
+                InventoryTransaction.created_at <= created_at + span,
+            )
+            for item_id, warehouse_id, created_at in points
+        )))
+    ).scalars())
+
+
+def _score_rows(inference: Any, app_state: Any, rows: list[dict]) -> list[dict]:
+    """Large batches → process pool, small ones → micro-batcher, else inline (app_state None: inline)."""
+    pool = getattr(app_state, "ml_pool", None)
+    if pool is not None and pool.handles(len(rows)):
+        return pool.score_transactions(inference, rows)
+    batcher = getattr(app_state, "ml_batcher", None)
+    if batcher is None:
+        return inference.score_transactions(rows)
+    return batcher.score_transactions(inference, rows)
+
+
+def _score_and_cache(inference: Any, app_state: Any, rows: list[dict]) -> list[dict]:
+    results = _score_rows(inference, app_state, rows)
+    for row, result in zip(rows, results):
+        if row.get("transaction_id") is not None:
+            inference.score_cache.put(row["transaction_id"], inference.model_version, row_fingerprint(row), result)
+    return results
+
+
+def score_rows_cached(inference: Any, app_state: Any, rows: list[dict]) -> list[dict]:
+    """
+    Inline ML-export rows: rows whose id + feature inputs were scored before are
+    served from cache. For models with window features the rows must carry them
+    (see with_database_windows).
+    """
+    cache, version = inference.score_cache, inference.model_version
+    results: list[dict | None] = [None] * len(rows)
+    missed: list[int] = []
+    for i, row in enumerate(rows):
+        tid = row.get("transaction_id")
+        hit = cache.get(tid, version, row_fingerprint(row)) if tid is not None else None
+        if hit is None:
+            missed.append(i)
+        else:
+            results[i] = hit
+    if missed:
+        scored = _score_and_cache(inference, app_state, [rows[i] for i in missed])
+        for i, result in zip(missed, scored):
+            results[i] = result
+    return results
+
+
+def score_ids_cached(inference: Any, app_state: Any, db: Session, transaction_ids: list[int]) -> list[dict]:
+    """
+    Score DB transactions by id; unknown ids are omitted. Cache hits skip both the DB
+    fetch and the model, only the misses are fetched and scored. With window
+    features a row's inputs also change with its neighbours' writes (possibly made
+    by another worker), so every row and window is read and the cache only serves
+    rows scored from the same inputs.
+    """
+    if inference.window_hours:
+        ids = list(dict.fromkeys(transaction_ids))
+        rows = with_database_windows(db, inference, export_rows_for_transaction_ids(db, ids))
+        results = score_rows_cached(inference, app_state, rows)
+        by_id = {row["transaction_id"]: result for row, result in zip(rows, results)}
+        return [by_id[tid] for tid in ids if tid in by_id]
+    cache, version = inference.score_cache, inference.model_version
+    by_id: dict[int, dict] = {}
+    missing: list[int] = []
+    for tid in dict.fromkeys(transaction_ids):
+        hit = cache.get(tid, version)
+        if hit is None:
+            missing.append(tid)
+        else:
+            by_id[tid] = hit
+    if missing:
+        rows = export_rows_for_transaction_ids(db, missing)
+        if rows:
+            for row, result in zip(rows, _score_and_cache(inference, app_state, rows)):
+                by_id[row["transaction_id"]] = result
+    return [by_id[tid] for tid in dict.fromkeys(transaction_ids) if tid in by_id]
+
+
+def store_scores(db: Session, model_version: str, results: list[dict]) -> None:
+    """Replace the stored scores of these transactions for model_version (caller commits)."""
+    if not results:
+        return
+    ids = [r["transaction_id"] for r in results]
+    db.execute(
+        delete(TransactionScore)
+        .where(TransactionScore.model_version == model_version)
+        .where(TransactionScore.transaction_id.in_(ids))
+    )
+    db.execute(
+        insert(TransactionScore),
+        [
+            {
+                "transaction_id": r["transaction_id"],
+                "model_version": model_version,
+                "anomaly_score": r["anomaly_score"],
+                "cluster_id": r["cluster_id"],
+                "is_anomaly": r["is_anomaly"],
+            }
+            for r in results
+        ],
+    )
+
+
+def score_and_store(app_state: Any, transaction_ids: list[int]) -> int:
+    """
+    Background task (runs after the response is sent): score transaction_ids with
+    app_state.ml_inference and persist the results. No-op without a loaded model.
+    Opens its own session; returns the number of rows written.
+    """
+    inference = getattr(app_state, "ml_inference", None)
+    if inference is None or not transaction_ids:
+        return 0
+    db = SessionLocal()
+    try:
+        rows = export_rows_for_transaction_ids(db, transaction_ids)
+        if not rows:
+            return 0
+        rows = with_database_windows(db, inference, rows)
+        try:
+            results = _score_and_cache(inference, app_state, rows)
+        except (ScoringQueueFull, ScoringAborted, ScoringPoolBusy):
+            # Not latency sensitive: score inline rather than drop the write
+            results = _score_and_cache(inference, None, rows)
+        store_scores(db, inference.model_version, results)
+        db.commit()
+        return len(results)
+    except Exception:
+        db.rollback()
+        logger.exception("Scoring transactions %s failed", transaction_ids)
+        return 0
+    finally:
+        db.close()
@@ -0,0 +1,178 @@
+"""
+Rolling time-window features per (item_id, warehouse_id). Over the transactions of
+the same item in the same warehouse in the trailing window (ts - W, ts], ordered by
+(created_at_ts, transaction_id) and including the row itself:
+- window_count: transactions in the window
+- window_quantity_sum: sum of signed quantity in the window
+- window_quantity_z: z-score of quantity against the earlier rows of the window
+  (0 without spread, e.g. fewer than two earlier rows)
+- hours_since_prev: hours since the previous transaction of the pair, capped at W
+  (also the value when there is none in the window)
+All four depend only on rows inside the window, so the backend computes them for the
+rows it scores against their pairs' windows read from the database (see
+transaction_scores.with_database_windows). Must match ml_pipeline
+pipeline.feature_engineering.windows.
+"""
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+WINDOW_FEATURE_COLUMNS = ["window_count", "window_quantity_sum", "window_quantity_z", "hours_since_prev"]
+
+
+def window_z(x: np.ndarray, count: np.ndarray, total: np.ndarray, total_sq: np.ndarray) -> np.ndarray:
+    """
+    z of x against count earlier values with sum total and sum of squares total_sq
+    (all shifted by the same constant). 0 where the variance is within rounding of 0.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / count
+        mean_sq = total_sq / count
+        var = mean_sq - mean * mean
+        spread = (count >= 2) & (var > 1e-9 * mean_sq + 1e-12)
+        return np.where(spread, (x - mean) / np.sqrt(np.where(spread, var, 1.0)), 0.0)
+
+
+def window_features(
+    item_id: Any,
+    warehouse_id: Any,
+    created_at_ts: Any,
+    quantity: Any,
+    transaction_id: Any,
+    window_hours: float,
+) -> dict[str, np.ndarray]:
+    """
+    WINDOW_FEATURE_COLUMNS for every row, in input order (any order in, no Python
+    loop): rows are sorted by (item, warehouse, ts, id), each window's first row is
+    a binary search for (pair, ts - W) in the sorted keys, and window sums are
+    differences of per-pair cumulative sums. O(n log n). Rows without a
+    timestamp or quantity get NaN and don't count in the windows of others.
+    """
+    ts = np.asarray(created_at_ts, dtype=np.float64)
+    qty = np.asarray(quantity, dtype=np.float64)
+    n = len(ts)
+    out = {c: np.full(n, np.nan) for c in WINDOW_FEATURE_COLUMNS}
+    rows = np.flatnonzero(np.isfinite(ts) & np.isfinite(qty))
+    m = len(rows)
+    if m == 0:
+        return out
+    item = np.asarray(item_id, dtype=np.int64)[rows]
+    warehouse = np.asarray(warehouse_id, dtype=np.int64)[rows]
+    order = np.lexsort((np.asarray(transaction_id, dtype=np.int64)[rows], ts[rows], warehouse, item))
+    rows, item, warehouse = rows[order], item[order], warehouse[order]
+    t, x = ts[rows], qty[rows]
+
+    new_pair = np.ones(m, dtype=bool)
+    new_pair[1:] = (item[1:] != item[:-1]) | (warehouse[1:] != warehouse[:-1])
+    pair = np.cumsum(new_pair) - 1
+    pair_start = np.flatnonzero(new_pair)[pair]
+
+    # Window start: rows at or before (pair, ts - W) in (pair, ts) order. Complex numbers
+    # sort by (real, imag), so one searchsorted does the lexicographic lookup exactly.
+    keys = pair + 1j * t
+    start = np.searchsorted(keys, pair + 1j * (t - float(window_hours) * 3600.0), side="right")
+
+    # Per-pair cumulative sums (restart at each pair), shifted by the pair's first quantity
+    xs = x - x[pair_start]
+    csum = pd.Series(xs).groupby(pair, sort=False).cumsum().to_numpy()
+    csum_sq = pd.Series(xs * xs).groupby(pair, sort=False).cumsum().to_numpy()
+    before = start - 1
+    inside = before >= pair_start
+    before = np.maximum(before, 0)
+    count = np.arange(1, m + 1) - start
+    total = csum - np.where(inside, csum[before], 0.0)
+    total_sq = csum_sq - np.where(inside, csum_sq[before], 0.0)
+
+    earlier = count - 1
+    gap = np.full(m, float(window_hours))
+    has_prev = earlier >= 1
+    gap[has_prev] = (t[has_prev] - t[np.flatnonzero(has_prev) - 1]) / 3600.0
+
+    out["window_count"][rows] = count
+    out["window_quantity_sum"][rows] = total + count * x[pair_start]
+    out["window_quantity_z"][rows] = window_z(xs, earlier, total - xs, total_sq - xs * xs)
+    out["hours_since_prev"][rows] = np.minimum(gap, float(window_hours))
+    return out
+
+
+def window_features_at(
+    members: tuple[Any, Any, Any, Any, Any],
+    queries: tuple[Any, Any, Any, Any, Any],
+    window_hours: float,
+) -> dict[str, np.ndarray]:
+    """
+    WINDOW_FEATURE_COLUMNS for query rows against member rows, both given as
+    (item_id, warehouse_id, created_at_ts, quantity, transaction_id) arrays: a query's
+    window holds the members of its pair in (ts - W, ts] that come before it in
+    (ts, id) order, plus the query itself, so a member with the query's own id is not
+    counted twice. Queries don't see each other; a NaN id sorts after every member
+    with the same timestamp. Equals window_features when the queries are the members.
+    """
+    m_item, m_wh, m_ts, m_qty, m_tid = (np.asarray(a, dtype=np.float64) for a in members)
+    q_item, q_wh, q_ts, q_qty, q_tid = (np.asarray(a, dtype=np.float64) for a in queries)
+    n = len(q_ts)
+    out = {c: np.full(n, np.nan) for c in WINDOW_FEATURE_COLUMNS}
+    rows = np.flatnonzero(np.isfinite(q_ts) & np.isfinite(q_qty))
+    if len(rows) == 0:
+        return out
+    valid = np.isfinite(m_ts) & np.isfinite(m_qty)
+    m_item, m_wh, m_ts, m_qty, m_tid = m_item[valid], m_wh[valid], m_ts[valid], m_qty[valid], m_tid[valid]
+    q_item, q_wh, q_ts, q_qty = q_item[rows], q_wh[rows], q_ts[rows], q_qty[rows]
+    q_tid = np.nan_to_num(q_tid[rows], nan=np.inf)
+    m, k = len(m_ts), len(rows)
+
+    _, pair = np.unique(
+        np.column_stack([np.concatenate([m_item, q_item]), np.concatenate([m_wh, q_wh])]), axis=0, return_inverse=True
+    )
+    pair = pair.ravel()
+    m_pair, q_pair = pair[:m], pair[m:]
+    order = np.lexsort((m_tid, m_ts, m_pair))
+    m_pair, m_ts, m_qty = m_pair[order], m_ts[order], m_qty[order]
+
+    # Members before each query in (pair, ts, id) order: sort both together, a query
+    # ahead of a member with the same key, and count the members passed
+    is_member = np.concatenate([np.zeros(k, dtype=np.int64), np.ones(m, dtype=np.int64)])
+    both = np.lexsort((
+        is_member,
+        np.concatenate([q_tid, m_tid[order]]),
+        np.concatenate([q_ts, m_ts]),
+        np.concatenate([q_pair, m_pair]),
+    ))
+    passed = np.cumsum(is_member[both]) - is_member[both]
+    at_query = both < k
+    end = np.empty(k, dtype=np.int64)
+    end[both[at_query]] = passed[at_query]
+    start = np.searchsorted(m_pair + 1j * m_ts, q_pair + 1j * (q_ts - float(window_hours) * 3600.0), side="right")
+    earlier = end - start
+
+    # Per-pair cumulative sums shifted by the pair's first member (or the query's own quantity)
+    pair_lo = np.searchsorted(m_pair, q_pair, side="left")
+    has_members = pair_lo < m
+    has_members[has_members] = m_pair[pair_lo[has_members]] == q_pair[has_members]
+    shift = np.where(has_members, m_qty[np.minimum(pair_lo, max(m - 1, 0))] if m else 0.0, q_qty)
+    total = np.zeros(k)
+    total_sq = np.zeros(k)
+    prev_ts = np.full(k, np.nan)
+    if m:
+        new_pair = np.ones(m, dtype=bool)
+        new_pair[1:] = m_pair[1:] != m_pair[:-1]
+        ms = m_qty - m_qty[np.flatnonzero(new_pair)[np.cumsum(new_pair) - 1]]
+        csum = pd.Series(ms).groupby(m_pair, sort=False).cumsum().to_numpy()
+        csum_sq = pd.Series(ms * ms).groupby(m_pair, sort=False).cumsum().to_numpy()
+        some = earlier > 0
+        last = np.maximum(end - 1, 0)
+        before = start - 1
+        inside = before >= pair_lo
+        before = np.maximum(before, 0)
+        total = np.where(some, csum[last] - np.where(inside, csum[before], 0.0), 0.0)
+        total_sq = np.where(some, csum_sq[last] - np.where(inside, csum_sq[before], 0.0), 0.0)
+        prev_ts = np.where(some, m_ts[last], np.nan)
+
+    xs = q_qty - shift
+    gap = np.where(earlier > 0, (q_ts - prev_ts) / 3600.0, float(window_hours))
+    out["window_count"][rows] = earlier + 1
+    out["window_quantity_sum"][rows] = total + xs + (earlier + 1) * shift
+    out["window_quantity_z"][rows] = window_z(xs, earlier, total, total_sq)
+    out["hours_since_prev"][rows] = np.minimum(gap, float(window_hours))
+    return out
@@ -0,0 +1,108 @@
+"""
+Check that the backend scoring kernel (app.services.scoring) still matches its
+ml_pipeline copy (pipeline.training.model): FusedScorer, combine_anomaly_scores and
+distance_scale_of must give identical results, or API scores drift from the scores
+training calibrated the threshold on; a model_params.bin written by the pipeline
+must score the same through the backend's memory-mapped weights. Needs the
+ml_pipeline requirements installed.
+
+    python scripts/check_scoring_parity.py [--pipeline-dir ../../ml_pipeline]
+
+Exits non-zero on any mismatch.
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+# Add project root so `app` is importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import scoring as backend
+from app.services.model_artifact import load_model_params
+
+
+def random_params(rng: np.random.Generator, n_features: int, n_components: int, n_clusters: int) -> dict:
+    """Model-shaped arrays: orthonormal PCA components, positive scales."""
+    components = np.linalg.qr(rng.normal(size=(n_features, n_components)))[0].T
+    return {
+        "scaler_mean": rng.normal(size=n_features) * 10,
+        "scaler_scale": rng.uniform(0.5, 20.0, n_features),
+        "pca_components": components,
+        "pca_mean": rng.normal(size=n_features) * 0.1,
+        "centroids": rng.normal(size=(n_clusters, n_components)),
+    }
+
+
+def check(pipeline_dir: Path, rows: int = 5000, seed: int = 0) -> list[str]:
+    sys.path.insert(0, str(pipeline_dir.resolve()))
+    from pipeline.training import model as pipeline
+
+    rng = np.random.default_rng(seed)
+    n_clusters = 6
+    params = random_params(rng, n_features=14, n_components=5, n_clusters=n_clusters)
+    X = rng.normal(size=(rows, 14)) * params["scaler_scale"] + params["scaler_mean"]
+    failures = []
+
+    configs = [
+        {},
+        {"distance_scale": 1.7},
+        {"distance_normalization": "cluster", "distance_scale": 1.7,
+         "cluster_distance_scales": rng.uniform(0.5, 3.0, n_clusters).tolist()},
+    ]
+    for config in configs:
+        scale_b, scale_p = backend.distance_scale_of(config), pipeline.distance_scale_of(config)
+        if not np.array_equal(np.asarray(scale_b, dtype=float), np.asarray(scale_p, dtype=float), equal_nan=True):
+            failures.append(f"distance_scale_of({config}): {scale_b!r} != {scale_p!r}")
+        for dtype in (np.float64, np.float32):
+            scores_b, labels_b = backend.FusedScorer(**params, dtype=dtype, distance_scale=scale_b).score(X)
+            scores_p, labels_p = pipeline.FusedScorer(**params, dtype=dtype, distance_scale=scale_p).score(X)
+            if not np.array_equal(labels_b, labels_p):
+                failures.append(f"FusedScorer labels differ ({np.dtype(dtype).name}, {config})")
+            if not np.array_equal(scores_b, scores_p):
+                diff = float(np.max(np.abs(scores_b - scores_p)))
+                failures.append(f"FusedScorer scores differ by up to {diff:.3g} ({np.dtype(dtype).name}, {config})")
+
+    # Pipeline export → backend reader: the stored weights are used in place and score the same
+    fitted = {
+        "scaler": SimpleNamespace(mean_=params["scaler_mean"], scale_=params["scaler_scale"]),
+        "pca": SimpleNamespace(components_=params["pca_components"], mean_=params["pca_mean"], whiten=False),
+        "kmeans": SimpleNamespace(cluster_centers_=params["centroids"]),
+        "config": {"distance_scale": 1.7},
+    }
+    with tempfile.TemporaryDirectory() as model_dir:
+        _, arrays = load_model_params(pipeline.export_model_params(fitted, model_dir))
+        for dtype in (np.float64, np.float32):
+            mapped = backend.FusedScorer.from_model_params(arrays, dtype, 1.7)
+            if mapped.W.flags.owndata or mapped.centroids_t2.flags.owndata:
+                failures.append(f"model_params.bin weights were copied ({np.dtype(dtype).name})")
+            scores_m, labels_m = mapped.score(X)
+            scores_b, labels_b = backend.FusedScorer(**params, dtype=dtype, distance_scale=1.7).score(X)
+            if not (np.array_equal(labels_m, labels_b) and np.array_equal(scores_m, scores_b)):
+                failures.append(f"model_params.bin scores differ from the fitted arrays ({np.dtype(dtype).name})")
+        del arrays, mapped
+    return failures
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument(
+        "--pipeline-dir",
+        type=Path,
+        default=Path(__file__).resolve().parents[3] / "ml_pipeline",
+        help="ml_pipeline checkout (default: the one next to backend/)",
+    )
+    args = p.parse_args()
+    failures = check(args.pipeline_dir)
+    for failure in failures:
+        print(f"MISMATCH: {failure}")
+    if failures:
+        sys.exit(1)
+    print("Scoring kernels match.")
+
+
+if __name__ == "__main__":
+    main()
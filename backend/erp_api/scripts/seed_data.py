@@ -12,11 +12,13 @@ from app.models.user import User, Role
 from app.models.item import Item
 from app.models.warehouse import Warehouse
 from app.models.inventory_transaction import InventoryTransaction, TransactionType
+from app.models.row_count import seed_row_counts
 from app.core.security import get_password_hash
 
 
 def seed():
     Base.metadata.create_all(bind=engine)
+    seed_row_counts(engine)
     with get_db_context() as db:
         # Add new @erp.example.com users only if they don't exist
         admin = db.query(User).filter(User.email == "admin@erp.example.com").first()
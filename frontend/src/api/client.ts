@@ -49,7 +49,7 @@ export interface MLExportRow {
 
 export interface MLExportResponse {
   rows: MLExportRow[];
-  total_count: number;
+  total_count: number | null;
   offset: number;
   limit: number;
   has_more: boolean;
@@ -60,6 +60,8 @@ export const mlApi = {
     axios.post<ScoreResponse>('/ml/score', body),
   export: (params?: { offset?: number; limit?: number }) =>
     axios.get<MLExportResponse>('/ml/export', { params }),
+  anomalies: (params?: { limit?: number; cursor?: string; only_anomalies?: boolean; model_version?: string }) =>
+    axios.get<MLAnomaliesResponse>('/ml/anomalies', { params }),
 };
 
 // Types
@@ -135,4 +137,23 @@ export interface ScoreResultItem {
 export interface ScoreResponse {
   results: ScoreResultItem[];
   model_loaded: boolean;
+  model_version: string | null;
+}
+
+export interface MLAnomalyRow extends ScoreResultItem {
+  scored_at: string;
+  item_id: number;
+  item_sku: string;
+  warehouse_id: number;
+  warehouse_code: string;
+  transaction_type: string;
+  quantity: number;
+  created_at: string;
+}
+
+export interface MLAnomaliesResponse {
+  model_version: string;
+  rows: MLAnomalyRow[];
+  has_more: boolean;
+  next_cursor: string | null;
 }
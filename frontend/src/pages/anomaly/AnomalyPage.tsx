@@ -30,15 +30,39 @@ const AnomalyPage: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   const [results, setResults] = useState<ScoreResultItem[]>([]);
   const [modelLoaded, setModelLoaded] = useState<boolean | null>(null);
+  const [modelVersion, setModelVersion] = useState<string | null>(null);
   const [scoreLimit, setScoreLimit] = useState(100);
   const [exporting, setExporting] = useState(false);
   const [exportMessage, setExportMessage] = useState<string | null>(null);
 
+  const loadStored = async () => {
+    setLoading(true);
+    setError(null);
+    setResults([]);
+    setModelLoaded(null);
+    setModelVersion(null);
+    try {
+      const { data } = await mlApi.anomalies({ limit: scoreLimit });
+      setResults(data.rows);
+      setModelLoaded(true);
+      setModelVersion(data.model_version);
+    } catch (e: unknown) {
+      const msg = getApiErrorMessage(e, 'Request failed');
+      setError(msg);
+      if (msg.toLowerCase().includes('no ml model loaded')) {
+        setModelLoaded(false);
+      }
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const runScore = async () => {
     setLoading(true);
     setError(null);
     setResults([]);
     setModelLoaded(null);
+    setModelVersion(null);
     try {
       const { data: txList } = await transactionsApi.list({ limit: scoreLimit });
       const ids = txList.map((t) => t.id);
@@ -50,6 +74,7 @@ const AnomalyPage: React.FC = () => {
       const { data } = await mlApi.score({ transaction_ids: ids });
       setResults(data.results);
       setModelLoaded(data.model_loaded);
+      setModelVersion(data.model_version ?? null);
     } catch (e: unknown) {
       const msg = getApiErrorMessage(e, 'Request failed');
       setError(msg);
@@ -91,6 +116,9 @@ const AnomalyPage: React.FC = () => {
           <Button variant="contained" startIcon={<RefreshIcon />} onClick={runScore} disabled={loading}>
             {loading ? 'Scoring...' : 'Score recent'}
           </Button>
+          <Button variant="outlined" onClick={loadStored} disabled={loading}>
+            Top stored anomalies
+          </Button>
           <Button variant="outlined" startIcon={<DownloadIcon />} onClick={handleExportCsv} disabled={exporting}>
             {exporting ? 'Exporting...' : 'Export ML data (CSV)'}
           </Button>
@@ -102,11 +130,11 @@ const AnomalyPage: React.FC = () => {
         </Alert>
       )}
       <Typography color="text.secondary" sx={{ mb: 2 }}>
-        Score the most recent transactions (limit above). Export downloads ML-ready data for the feature pipeline. Requires backend model (ML_MODEL_DIR) for scoring.
+        Score the most recent transactions (limit above), or list the highest stored scores (saved when transactions are created or edited). Export downloads ML-ready data for the feature pipeline. Requires backend model (ML_MODEL_DIR) for scoring.
       </Typography>
       {modelLoaded === false && (
         <Alert severity="warning" sx={{ mb: 2 }}>
-          ML model is not loaded. Train the pipeline and set ML_MODEL_DIR on the backend, then restart the API.
+          ML model is not loaded. Train the pipeline and set ML_MODEL_DIR (or publish to ML_MODEL_REGISTRY) on the backend, then restart the API or reload the model.
         </Alert>
       )}
       {error && <Alert severity="error" onClose={() => setError(null)} sx={{ mb: 2 }}>{error}</Alert>}
@@ -117,6 +145,7 @@ const AnomalyPage: React.FC = () => {
         <>
           <Typography variant="body2" color="text.secondary" sx={{ mb: 1 }}>
             Anomalies: {results.filter((r) => r.is_anomaly).length} of {results.length}
+            {modelVersion && ` · model ${modelVersion}`}
           </Typography>
           <TableContainer component={Paper}>
             <Table size="small">
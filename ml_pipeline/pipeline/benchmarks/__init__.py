@@ -0,0 +1 @@
+"""Benchmarks: timing + output equivalence for pipeline hot paths."""
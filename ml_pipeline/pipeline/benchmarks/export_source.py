@@ -0,0 +1,82 @@
+"""
+Benchmark: pulling the ML export straight from the database (--source db) vs through
+the API (paged JSON, compact pages, Arrow IPC stream).
+
+    python -m pipeline.benchmarks.export_source --database-url sqlite:///../backend/erp_api/erp_inventory.db \
+        [--api-url http://localhost:8000 --token JWT] [--batch-size 10000] [--repeat 3]
+
+Each source is consumed to DataFrames chunk by chunk (nothing concatenated). The API
+paths are skipped without a token; row counts and transaction ids are checked against
+the database pull.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from pipeline.config import Settings
+from pipeline.feature_engineering.db_source import iterate_transactions_from_db, parse_database_url
+from pipeline.feature_engineering.fetcher import iterate_transactions_from_api, iterate_transactions_from_stream
+
+
+def _time_pull(pull: Callable[[], Iterator[pd.DataFrame]], repeat: int) -> tuple[float, int, int]:
+    """Best-of-repeat seconds to consume pull(); also (rows, sum of transaction ids) of the last run."""
+    best = float("inf")
+    rows = id_sum = 0
+    for _ in range(repeat):
+        rows = id_sum = 0
+        start = time.perf_counter()
+        for df in pull():
+            rows += len(df)
+            id_sum += int(df["transaction_id"].to_numpy(dtype=np.int64).sum())
+        best = min(best, time.perf_counter() - start)
+    return best, rows, id_sum
+
+
+def main():
+    settings = Settings()
+    p = argparse.ArgumentParser(description="Benchmark database vs API export pulls")
+    p.add_argument("--database-url", type=str, default=settings.database_url)
+    p.add_argument("--api-url", type=str, default=settings.erp_api_base_url)
+    p.add_argument("--token", type=str, default=settings.erp_api_token)
+    p.add_argument("--batch-size", type=int, default=settings.ml_export_batch_size)
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+    if not args.database_url:
+        p.error("--database-url (or DATABASE_URL) is required")
+
+    n = args.batch_size
+    sources: dict[str, Callable[[], Iterator[pd.DataFrame]]] = {
+        "db_cursor": lambda: iterate_transactions_from_db(args.database_url, n, method="cursor"),
+    }
+    if parse_database_url(args.database_url)[0] == "postgresql":
+        sources["db_copy"] = lambda: iterate_transactions_from_db(args.database_url, n, method="copy")
+    if args.token:
+        sources.update({
+            "api_json": lambda: iterate_transactions_from_api(args.api_url, args.token, n, compact=False),
+            "api_compact": lambda: iterate_transactions_from_api(args.api_url, args.token, n),
+            "api_arrow": lambda: iterate_transactions_from_stream(args.api_url, args.token, chunk_size=n),
+        })
+    else:
+        print("No --token: API sources skipped")
+
+    results = {}
+    for name, pull in sources.items():
+        results[name] = _time_pull(pull, args.repeat)
+    _, ref_rows, ref_ids = results["db_cursor"]
+    base = results["db_cursor"][0]
+    print(f"rows={ref_rows} batch_size={n} repeat={args.repeat}")
+    print(f"{'source':<12} {'seconds':>9} {'rows/s':>12} {'vs db':>7} {'same_rows':>10}")
+    for name, (seconds, rows, id_sum) in results.items():
+        same = rows == ref_rows and id_sum == ref_ids
+        print(f"{name:<12} {seconds:>9.3f} {rows / seconds:>12,.0f} {seconds / base:>6.1f}x {str(same):>10}")
+
+
+if __name__ == "__main__":
+    main()
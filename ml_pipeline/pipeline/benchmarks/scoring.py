@@ -0,0 +1,91 @@
+"""
+Benchmark: sklearn scoring path (predict_anomaly_scores) vs FusedScorer (float64 / float32).
+
+    python -m pipeline.benchmarks.scoring [--model-dir model] [--rows 100000] [--batch-size 1000]
+
+Without --model-dir (or if it has no model) a pipeline is fitted on synthetic data.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from pipeline.feature_engineering.features import get_feature_columns
+from pipeline.training.model import (
+    FusedScorer,
+    distance_scale_of,
+    fit_pipeline,
+    load_pipeline,
+    predict_anomaly_scores,
+)
+
+
+def synthetic_features(n: int, seed: int = 0) -> np.ndarray:
+    """Feature-shaped random data (signed quantities, prices, calendar parts, ids, codes)."""
+    rng = np.random.default_rng(seed)
+    qty = rng.integers(1, 100, n) * rng.choice([-1.0, 1.0], n)
+    price = rng.gamma(2.0, 20.0, n)
+    return np.column_stack([
+        qty, np.abs(qty), price, np.abs(qty) * price,
+        rng.integers(0, 24, n), rng.integers(0, 7, n), rng.integers(1, 29, n),
+        rng.integers(1, 500, n), rng.integers(1, 10, n), rng.integers(0, 4, n), rng.integers(0, 12, n),
+    ]).astype(np.float64)
+
+
+def _time_batches(fn: Callable[[np.ndarray], tuple], X: np.ndarray, batch_size: int, repeat: int) -> float:
+    """Best-of-repeat seconds to score X in batches."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(0, len(X), batch_size):
+            fn(X[i:i + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark sklearn vs fused anomaly scoring")
+    p.add_argument("--model-dir", type=str, default=None)
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--batch-size", type=int, default=1_000)
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+
+    X = synthetic_features(args.rows)
+    if args.model_dir and (Path(args.model_dir) / "config.json").exists():
+        scaler, pca, kmeans, config = load_pipeline(args.model_dir)
+    else:
+        artifacts = fit_pipeline(X[:20_000], get_feature_columns())
+        scaler, pca, kmeans, config = artifacts["scaler"], artifacts["pca"], artifacts["kmeans"], artifacts["config"]
+    scale = distance_scale_of(config)
+
+    fused64 = FusedScorer.from_sklearn(scaler, pca, kmeans, np.float64, scale)
+    fused32 = FusedScorer.from_sklearn(scaler, pca, kmeans, np.float32, scale)
+    paths = {
+        "sklearn": lambda B: predict_anomaly_scores(B, scaler, pca, kmeans, scale),
+        "fused_f64": fused64.score,
+        "fused_f32": fused32.score,
+    }
+
+    # Equivalence on one batch
+    B = X[:args.batch_size]
+    ref_scores, ref_labels = paths["sklearn"](B)
+    print(f"rows={args.rows} batch_size={args.batch_size} features={X.shape[1]}")
+    print(f"{'path':<10} {'seconds':>9} {'rows/s':>12} {'speedup':>8} {'max_rel_diff':>13} {'labels_equal':>13}")
+    base = None
+    for name, fn in paths.items():
+        seconds = _time_batches(fn, X, args.batch_size, args.repeat)
+        base = base or seconds
+        scores, labels = fn(B)
+        diff = float((np.abs(scores - ref_scores) / np.maximum(np.abs(ref_scores), 1e-12)).max())
+        agree = float((labels == ref_labels).mean())
+        print(f"{name:<10} {seconds:>9.4f} {args.rows / seconds:>12,.0f} {base / seconds:>7.1f}x {diff:>13.2e} {agree:>13.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ class Settings(BaseSettings):
     erp_api_base_url: str = "http://localhost:8000"
     erp_api_token: Optional[str] = None  # JWT for GET /api/v1/ml/export
     ml_export_batch_size: int = 10_000
+    ml_export_prefetch: int = 1  # export page requests in flight (> 1: id-range shards pulled concurrently)
+    ml_export_http2: bool = False  # needs the h2 package (pip install 'httpx[http2]')
+    ml_export_retries: int = 5  # retries per request on timeouts, connection errors, 429 and 5xx
+    ml_export_backoff_s: float = 0.5  # first retry delay; doubles per attempt (capped at 30s)
+    database_url: Optional[str] = None  # ERP database for --source db (sqlite:///... or postgresql://...)
 
     # Paths (local or S3 for SageMaker)
     data_dir: str = "data"
@@ -20,17 +25,22 @@ class Settings(BaseSettings):
     output_dir: str = "output"
 
     # Feature engineering
-    time_window_hours: int = 24  # for rolling-style features if needed
+    window_features: bool = False  # add rolling per-(item, warehouse) window features to the spec
+    time_window_hours: int = 24  # trailing window of those features
     max_rows: Optional[int] = None  # cap rows for dev (None = all)
 
     # Training
     n_components: int = 8  # PCA "embedding" size
     n_clusters: int = 5
     anomaly_quantile: float = 0.95  # top (1 - this) fraction labeled anomaly
+    distance_normalization: str = "global"  # centroid distance / training std: "global" or "cluster"
     random_state: int = 42
 
     # Inference
     anomaly_score_threshold: Optional[float] = None  # override from training
+    scoring_float32: bool = False  # run the fused scorer in float32
+    inference_chunk_size: int = 100_000  # rows read and scored per chunk by the inference CLI
+    inference_workers: int = 1  # scoring processes for the inference CLI (1 = in-process)
 
 
 def get_data_dir(base: Optional[Path] = None) -> Path:
@@ -1,5 +1,45 @@
 """Feature engineering: raw transactions → feature matrix."""
-from pipeline.feature_engineering.fetcher import fetch_transactions_from_api, load_transactions_from_csv
-from pipeline.feature_engineering.features import build_feature_matrix
+from pipeline.feature_engineering.db_source import fetch_transactions_from_db, iterate_transactions_from_db
+from pipeline.feature_engineering.fetcher import (
+    ExportFilters,
+    fetch_changes_from_api,
+    fetch_features_from_stream,
+    fetch_transactions_from_api,
+    fetch_transactions_from_stream,
+    iterate_changes_from_api,
+    load_transactions_from_csv,
+    spool_transactions_from_api,
+)
+from pipeline.feature_engineering.features import (
+    FeatureTransformer,
+    build_feature_matrix,
+    build_feature_spec,
+    build_feature_spec_from_chunks,
+    load_feature_spec,
+)
+from pipeline.feature_engineering.store import FeatureStore, sync_feature_store
+from pipeline.feature_engineering.stream import write_features_streaming
+from pipeline.feature_engineering.windows import WindowHistory, window_features
 
-__all__ = ["fetch_transactions_from_api", "load_transactions_from_csv", "build_feature_matrix"]
+__all__ = [
+    "ExportFilters",
+    "fetch_changes_from_api",
+    "fetch_features_from_stream",
+    "fetch_transactions_from_db",
+    "iterate_transactions_from_db",
+    "fetch_transactions_from_api",
+    "fetch_transactions_from_stream",
+    "iterate_changes_from_api",
+    "load_transactions_from_csv",
+    "spool_transactions_from_api",
+    "FeatureTransformer",
+    "build_feature_matrix",
+    "build_feature_spec",
+    "build_feature_spec_from_chunks",
+    "load_feature_spec",
+    "FeatureStore",
+    "sync_feature_store",
+    "write_features_streaming",
+    "WindowHistory",
+    "window_features",
+]
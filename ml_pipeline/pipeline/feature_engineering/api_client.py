@@ -0,0 +1,181 @@
+"""
+Pooled ERP API client for the fetchers: one httpx.Client per pull (keep-alive
+connections, optionally HTTP/2), retries with exponential backoff on transient
+failures, a throughput meter, and the JSON cursor checkpoint used to resume pulls.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from pipeline.config import Settings
+
+# Retried with backoff (plus connect/read errors and timeouts); other 4xx/5xx fail at once
+RETRY_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+MAX_BACKOFF_S = 30.0
+
+
+class ThroughputMeter:
+    """Rows / wire bytes / retries of a pull; log() prints rows/s and MB/s at most every every_s seconds."""
+
+    def __init__(self, label: str, every_s: float = 10.0):
+        self.label = label
+        self.every_s = every_s
+        self.rows = 0
+        self.bytes = 0
+        self.requests = 0
+        self.retries = 0
+        self.started = time.perf_counter()
+        self._last_log = self.started
+        self._lock = threading.Lock()
+
+    def add(self, rows: int = 0, nbytes: int = 0, requests: int = 0, retries: int = 0) -> None:
+        with self._lock:
+            self.rows += rows
+            self.bytes += nbytes
+            self.requests += requests
+            self.retries += retries
+
+    def summary(self) -> str:
+        seconds = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"{self.label}: {self.rows:,} rows, {self.bytes / 1e6:,.1f} MB in {seconds:.1f}s "
+            f"({self.rows / seconds:,.0f} rows/s, {self.bytes / 1e6 / seconds:,.2f} MB/s, "
+            f"{self.requests} requests, {self.retries} retries)"
+        )
+
+    def log(self, force: bool = False) -> None:
+        now = time.perf_counter()
+        if force or now - self._last_log >= self.every_s:
+            self._last_log = now
+            print(f"  {self.summary()}", flush=True)
+
+
+class ApiClient:
+    """
+    One pooled client per pull (thread-safe; shared by prefetch workers). http2=True
+    needs the h2 package (pip install 'httpx[http2]'); without it HTTP/1.1 is used.
+    Transport errors, timeouts and RETRY_STATUS_CODES are retried up to `retries`
+    times, sleeping backoff_s * 2^attempt (with jitter, capped) or the server's Retry-After.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        token: str | None = None,
+        http2: bool | None = None,
+        max_connections: int = 4,
+        retries: int | None = None,
+        backoff_s: float | None = None,
+        timeout: float = 60.0,
+        meter: ThroughputMeter | None = None,
+    ):
+        settings = Settings()
+        base_url = (base_url or settings.erp_api_base_url).rstrip("/")
+        token = token or settings.erp_api_token
+        http2 = settings.ml_export_http2 if http2 is None else http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("Warning: HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+                http2 = False
+        self.retries = settings.ml_export_retries if retries is None else retries
+        self.backoff_s = settings.ml_export_backoff_s if backoff_s is None else backoff_s
+        self.meter = meter or ThroughputMeter(base_url)
+        self._client = httpx.Client(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {token}"} if token else {},
+            timeout=timeout,
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def __enter__(self) -> "ApiClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _delay(self, attempt: int, response: httpx.Response | None) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF_S)
+            except ValueError:
+                pass
+        return min(self.backoff_s * 2 ** attempt, MAX_BACKOFF_S) * random.uniform(0.5, 1.0)
+
+    def get_json(self, path: str, params: dict | None = None) -> Any:
+        """GET path → parsed JSON, retrying transient failures."""
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = self._client.get(path, params=params)
+                self.meter.add(nbytes=response.num_bytes_downloaded, requests=1)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self.retries:
+                    response.raise_for_status()
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            self.meter.add(retries=1)
+            time.sleep(self._delay(attempt, response))
+        raise AssertionError("unreachable")
+
+
+class CursorCheckpoint:
+    """
+    Resumable pull state in a JSON file: per shard the last completed cursor (or offset)
+    and whether it is done, plus the number of pages handed to the consumer. Written
+    to a temp file and renamed, so a crash never leaves a torn checkpoint. The key
+    (endpoint, filters, page size, shards) must match the pull that wrote it.
+    """
+
+    def __init__(self, path: str | Path, key: dict, num_shards: int):
+        self.path = Path(path)
+        self.key = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+        state = json.loads(self.path.read_text()) if self.path.exists() else None
+        if state is not None and state.get("key") != self.key:
+            raise ValueError(f"Checkpoint {self.path} was written by a different pull; delete it to start over")
+        self.shards: dict[int, dict] = (
+            {int(k): v for k, v in state["shards"].items()} if state else {k: {} for k in range(num_shards)}
+        )
+        self.pages: int = state["pages"] if state else 0
+        self.rows: int = state["rows"] if state else 0
+
+    @staticmethod
+    def read(path: str | Path) -> dict | None:
+        """Saved state ({pages, rows, complete, shards, key}) of a checkpoint file, or None if there is none."""
+        path = Path(path)
+        return json.loads(path.read_text()) if path.exists() else None
+
+    @property
+    def complete(self) -> bool:
+        return all(s.get("done") for s in self.shards.values())
+
+    def update(self, shard: int, state: dict, rows: int) -> None:
+        self.shards[shard] = state
+        if rows:
+            self.pages += 1
+            self.rows += rows
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps({
+            "key": self.key,
+            "pages": self.pages,
+            "rows": self.rows,
+            "complete": self.complete,
+            "shards": {str(k): v for k, v in self.shards.items()},
+        }))
+        os.replace(tmp, self.path)
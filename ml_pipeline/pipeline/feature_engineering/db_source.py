@@ -0,0 +1,288 @@
+"""
+Read ML export rows straight from the ERP database, for pipelines running next to it:
+the same denormalizing join as the API's /ml/export (transactions ⋈ items ⋈ warehouses,
+(created_at, id) order), decoded in chunks into export-shaped DataFrames with no HTTP,
+auth, ORM or JSON in between.
+
+SQLite is read with a plain cursor and fetchmany (sqlite3 steps the query lazily).
+Postgres (needs psycopg2) is read with COPY (query) TO STDOUT (FORMAT csv) parsed
+incrementally by pyarrow's streaming CSV reader, or with a server-side (named) cursor.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Iterator, Literal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv
+
+from pipeline.config import Settings
+from pipeline.feature_engineering.fetcher import ExportFilters
+
+DbMethod = Literal["auto", "cursor", "copy"]
+
+# Must match backend app.models.inventory_transaction.TransactionType; the column stores
+# the enum member name (IN/OUT/...), the export carries the lowercase value
+TRANSACTION_TYPES = ("in", "out", "adjust", "transfer")
+UNKNOWN = "unknown"
+
+# Same columns / order as the backend's EXPORT_QUERY_COLUMNS
+_EXPORT_SELECT = """
+SELECT t.id AS transaction_id, t.item_id, i.sku AS item_sku, i.category AS item_category,
+       t.warehouse_id, w.code AS warehouse_code, t.transaction_type,
+       t.quantity, t.unit_price, t.total_amount, t.reference_type, t.created_at
+FROM inventory_transactions t
+JOIN items i ON i.id = t.item_id
+JOIN warehouses w ON w.id = t.warehouse_id
+"""
+_QUERY_COLUMNS = [
+    "transaction_id", "item_id", "item_sku", "item_category",
+    "warehouse_id", "warehouse_code", "transaction_type",
+    "quantity", "unit_price", "total_amount", "reference_type", "created_at",
+]
+_EPOCH = pd.Timestamp(0, tz="UTC")
+
+
+def parse_database_url(database_url: str) -> tuple[str, str]:
+    """SQLAlchemy-style URL → ("sqlite", path) or ("postgresql", libpq DSN)."""
+    scheme, sep, rest = database_url.partition("://")
+    backend = scheme.split("+")[0]
+    if not sep or backend not in ("sqlite", "postgresql", "postgres"):
+        raise ValueError(f"Unsupported database URL (sqlite or postgresql): {database_url}")
+    if backend == "sqlite":
+        # sqlite:///relative.db, sqlite:////absolute.db
+        return "sqlite", rest[1:] if rest.startswith("/") else rest
+    return "postgresql", f"postgresql://{rest}"
+
+
+def _export_query(filters: ExportFilters | None, placeholder: str) -> tuple[str, list]:
+    """The export join with filters as bound parameters, in (created_at, id) order."""
+    where: list[str] = []
+    params: list = []
+
+    def any_of(column: str, values: list) -> None:
+        where.append(f"{column} IN ({', '.join([placeholder] * len(values))})")
+        params.extend(values)
+
+    if filters is not None:
+        if filters.created_from is not None:
+            where.append(f"t.created_at >= {placeholder}")
+            params.append(_db_timestamp(filters.created_from))
+        if filters.created_to is not None:
+            where.append(f"t.created_at < {placeholder}")
+            params.append(_db_timestamp(filters.created_to))
+        if filters.warehouse_ids:
+            any_of("t.warehouse_id", list(filters.warehouse_ids))
+        if filters.item_ids:
+            any_of("t.item_id", list(filters.item_ids))
+        if filters.item_categories:
+            any_of("i.category", list(filters.item_categories))
+        if filters.transaction_types:
+            any_of("t.transaction_type", [t.upper() for t in filters.transaction_types])
+    sql = _EXPORT_SELECT
+    if where:
+        sql += "WHERE " + " AND ".join(where) + "\n"
+    return sql + "ORDER BY t.created_at, t.id", params
+
+
+def _db_timestamp(value: datetime | str) -> str:
+    """Filter bound → naive UTC 'YYYY-MM-DD HH:MM:SS' (how SQLite stores created_at; Postgres casts it)."""
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.tz_localize(None).isoformat(sep=" ")
+
+
+def _float_column(values: Any) -> np.ndarray:
+    """Numeric/Decimal/None column → float64 with NaN for missing."""
+    return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _export_frame(cols: dict[str, Any]) -> pd.DataFrame:
+    """
+    Query columns → ML export frame, as the backend's ml_export.rows_to_frame: enum
+    name → value, quantity signed (negative for "out"), created_at UTC plus created_at_ts.
+    """
+    tx_type = pd.Series(cols["transaction_type"], dtype=object).str.lower().to_numpy(dtype=object)
+    qty = _float_column(cols["quantity"])
+    qty = np.where(tx_type == "out", -qty, qty)
+    created = pd.to_datetime(pd.Series(cols["created_at"]), utc=True, format="ISO8601")
+    return pd.DataFrame({
+        "transaction_id": np.asarray(cols["transaction_id"], dtype=np.int64),
+        "item_id": np.asarray(cols["item_id"], dtype=np.int64),
+        "item_sku": np.asarray(cols["item_sku"], dtype=object),
+        "item_category": np.asarray(cols["item_category"], dtype=object),
+        "warehouse_id": np.asarray(cols["warehouse_id"], dtype=np.int64),
+        "warehouse_code": np.asarray(cols["warehouse_code"], dtype=object),
+        "transaction_type": tx_type,
+        "quantity": qty,
+        "unit_price": _float_column(cols["unit_price"]),
+        "total_amount": _float_column(cols["total_amount"]),
+        "reference_type": np.asarray(cols["reference_type"], dtype=object),
+        "created_at": created.to_numpy(),
+        "created_at_ts": ((created - _EPOCH) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64),
+    })
+
+
+def _iter_fetchmany(cursor: Any, chunk_size: int) -> Iterator[pd.DataFrame]:
+    while rows := cursor.fetchmany(chunk_size):
+        yield _export_frame(dict(zip(_QUERY_COLUMNS, zip(*rows))))
+
+
+def _connect_postgres(dsn: str) -> Any:
+    try:
+        import psycopg2
+    except ImportError as e:
+        raise ImportError("Reading from Postgres needs psycopg2 (pip install psycopg2-binary)") from e
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cur:
+        cur.execute("SET TIME ZONE 'UTC'")
+    return conn
+
+
+def _iter_copy_csv(conn: Any, sql: str, params: list, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    COPY (sql) TO STDOUT (FORMAT csv) into a pipe from a thread while pyarrow parses the
+    other end block by block. ~64 bytes per row gives blocks of about chunk_size rows.
+    """
+    with conn.cursor() as cur:
+        copy_sql = "COPY (" + cur.mogrify(sql, params).decode() + ") TO STDOUT (FORMAT csv)"
+    read_fd, write_fd = os.pipe()
+    failure: list[BaseException] = []
+
+    def produce() -> None:
+        with os.fdopen(write_fd, "wb") as sink:
+            try:
+                with conn.cursor() as cur:
+                    cur.copy_expert(copy_sql, sink)
+            except BaseException as e:
+                failure.append(e)
+
+    thread = threading.Thread(target=produce, name="ml-export-copy", daemon=True)
+    thread.start()
+    text = pa.string()
+    convert = pyarrow.csv.ConvertOptions(
+        column_types={
+            "transaction_id": pa.int64(), "item_id": pa.int64(), "warehouse_id": pa.int64(),
+            "item_sku": text, "item_category": text, "warehouse_code": text, "transaction_type": text,
+            "quantity": pa.float64(), "unit_price": pa.float64(), "total_amount": pa.float64(),
+            "reference_type": text, "created_at": text,
+        },
+        strings_can_be_null=True,  # unquoted empty field = NULL, "" = empty string
+    )
+    finished = False
+    with os.fdopen(read_fd, "rb") as source:
+        try:
+            reader = pyarrow.csv.open_csv(
+                source,
+                read_options=pyarrow.csv.ReadOptions(column_names=_QUERY_COLUMNS, block_size=max(chunk_size * 64, 1 << 20)),
+                convert_options=convert,
+            )
+            for batch in reader:
+                if batch.num_rows:
+                    yield _export_frame({c: batch.column(c).to_numpy(zero_copy_only=False) for c in _QUERY_COLUMNS})
+            finished = True
+        except pa.ArrowInvalid:
+            if not failure:
+                raise
+        finally:
+            if not finished:
+                conn.cancel()  # consumer stopped early: end the COPY instead of streaming the rest
+            while source.read(1 << 20):
+                pass
+            thread.join()
+    if failure:
+        raise failure[0]
+
+
+def iterate_transactions_from_db(
+    database_url: str | None = None,
+    chunk_size: int = 10_000,
+    filters: ExportFilters | None = None,
+    method: DbMethod = "auto",
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the ML export (same columns and order as /ml/export) as DataFrames of
+    chunk_size rows, straight from the database (DATABASE_URL). method: "cursor"
+    (SQLite cursor / Postgres server-side cursor + fetchmany) or "copy" (Postgres
+    COPY to CSV parsed by pyarrow); "auto" is copy on Postgres, cursor on SQLite.
+    """
+    database_url = database_url or Settings().database_url
+    if not database_url:
+        raise ValueError("No database URL (set DATABASE_URL or pass --database-url)")
+    dialect, target = parse_database_url(database_url)
+
+    if dialect == "sqlite":
+        if method == "copy":
+            raise ValueError("method='copy' needs Postgres")
+        conn = sqlite3.connect(f"file:{target}?mode=ro", uri=True)
+        try:
+            sql, params = _export_query(filters, "?")
+            yield from _iter_fetchmany(conn.execute(sql, params), chunk_size)
+        finally:
+            conn.close()
+        return
+
+    conn = _connect_postgres(target)
+    try:
+        sql, params = _export_query(filters, "%s")
+        if method in ("auto", "copy"):
+            yield from _iter_copy_csv(conn, sql, params, chunk_size)
+        else:
+            with conn.cursor(name="ml_export") as cur:
+                cur.itersize = chunk_size
+                cur.execute(sql, params)
+                yield from _iter_fetchmany(cur, chunk_size)
+    finally:
+        conn.close()
+
+
+def fetch_transactions_from_db(
+    database_url: str | None = None,
+    chunk_size: int = 10_000,
+    max_rows: int | None = None,
+    filters: ExportFilters | None = None,
+    method: DbMethod = "auto",
+) -> pd.DataFrame:
+    """iterate_transactions_from_db concatenated (stops after max_rows)."""
+    frames: list[pd.DataFrame] = []
+    total = 0
+    for df in iterate_transactions_from_db(database_url, chunk_size, filters, method):
+        if max_rows is not None:
+            df = df.iloc[: max_rows - total]
+        frames.append(df)
+        total += len(df)
+        if max_rows is not None and total >= max_rows:
+            break
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch_feature_vocabularies_from_db(database_url: str | None = None) -> dict[str, list[str]]:
+    """Global vocabularies as the API's /ml/features reports them (all transaction types, distinct categories)."""
+    database_url = database_url or Settings().database_url
+    if not database_url:
+        raise ValueError("No database URL (set DATABASE_URL or pass --database-url)")
+    dialect, target = parse_database_url(database_url)
+    sql = "SELECT DISTINCT category FROM items"
+    if dialect == "sqlite":
+        conn = sqlite3.connect(f"file:{target}?mode=ro", uri=True)
+        try:
+            categories = [r[0] for r in conn.execute(sql)]
+        finally:
+            conn.close()
+    else:
+        conn = _connect_postgres(target)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                categories = [r[0] for r in cur.fetchall()]
+        finally:
+            conn.close()
+    return {
+        "transaction_type": sorted(TRANSACTION_TYPES),
+        "item_category": sorted({c if c is not None else UNKNOWN for c in categories}),
+    }
@@ -1,7 +1,13 @@
 """Build ML feature matrix from transaction DataFrame."""
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
 import pandas as pd
 import numpy as np
-from typing import Optional
+
+from pipeline.feature_engineering.windows import WINDOW_FEATURE_COLUMNS, WindowHistory, window_features
 
 # Columns we expect from fetcher (API or CSV)
 EXPECTED_COLS = [
@@ -11,10 +17,250 @@ EXPECTED_COLS = [
     "created_at", "created_at_ts",
 ]
 
+FEATURE_SPEC_FILENAME = "feature_spec.json"
+FEATURE_SPEC_VERSION = 1
+UNKNOWN = "unknown"
+# Label-encoded feature column → source column
+CATEGORICAL_COLUMNS = {"transaction_type_enc": "transaction_type", "item_category_enc": "item_category"}
+
+
+def build_feature_spec(df: pd.DataFrame, window_hours: Optional[float] = None) -> dict[str, Any]:
+    """
+    Feature spec for a training pull: column order and the sorted vocabularies
+    used to label-encode transaction_type / item_category (code = index). With
+    window_hours the rolling window features (see windows.py) are appended.
+    """
+    return build_feature_spec_from_chunks([df], window_hours)
+
+
+def build_feature_spec_from_chunks(
+    chunks: Iterable[pd.DataFrame], window_hours: Optional[float] = None
+) -> dict[str, Any]:
+    """build_feature_spec over a chunked input: each vocabulary is the sorted union over all chunks."""
+    values: dict[str, set[str]] = {source: set() for source in CATEGORICAL_COLUMNS.values()}
+    for df in chunks:
+        for source in values:
+            if source in df.columns:
+                values[source].update(df[source].astype(object).fillna(UNKNOWN).astype(str).unique())
+    return make_feature_spec({source: sorted(v) or [UNKNOWN] for source, v in values.items()}, window_hours)
+
+
+def make_feature_spec(vocabularies: dict[str, list[str]], window_hours: Optional[float] = None) -> dict[str, Any]:
+    spec = {
+        "version": FEATURE_SPEC_VERSION,
+        "feature_columns": get_feature_columns(window=bool(window_hours)),
+        "vocabularies": vocabularies,
+    }
+    if window_hours:
+        spec["window_hours"] = window_hours
+    return spec
+
+
+def feature_spec_hash(spec: dict[str, Any]) -> str:
+    """Content hash of a spec (column order + vocabularies): features with equal hashes share codes."""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def save_feature_spec(spec: dict[str, Any], directory: str | Path) -> Path:
+    path = Path(directory) / FEATURE_SPEC_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(spec, f, indent=2)
+    return path
+
+
+def load_feature_spec(directory: str | Path) -> Optional[dict[str, Any]]:
+    """feature_spec.json from a features/model dir, or None (models trained before specs existed)."""
+    path = Path(directory) / FEATURE_SPEC_FILENAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _calendar_parts(created_at_ts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(hour, day_of_week Monday=0, day_of_month) in UTC from Unix seconds; NaN stays NaN."""
+    ts = np.asarray(created_at_ts, dtype=np.float64)
+    valid = np.isfinite(ts)
+    seconds = np.floor(np.where(valid, ts, 0.0)).astype("datetime64[s]")
+    days = seconds.astype("datetime64[D]")
+    hour = ((seconds - days).astype(np.int64) // 3600).astype(np.float64)
+    day_of_week = ((days.astype(np.int64) + 3) % 7).astype(np.float64)  # 1970-01-01 was a Thursday
+    day_of_month = ((days - days.astype("datetime64[M]")).astype(np.int64) + 1).astype(np.float64)
+    for part in (hour, day_of_week, day_of_month):
+        part[~valid] = np.nan
+    return hour, day_of_week, day_of_month
+
+
+def _to_float(value: Any) -> float:
+    return np.nan if value is None else float(value)
+
+
+class FeatureTransformer:
+    """
+    Compiled feature spec. Category → code goes through a hash index built once
+    (or, for categorical inputs, a lookup array gathered by category code), so a
+    batch is a few vectorized gathers and codes never depend on batch contents.
+    Unseen categories encode as -1. Without a spec (older models) codes fall back
+    to sorted(unique()) of each batch. A spec with window_hours adds the rolling
+    window features, computed over the frame being transformed (or after a
+    WindowHistory's earlier chunks).
+    """
+
+    def __init__(self, spec: Optional[dict[str, Any]] = None):
+        self.spec = spec
+        self.feature_columns = (spec or {}).get("feature_columns") or get_feature_columns()
+        self.window_hours = (spec or {}).get("window_hours")
+        vocabularies = (spec or {}).get("vocabularies")
+        self._index = (
+            {source: pd.Index(vocab) for source, vocab in vocabularies.items()} if vocabularies else None
+        )
+        self._codes = (
+            {source: {v: i for i, v in enumerate(vocab)} for source, vocab in vocabularies.items()}
+            if vocabularies else None
+        )
+
+    @classmethod
+    def from_dir(cls, directory: str | Path) -> "FeatureTransformer":
+        return cls(load_feature_spec(directory))
+
+    def _encode(self, values: Any, source: str) -> np.ndarray:
+        series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+        if self._index is None:
+            labels = series.astype(object).fillna(UNKNOWN).astype(str)
+            return pd.Index(sorted(labels.unique())).get_indexer(labels).astype(np.float64)
+        index = self._index[source]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Gather: category code → vocabulary code (NaN code -1 → "unknown")
+            categories = series.cat.categories.astype(str)
+            lut = np.append(index.get_indexer(categories), index.get_indexer([UNKNOWN]))
+            return lut[series.cat.codes.to_numpy()].astype(np.float64)
+        labels = series.astype(object).fillna(UNKNOWN).astype(str)
+        return index.get_indexer(labels).astype(np.float64)
+
+    def window_history(self) -> Optional[WindowHistory]:
+        """History to pass to transform_frame for consecutive chunks of one ordered stream (None without windows)."""
+        return WindowHistory(self.window_hours) if self.window_hours else None
+
+    def _window_columns(self, df: pd.DataFrame, history: Optional[WindowHistory]) -> dict[str, np.ndarray]:
+        """Window features of df; columns already present (computed upstream) are used as is."""
+        if all(c in df.columns for c in WINDOW_FEATURE_COLUMNS):
+            return {c: df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in WINDOW_FEATURE_COLUMNS}
+        args = (
+            df["item_id"].to_numpy(dtype=np.float64),
+            df["warehouse_id"].to_numpy(dtype=np.float64),
+            df["created_at_ts"].to_numpy(dtype=np.float64, na_value=np.nan),
+            df["quantity"].to_numpy(dtype=np.float64, na_value=np.nan),
+            df["transaction_id"].to_numpy(dtype=np.float64) if "transaction_id" in df.columns else np.arange(len(df)),
+        )
+        if history is not None:
+            return history.features(*args)
+        return window_features(*args, self.window_hours)
+
+    def transform_frame(
+        self, df: pd.DataFrame, dtype: Any = np.float64, history: Optional[WindowHistory] = None
+    ) -> np.ndarray:
+        """Raw transaction frame → (n, n_features) in feature_columns order (NaN kept)."""
+        n = len(df)
+        out = np.empty((n, len(self.feature_columns)), dtype=dtype)
+        if n == 0:
+            return out
+        cols = self._columns(
+            quantity=df["quantity"].to_numpy(dtype=np.float64, na_value=np.nan),
+            unit_price=(
+                df["unit_price"].to_numpy(dtype=np.float64, na_value=np.nan) if "unit_price" in df.columns
+                else np.zeros(n)
+            ),
+            total_amount=(
+                df["total_amount"].to_numpy(dtype=np.float64, na_value=np.nan) if "total_amount" in df.columns
+                else np.zeros(n)
+            ),
+            created_at_ts=df["created_at_ts"].to_numpy(dtype=np.float64, na_value=np.nan),
+            item_id=df["item_id"].to_numpy(dtype=np.float64),
+            warehouse_id=df["warehouse_id"].to_numpy(dtype=np.float64),
+            transaction_type=self._encode(df.get("transaction_type", pd.Series([UNKNOWN] * n)), "transaction_type"),
+            item_category=(
+                self._encode(df["item_category"], "item_category") if "item_category" in df.columns
+                else np.zeros(n)
+            ),
+        )
+        if self.window_hours:
+            cols.update(self._window_columns(df, history))
+        for j, c in enumerate(self.feature_columns):
+            out[:, j] = cols[c]
+        return out
+
+    def transform_rows(self, rows: list[dict], dtype: Any = np.float64) -> np.ndarray:
+        """
+        ML export-style dicts → (n, n_features) without pandas (small scoring requests).
+        NaN/inf are replaced by 0 as for inference. Window features are computed over
+        the given rows.
+        """
+        n = len(rows)
+        out = np.empty((n, len(self.feature_columns)), dtype=dtype)
+        if n == 0:
+            return out
+        if self._codes is None or self.window_hours:
+            return np.nan_to_num(self.transform_frame(pd.DataFrame(rows), dtype), nan=0.0, posinf=0.0, neginf=0.0)
+
+        def column(key: str, default: Any = None) -> np.ndarray:
+            return np.fromiter((_to_float(r.get(key, default)) for r in rows), dtype=np.float64, count=n)
+
+        def codes(source: str) -> np.ndarray:
+            lookup = self._codes[source]
+            return np.fromiter(
+                (lookup.get(UNKNOWN if r.get(source) is None else str(r.get(source)), -1) for r in rows),
+                dtype=np.float64,
+                count=n,
+            )
+
+        cols = self._columns(
+            quantity=column("quantity"),
+            unit_price=column("unit_price", 0.0),
+            total_amount=column("total_amount", 0.0),
+            created_at_ts=column("created_at_ts"),
+            item_id=column("item_id"),
+            warehouse_id=column("warehouse_id"),
+            transaction_type=codes("transaction_type"),
+            item_category=codes("item_category"),
+        )
+        for j, c in enumerate(self.feature_columns):
+            out[:, j] = cols[c]
+        return np.nan_to_num(out, nan=0.0, posinf=0.0, neginf=0.0, copy=False)
+
+    @staticmethod
+    def _columns(
+        quantity: np.ndarray,
+        unit_price: np.ndarray,
+        total_amount: np.ndarray,
+        created_at_ts: np.ndarray,
+        item_id: np.ndarray,
+        warehouse_id: np.ndarray,
+        transaction_type: np.ndarray,
+        item_category: np.ndarray,
+    ) -> dict[str, np.ndarray]:
+        hour, day_of_week, day_of_month = _calendar_parts(created_at_ts)
+        return {
+            "quantity": quantity,
+            "abs_quantity": np.abs(quantity),
+            "unit_price": np.nan_to_num(unit_price, nan=0.0),
+            "total_amount": np.nan_to_num(total_amount, nan=0.0),
+            "hour": hour,
+            "day_of_week": day_of_week,
+            "day_of_month": day_of_month,
+            "item_id": item_id,
+            "warehouse_id": warehouse_id,
+            "transaction_type_enc": transaction_type,
+            "item_category_enc": item_category,
+        }
+
 
 def build_feature_matrix(
     df: pd.DataFrame,
     drop_na_rows: bool = True,
+    spec: Optional[dict[str, Any]] = None,
+    transformer: Optional[FeatureTransformer] = None,
+    history: Optional[WindowHistory] = None,
 ) -> pd.DataFrame:
     """
     One row per transaction. Features:
@@ -23,6 +269,12 @@ def build_feature_matrix(
     - item_id, warehouse_id (numeric ids for tree models / scaling)
     - transaction_type_* one-hot or single label-encoded
     - item_category (label-encoded if present)
+    - with spec window_hours: window_count, window_quantity_sum, window_quantity_z,
+      hours_since_prev per (item_id, warehouse_id) over the trailing window
+    Label codes come from spec's vocabularies (see build_feature_spec); without a
+    spec they are derived from df itself. Pass a compiled transformer to reuse it
+    across chunks, and transformer.window_history() as history when the chunks
+    are consecutive pages of one created_at-ordered pull.
     """
     if df.empty:
         return pd.DataFrame()
@@ -31,50 +283,22 @@ def build_feature_matrix(
         if c not in df.columns:
             raise ValueError(f"Missing column: {c}")
 
-    out = pd.DataFrame(index=df.index)
-    out["transaction_id"] = df["transaction_id"].astype(np.int64)
-
-    # Numeric
-    out["quantity"] = df["quantity"].astype(float)
-    out["abs_quantity"] = np.abs(out["quantity"])
-    out["unit_price"] = df["unit_price"].fillna(0).astype(float)
-    out["total_amount"] = df["total_amount"].fillna(0).astype(float)
-
-    # Time from timestamp
-    ts = df["created_at_ts"].astype(float)
-    dt = pd.to_datetime(ts, unit="s", utc=True)
-    out["hour"] = dt.dt.hour.astype(float)
-    out["day_of_week"] = dt.dt.dayofweek.astype(float)
-    out["day_of_month"] = dt.dt.day.astype(float)
-
-    # Categorical: label encode for simplicity (tree/scale-friendly)
-    out["item_id"] = df["item_id"].astype(np.int64)
-    out["warehouse_id"] = df["warehouse_id"].astype(np.int64)
-
-    tx_type = df["transaction_type"].fillna("unknown").astype(str)
-    uniq = tx_type.unique()
-    mapping = {v: i for i, v in enumerate(sorted(uniq))}
-    out["transaction_type_enc"] = tx_type.map(mapping).astype(float)
-
-    if "item_category" in df.columns:
-        cat = df["item_category"].fillna("unknown").astype(str)
-        cat_uniq = cat.unique()
-        cat_map = {v: i for i, v in enumerate(sorted(cat_uniq))}
-        out["item_category_enc"] = cat.map(cat_map).astype(float)
-    else:
-        out["item_category_enc"] = 0.0
-
-    feature_cols = get_feature_columns()
+    transformer = transformer or FeatureTransformer(spec or build_feature_spec(df))
+    X = transformer.transform_frame(df, history=history)
+    out = pd.DataFrame(X, columns=transformer.feature_columns, index=df.index)
+    out.insert(0, "transaction_id", df["transaction_id"].astype(np.int64))
+
     if drop_na_rows:
-        out = out.dropna(subset=feature_cols).copy()
+        out = out.dropna(subset=transformer.feature_columns).copy()
 
     return out
 
 
-def get_feature_columns() -> list[str]:
-    """Column names used as model input (no transaction_id)."""
-    return [
+def get_feature_columns(window: bool = False) -> list[str]:
+    """Column names used as model input (no transaction_id); window adds WINDOW_FEATURE_COLUMNS."""
+    columns = [
         "quantity", "abs_quantity", "unit_price", "total_amount",
         "hour", "day_of_week", "day_of_month",
         "item_id", "warehouse_id", "transaction_type_enc", "item_category_enc",
     ]
+    return columns + WINDOW_FEATURE_COLUMNS if window else columns
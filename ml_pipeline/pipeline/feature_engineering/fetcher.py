@@ -1,11 +1,54 @@
 """Fetch ML-ready transaction data from ERP API or load from CSV."""
+import io
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
-from typing import Iterator
+from typing import Iterable, Iterator, Literal
 
 import httpx
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.json
+import pyarrow.parquet as pq
 
 from pipeline.config import Settings
+from pipeline.feature_engineering.api_client import ApiClient, CursorCheckpoint, ThroughputMeter
+from pipeline.feature_engineering.features import get_feature_columns
+
+
+@dataclass
+class ExportFilters:
+    """Server-side filters for /ml/export and /ml/export/stream (pushed into SQL)."""
+    created_from: datetime | str | None = None  # inclusive
+    created_to: datetime | str | None = None  # exclusive
+    warehouse_ids: list[int] = field(default_factory=list)
+    item_ids: list[int] = field(default_factory=list)
+    item_categories: list[str] = field(default_factory=list)
+    transaction_types: list[str] = field(default_factory=list)
+
+    def to_params(self) -> dict:
+        params: dict = {}
+        if self.created_from is not None:
+            params["created_from"] = _iso(self.created_from)
+        if self.created_to is not None:
+            params["created_to"] = _iso(self.created_to)
+        if self.warehouse_ids:
+            params["warehouse_id"] = list(self.warehouse_ids)
+        if self.item_ids:
+            params["item_id"] = list(self.item_ids)
+        if self.item_categories:
+            params["item_category"] = list(self.item_categories)
+        if self.transaction_types:
+            params["transaction_type"] = list(self.transaction_types)
+        return params
+
+
+def _iso(value: datetime | str) -> str:
+    return value.isoformat() if isinstance(value, datetime) else value
 
 
 def fetch_transactions_from_api(
@@ -13,50 +56,168 @@ def fetch_transactions_from_api(
     token: str | None = None,
     batch_size: int = 10_000,
     max_rows: int | None = None,
+    use_cursor: bool = True,
+    filters: ExportFilters | None = None,
+    compact: bool = True,
+    prefetch: int | None = None,
+    http2: bool | None = None,
 ) -> pd.DataFrame:
-    """Pull all pages from GET /api/v1/ml/export and concatenate."""
-    settings = Settings()
-    base_url = base_url or settings.erp_api_base_url.rstrip("/")
-    token = token or settings.erp_api_token
-    batch_size = batch_size or settings.ml_export_batch_size
-
-    headers = {}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-
-    rows: list[dict] = []
-    offset = 0
-    while True:
-        with httpx.Client(timeout=60.0) as client:
-            r = client.get(
-                f"{base_url}/api/v1/ml/export",
-                params={"offset": offset, "limit": batch_size},
-                headers=headers,
-            )
-        r.raise_for_status()
-        data = r.json()
-        batch = data.get("rows") or []
-        if not batch:
-            break
-        for row in batch:
-            row["created_at"] = row.get("created_at")  # keep ISO string or parse later
-        rows.extend(batch)
-        offset += len(batch)
-        if data.get("has_more") is False:
-            break
-        if max_rows and len(rows) >= max_rows:
-            rows = rows[:max_rows]
-            break
-
-    return _rows_to_dataframe(rows)
-
-
-def _rows_to_dataframe(rows: list[dict]) -> pd.DataFrame:
-    if not rows:
+    """
+    Pull all pages from GET /api/v1/ml/export and concatenate.
+    Pages are followed via the keyset next_cursor (constant cost per page);
+    use_cursor=False falls back to offset paging for older API versions.
+    compact=True uses the dictionary-encoded /ml/export/compact payload.
+    See iterate_transactions_from_api for prefetch / http2; shard pages (prefetch > 1)
+    are merged back into (created_at, id) order.
+    """
+    frames = list(iterate_transactions_from_api(
+        base_url, token, batch_size, max_rows, use_cursor, filters, compact, prefetch, http2
+    ))
+    if not frames:
         return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    if "created_at" in df.columns:
-        df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+    df = pd.concat(frames, ignore_index=True)
+    if (prefetch or Settings().ml_export_prefetch) > 1:
+        df = df.sort_values(["created_at", "transaction_id"], ignore_index=True)
+    return df
+
+
+def iterate_changes_from_api(
+    since: str | None = None,
+    base_url: str | None = None,
+    token: str | None = None,
+    batch_size: int = 10_000,
+) -> Iterator[tuple[pd.DataFrame, list[int], str | None]]:
+    """
+    Page GET /api/v1/ml/changes from a watermark (None = full history), yielding
+    (changed_rows_df, deleted_transaction_ids, next_watermark) per page. Everything up
+    to a page's watermark has been yielded once that page is, so it can be committed.
+    """
+    base_url, token, batch_size = _resolve_api(base_url, token, batch_size)
+    watermark = since
+    with ApiClient(base_url, token, max_connections=1) as client:
+        while True:
+            params: dict = {"limit": batch_size}
+            if watermark:
+                params["since"] = watermark
+            data = client.get_json("/api/v1/ml/changes", params)
+            watermark = data.get("next_watermark") or watermark
+            yield _rows_to_dataframe(data.get("rows") or []), data.get("deleted_transaction_ids") or [], watermark
+            if not data.get("has_more"):
+                break
+
+
+def fetch_changes_from_api(
+    since: str | None = None,
+    base_url: str | None = None,
+    token: str | None = None,
+    batch_size: int = 10_000,
+) -> tuple[pd.DataFrame, list[int], str | None]:
+    """
+    Pull GET /api/v1/ml/changes from a watermark (None = full history).
+    Returns (changed_rows_df, deleted_transaction_ids, next_watermark).
+    """
+    frames: list[pd.DataFrame] = []
+    deleted: list[int] = []
+    watermark = since
+    for df, page_deleted, watermark in iterate_changes_from_api(since, base_url, token, batch_size):
+        if not df.empty:
+            frames.append(df)
+        deleted.extend(page_deleted)
+    return (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()), deleted, watermark
+
+
+def sync_transactions_snapshot(
+    snapshot_path: str | Path,
+    base_url: str | None = None,
+    token: str | None = None,
+    batch_size: int = 10_000,
+) -> pd.DataFrame:
+    """
+    Keep a local raw-transaction snapshot (parquet) current via /ml/changes.
+    The watermark lives next to it (<snapshot>.watermark); each run transfers only
+    rows changed or deleted since the last run, then returns the merged snapshot.
+    """
+    snapshot_path = Path(snapshot_path)
+    watermark_path = snapshot_path.with_suffix(".watermark")
+    since = watermark_path.read_text().strip() if watermark_path.exists() and snapshot_path.exists() else None
+    base = pd.read_parquet(snapshot_path) if since else pd.DataFrame()
+
+    changed, deleted, watermark = fetch_changes_from_api(since, base_url, token, batch_size)
+    if not changed.empty:
+        # The feed repeats changes newer than its watermark: keep each transaction's last version
+        changed = changed.drop_duplicates("transaction_id", keep="last", ignore_index=True)
+        changed = changed[~changed["transaction_id"].isin(deleted)]
+    print(f"Changes since watermark: {len(changed)} upserted, {len(deleted)} deleted")
+    if not base.empty:
+        drop = set(deleted)
+        if not changed.empty:
+            drop.update(changed["transaction_id"].tolist())
+        base = base[~base["transaction_id"].isin(drop)]
+    frames = [f for f in (base, changed) if not f.empty]
+    merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not merged.empty:
+        merged = merged.sort_values(["created_at", "transaction_id"], ignore_index=True)
+
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    merged.to_parquet(snapshot_path, index=False)
+    if watermark:
+        watermark_path.write_text(watermark)
+    return merged
+
+
+def _page_params(batch_size: int, offset: int, cursor: str | None, filters: ExportFilters | None = None) -> dict:
+    """Query params for one /ml/export page: keyset cursor when known, else offset."""
+    params = filters.to_params() if filters else {}
+    if cursor:
+        params.update(cursor=cursor, limit=batch_size)
+    else:
+        params.update(offset=offset, limit=batch_size)
+    return params
+
+
+def _rows_to_dataframe(rows: list[dict] | dict[str, list], dimensions: dict | None = None) -> pd.DataFrame:
+    """
+    Export page → DataFrame. rows is a list of row dicts (/ml/export), or with
+    dimensions the compact export's columnar fact table, which is denormalized here:
+    item_sku / item_category / warehouse_code / transaction_type become categoricals
+    gathered from the dimension dictionaries by id.
+    """
+    if dimensions is None:
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows)
+        if "created_at" in df.columns:
+            df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+        return df
+
+    facts = pd.DataFrame(rows)
+    if facts.empty:
+        return pd.DataFrame()
+    items = pd.DataFrame(dimensions["items"], columns=["id", "sku", "category"])
+    warehouses = pd.DataFrame(dimensions["warehouses"], columns=["id", "code"])
+    item_pos = pd.Index(items["id"]).get_indexer(facts["item_id"])
+    wh_pos = pd.Index(warehouses["id"]).get_indexer(facts["warehouse_id"])
+    item_cat = pd.Categorical(items["category"])
+
+    df = pd.DataFrame({
+        "transaction_id": facts["transaction_id"].astype("int64"),
+        "item_id": facts["item_id"].astype("int64"),
+        "item_sku": pd.Categorical.from_codes(item_pos, categories=items["sku"]),
+        "item_category": pd.Categorical.from_codes(
+            np.where(item_pos >= 0, item_cat.codes[item_pos], -1), categories=item_cat.categories
+        ),
+        "warehouse_id": facts["warehouse_id"].astype("int64"),
+        "warehouse_code": pd.Categorical.from_codes(wh_pos, categories=warehouses["code"]),
+        "transaction_type": pd.Categorical.from_codes(
+            facts["transaction_type"].astype("int64"), categories=dimensions["transaction_types"]
+        ),
+        "quantity": facts["quantity"].astype("float64"),
+        "unit_price": facts["unit_price"].astype("float64"),
+        "total_amount": facts["total_amount"].astype("float64"),
+        "reference_type": facts["reference_type"],
+        "created_at": pd.to_datetime(facts["created_at_ts"], unit="s", utc=True),
+        "created_at_ts": facts["created_at_ts"].astype("float64"),
+    })
     return df
 
 
@@ -71,36 +232,397 @@ def load_transactions_from_csv(path: str | Path) -> pd.DataFrame:
     return df
 
 
+def iterate_transactions_from_csv(
+    path: str | Path, chunk_size: int, columns: list[str] | None = None
+) -> Iterator[pd.DataFrame]:
+    """CSV of transactions → DataFrames of chunk_size rows (parsed as load_transactions_from_csv)."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(path)
+    usecols = None if columns is None else (lambda c: c in columns)
+    for df in pd.read_csv(path, chunksize=chunk_size, usecols=usecols):
+        if "created_at" in df.columns:
+            df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+        yield df
+
+
+def _page_worker(
+    client: ApiClient,
+    endpoint: str,
+    shard: int,
+    num_shards: int,
+    batch_size: int,
+    filters: ExportFilters | None,
+    use_cursor: bool,
+    compact: bool,
+    state: dict,
+    out: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """
+    Page one shard (state's id range; all rows when num_shards == 1) from state's
+    cursor / offset, handing (shard, data, n_rows, state after the page) to out; the
+    next request goes out as soon as the page is queued, while the consumer is still
+    decoding earlier pages.
+    """
+    cursor, offset = state.get("cursor"), state.get("offset", 0)
+    id_range = state.get("id_range")
+    dimensions_version = None
+
+    def put(item: tuple) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        while not stop.is_set():
+            params = _page_params(batch_size, offset, cursor, filters)
+            if id_range:
+                params.update({k: v for k, v in id_range.items() if v is not None})
+            if dimensions_version is not None:
+                params["dimensions_version"] = dimensions_version
+            data = client.get_json(endpoint, params)
+            if compact:
+                dimensions_version = (data.get("dimensions") or {}).get("version", dimensions_version)
+                n = len(data["columns"]["transaction_id"])
+            else:
+                n = len(data.get("rows") or [])
+            offset += n
+            cursor = data.get("next_cursor") if use_cursor else None
+            done = not n or data.get("has_more") is False or (use_cursor and not cursor)
+            page_state = {"cursor": cursor, "offset": offset, "done": done, "id_range": id_range}
+            if not put((shard, data, n, page_state)) or done:
+                return
+    except BaseException as e:
+        put((shard, e, 0, None))
+
+
 def iterate_transactions_from_api(
     base_url: str | None = None,
     token: str | None = None,
     batch_size: int = 10_000,
     max_rows: int | None = None,
+    use_cursor: bool = True,
+    filters: ExportFilters | None = None,
+    compact: bool = True,
+    prefetch: int | None = None,
+    http2: bool | None = None,
+    checkpoint: str | Path | None = None,
 ) -> Iterator[pd.DataFrame]:
-    """Yield one DataFrame per page (for streaming)."""
+    """
+    Yield one DataFrame per page (for streaming) over one pooled client (see ApiClient
+    for HTTP/2 and retries). Follows next_cursor unless use_cursor=False. With
+    compact=True, item/warehouse dictionaries are fetched once and reused across pages.
+
+    A background thread requests the next page as soon as the previous one is in, so
+    network time overlaps decoding and the consumer. Keyset pages are sequential, so
+    prefetch=K > 1 (ML_EXPORT_PREFETCH) pulls K contiguous id ranges (/ml/export/shards,
+    fetched once per pull and kept in the checkpoint) concurrently, K requests in
+    flight; pages then arrive interleaved across shards, each shard in (created_at, id)
+    order.
+
+    With checkpoint (a JSON file path), each shard's cursor is saved once the consumer
+    is done with a page (when it asks for the next one). Rerunning with the same
+    arguments resumes after the last completed page; a finished pull yields nothing.
+    max_rows (the first rows in (created_at, id) order) needs prefetch=1.
+    """
+    base_url, token, batch_size = _resolve_api(base_url, token, batch_size)
+    num_shards = max(1, prefetch or Settings().ml_export_prefetch)
+    if num_shards > 1 and not use_cursor:
+        raise ValueError("prefetch > 1 needs cursor paging (use_cursor=True)")
+    if num_shards > 1 and max_rows:
+        raise ValueError("max_rows needs prefetch 1: shard pages arrive interleaved, not in (created_at, id) order")
+    if checkpoint is not None and max_rows:
+        raise ValueError("max_rows can't be combined with checkpoint")
+    endpoint = "/api/v1/ml/export/compact" if compact else "/api/v1/ml/export"
+
+    ckpt = None
+    if checkpoint is not None:
+        key = {
+            "endpoint": endpoint,
+            "filters": filters.to_params() if filters else {},
+            "batch_size": batch_size,
+            "shards": num_shards,
+            "use_cursor": use_cursor,
+        }
+        if num_shards > 1:
+            key["sharding"] = "id_range"
+        ckpt = CursorCheckpoint(checkpoint, key, num_shards)
+    states = ckpt.shards if ckpt else {k: {} for k in range(num_shards)}
+    pending = [k for k, st in states.items() if not st.get("done")]
+    if not pending:
+        return
+
+    meter = ThroughputMeter(endpoint)
+    client = ApiClient(base_url, token, http2, max_connections=num_shards, meter=meter)
+    if num_shards > 1 and not any(st for st in states.values()):
+        shards = client.get_json("/api/v1/ml/export/shards", {"num_shards": num_shards})["shards"]
+        for k, id_range in enumerate(shards):
+            states[k]["id_range"] = id_range
+    out: queue.Queue = queue.Queue(maxsize=num_shards)
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=_page_worker,
+            args=(client, endpoint, k, num_shards, batch_size, filters, use_cursor, compact, states[k], out, stop),
+            name=f"export-page-{k}",
+            daemon=True,
+        )
+        for k in pending
+    ]
+    for w in workers:
+        w.start()
+
+    dimensions: dict[int, dict | None] = {}
+    total = 0
+    live = len(workers)
+    try:
+        while live:
+            shard, data, n, state = out.get()
+            if isinstance(data, BaseException):
+                raise data
+            if state["done"]:
+                live -= 1
+            if n:
+                if compact:
+                    dimensions[shard] = data.get("dimensions") or dimensions.get(shard)
+                    df = _rows_to_dataframe(data["columns"], dimensions[shard])
+                else:
+                    df = _rows_to_dataframe(data["rows"])
+                if max_rows and total + len(df) > max_rows:
+                    df = df.iloc[: max_rows - total]
+                meter.add(rows=len(df))
+                yield df
+                total += len(df)
+                meter.log()
+            if ckpt is not None:
+                ckpt.update(shard, state, n)
+            if max_rows and total >= max_rows:
+                break
+    finally:
+        stop.set()
+        for w in workers:
+            w.join(timeout=5)
+        client.close()
+        meter.log(force=True)
+
+
+def _spool_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Page → Arrow table whose schema doesn't depend on the page: categoricals (page-local
+    dictionaries) become plain strings and all-null text columns are typed as strings.
+    """
+    df = df.assign(**{
+        c: df[c].astype(object).where(df[c].notna(), None)
+        for c in df.columns
+        if isinstance(df[c].dtype, pd.CategoricalDtype)
+    })
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, f in enumerate(table.schema):
+        if pa.types.is_null(f.type):
+            table = table.set_column(i, pa.field(f.name, pa.string()), table.column(i).cast(pa.string()))
+    return table
+
+
+def spool_transactions_from_api(
+    spool_dir: str | Path,
+    base_url: str | None = None,
+    token: str | None = None,
+    batch_size: int = 10_000,
+    filters: ExportFilters | None = None,
+    compact: bool = True,
+    prefetch: int | None = None,
+    http2: bool | None = None,
+) -> Path:
+    """
+    Resumable pull: write each page to spool_dir/part-<n>.parquet and checkpoint
+    (spool_dir/_checkpoint.json) after it. If the process dies, rerunning with the
+    same arguments drops any part written after the last checkpoint and resumes there.
+    A complete spool is left as is (delete the dir to pull again). Read it back
+    with pd.read_parquet(spool_dir).
+    """
+    spool_dir = Path(spool_dir)
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = spool_dir / "_checkpoint.json"
+    state = CursorCheckpoint.read(checkpoint) or {}
+    if state.get("complete"):
+        print(f"Spool {spool_dir} is complete ({state['rows']:,} rows)")
+        return spool_dir
+    pages = state.get("pages", 0)
+    for part in spool_dir.glob("part-*.parquet"):
+        if int(part.stem.split("-")[1]) >= pages:
+            part.unlink()
+    if pages:
+        print(f"Resuming pull into {spool_dir} after {pages} pages ({state['rows']:,} rows)")
+    pages_iter = iterate_transactions_from_api(
+        base_url, token, batch_size, None, True, filters, compact, prefetch, http2, checkpoint
+    )
+    for n, df in enumerate(pages_iter, start=pages):
+        pq.write_table(_spool_table(df), spool_dir / f"part-{n:06d}.parquet")
+    return spool_dir
+
+
+def _resolve_api(base_url: str | None, token: str | None, batch_size: int | None) -> tuple[str, str | None, int]:
+    settings = Settings()
+    return (
+        (base_url or settings.erp_api_base_url).rstrip("/"),
+        token or settings.erp_api_token,
+        batch_size or settings.ml_export_batch_size,
+    )
+
+
+class _ByteChunksIO(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks (e.g. httpx iter_bytes)."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            try:
+                self._buf = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def _iter_ndjson_tables(lines: Iterable[str], chunk_lines: int) -> Iterator[pa.Table]:
+    """Group NDJSON lines into blocks and parse each block with Arrow's JSON reader."""
+    block: list[str] = []
+    for line in lines:
+        if line:
+            block.append(line)
+        if len(block) >= chunk_lines:
+            yield pyarrow.json.read_json(io.BytesIO("\n".join(block).encode()))
+            block = []
+    if block:
+        yield pyarrow.json.read_json(io.BytesIO("\n".join(block).encode()))
+
+
+def _table_to_dataframe(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas()
+    if "created_at" in df.columns:
+        df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+    return df
+
+
+def _iter_stream_tables(
+    path: str,
+    base_url: str | None,
+    token: str | None,
+    fmt: Literal["arrow", "ndjson"],
+    chunk_size: int | None,
+    max_rows: int | None,
+    filters: ExportFilters | None,
+) -> Iterator[pa.Table]:
+    """GET a streaming ML endpoint and yield one Arrow table per record batch (or NDJSON block)."""
     settings = Settings()
-    base_url = base_url or settings.erp_api_base_url.rstrip("/")
+    base_url = (base_url or settings.erp_api_base_url).rstrip("/")
     token = token or settings.erp_api_token
-    batch_size = batch_size or settings.ml_export_batch_size
+    chunk_size = chunk_size or settings.ml_export_batch_size
     headers = {"Authorization": f"Bearer {token}"} if token else {}
 
-    offset = 0
     total = 0
-    while True:
-        with httpx.Client(timeout=60.0) as client:
-            r = client.get(
-                f"{base_url}/api/v1/ml/export",
-                params={"offset": offset, "limit": batch_size},
-                headers=headers,
-            )
-        r.raise_for_status()
-        data = r.json()
-        batch = data.get("rows") or []
-        if not batch:
-            break
-        df = _rows_to_dataframe(batch)
-        yield df
-        offset += len(batch)
-        total += len(df)
-        if data.get("has_more") is False or (max_rows and total >= max_rows):
-            break
+    with httpx.Client(timeout=httpx.Timeout(60.0, read=None)) as client:
+        with client.stream(
+            "GET",
+            f"{base_url}{path}",
+            params={**(filters.to_params() if filters else {}), "format": fmt, "chunk_size": chunk_size},
+            headers=headers,
+        ) as r:
+            r.raise_for_status()
+            if fmt == "arrow":
+                reader = pyarrow.ipc.open_stream(io.BufferedReader(_ByteChunksIO(r.iter_bytes())))
+                tables = (pa.Table.from_batches([batch]) for batch in reader)
+            else:
+                tables = _iter_ndjson_tables(r.iter_lines(), chunk_size)
+            for table in tables:
+                if max_rows and total + table.num_rows > max_rows:
+                    table = table.slice(0, max_rows - total)
+                total += table.num_rows
+                yield table
+                if max_rows and total >= max_rows:
+                    break
+
+
+def iterate_transactions_from_stream(
+    base_url: str | None = None,
+    token: str | None = None,
+    fmt: Literal["arrow", "ndjson"] = "arrow",
+    chunk_size: int | None = None,
+    max_rows: int | None = None,
+    filters: ExportFilters | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read GET /api/v1/ml/export/stream incrementally and yield one DataFrame per
+    Arrow record batch (or NDJSON block). Rows never exist as Python dicts.
+    """
+    for table in _iter_stream_tables("/api/v1/ml/export/stream", base_url, token, fmt, chunk_size, max_rows, filters):
+        yield _table_to_dataframe(table)
+
+
+def fetch_transactions_from_stream(
+    base_url: str | None = None,
+    token: str | None = None,
+    fmt: Literal["arrow", "ndjson"] = "arrow",
+    chunk_size: int | None = None,
+    max_rows: int | None = None,
+    filters: ExportFilters | None = None,
+) -> pd.DataFrame:
+    """Full pull via /ml/export/stream, concatenated into one DataFrame."""
+    frames = list(iterate_transactions_from_stream(base_url, token, fmt, chunk_size, max_rows, filters))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch_feature_vocabularies(base_url: str | None = None, token: str | None = None) -> dict[str, list[str]]:
+    """Label-encoding vocabularies the API uses for /ml/features (one single-row page)."""
+    with ApiClient(base_url, token, max_connections=1) as client:
+        return client.get_json("/api/v1/ml/features", {"limit": 1})["vocabularies"]
+
+
+def iterate_features_from_stream(
+    base_url: str | None = None,
+    token: str | None = None,
+    fmt: Literal["arrow", "ndjson"] = "arrow",
+    chunk_size: int | None = None,
+    max_rows: int | None = None,
+    filters: ExportFilters | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read the server-computed feature matrix from GET /api/v1/ml/features/stream:
+    transaction_id + get_feature_columns() as float32, one DataFrame per chunk.
+    """
+    feature_cols = get_feature_columns()
+    for table in _iter_stream_tables("/api/v1/ml/features/stream", base_url, token, fmt, chunk_size, max_rows, filters):
+        df = table.to_pandas()
+        df["transaction_id"] = df["transaction_id"].astype(np.int64)
+        df[feature_cols] = df[feature_cols].astype(np.float32)
+        yield df[["transaction_id", *feature_cols]]
+
+
+def fetch_features_from_stream(
+    base_url: str | None = None,
+    token: str | None = None,
+    fmt: Literal["arrow", "ndjson"] = "arrow",
+    chunk_size: int | None = None,
+    max_rows: int | None = None,
+    filters: ExportFilters | None = None,
+) -> pd.DataFrame:
+    """Feature matrix built by the API (same layout as build_feature_matrix), no raw-row stage."""
+    frames = list(iterate_features_from_stream(base_url, token, fmt, chunk_size, max_rows, filters))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
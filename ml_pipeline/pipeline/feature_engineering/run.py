@@ -3,56 +3,324 @@ import argparse
 import sys
 from pathlib import Path
 
+import pandas as pd
+
 # Allow running as python -m pipeline.feature_engineering.run
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from pipeline.config import Settings, get_features_dir, get_data_dir
-from pipeline.feature_engineering.fetcher import fetch_transactions_from_api, load_transactions_from_csv
-from pipeline.feature_engineering.features import build_feature_matrix
+from pipeline.feature_engineering.db_source import (
+    fetch_feature_vocabularies_from_db,
+    fetch_transactions_from_db,
+    iterate_transactions_from_db,
+)
+from pipeline.feature_engineering.fetcher import (
+    ExportFilters,
+    fetch_feature_vocabularies,
+    fetch_features_from_stream,
+    fetch_transactions_from_api,
+    fetch_transactions_from_stream,
+    iterate_transactions_from_api,
+    iterate_transactions_from_csv,
+    iterate_transactions_from_stream,
+    load_transactions_from_csv,
+    spool_transactions_from_api,
+    sync_transactions_snapshot,
+)
+from pipeline.feature_engineering.features import (
+    CATEGORICAL_COLUMNS,
+    build_feature_matrix,
+    build_feature_spec,
+    build_feature_spec_from_chunks,
+    make_feature_spec,
+    save_feature_spec,
+)
+from pipeline.feature_engineering.store import sync_feature_store
+from pipeline.feature_engineering.stream import write_features_streaming
+from pipeline.parquet_io import PARTITION_BY, iter_parquet_chunks
 
 
 def main():
     p = argparse.ArgumentParser(description="Build feature matrix from ERP transactions")
-    p.add_argument("--source", choices=["api", "csv"], default="api", help="Data source")
+    p.add_argument("--source", choices=["api", "csv", "db"], default="api", help="Data source")
     p.add_argument("--csv-path", type=str, help="Path to CSV when source=csv")
+    p.add_argument("--database-url", type=str, default=None, help="ERP database when source=db (default DATABASE_URL)")
+    p.add_argument(
+        "--db-method",
+        choices=["auto", "cursor", "copy"],
+        default="auto",
+        help="source=db: server-side cursor + fetchmany, or Postgres COPY to CSV (auto: copy on Postgres)",
+    )
     p.add_argument("--output", type=str, help="Output path (default: features/transactions_featured.parquet)")
     p.add_argument("--max-rows", type=int, default=None, help="Cap rows (dev)")
     p.add_argument("--api-url", type=str, default=None, help="Override ERP API base URL")
     p.add_argument("--token", type=str, default=None, help="JWT for API")
+    p.add_argument("--stream", action="store_true", help="Use /ml/export/stream (Arrow IPC) instead of paged JSON")
+    p.add_argument(
+        "--server-features",
+        action="store_true",
+        help="Pull the feature matrix computed by the API (/ml/features/stream) instead of raw rows",
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Sync data/transactions_raw.parquet via /ml/changes (only rows changed since last run) and featurize it",
+    )
+    p.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Feature store dir (date partitions + manifest): rebuilt from /ml/changes, or updated with --update",
+    )
+    p.add_argument(
+        "--update",
+        action="store_true",
+        help="With --store: pull only rows changed since the store's watermark instead of rebuilding it",
+    )
+    p.add_argument(
+        "--prefetch",
+        type=int,
+        default=None,
+        help="Paged pull: page requests in flight (K > 1 pulls K id-range shards; default ML_EXPORT_PREFETCH)",
+    )
+    p.add_argument("--http2", action="store_true", default=None, help="Paged pull over HTTP/2 (needs h2)")
+    p.add_argument(
+        "--spool",
+        type=str,
+        default=None,
+        help="Paged pull into a resumable Parquet spool dir (rerun after a failure to continue), then featurize it",
+    )
+    p.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Featurize page by page and append row groups to the output (memory independent of the pull size)",
+    )
+    p.add_argument(
+        "--partition-by",
+        choices=PARTITION_BY,
+        default=None,
+        help="With --chunked: write OUTPUT/date=YYYY-MM-DD/ or OUTPUT/warehouse=ID/ partitions",
+    )
+    p.add_argument("--chunk-size", type=int, default=None, help="Rows per page/chunk (default ML_EXPORT_BATCH_SIZE)")
+    p.add_argument(
+        "--window-features",
+        action="store_true",
+        default=None,
+        help="Add rolling per-(item, warehouse) features over the trailing TIME_WINDOW_HOURS (default WINDOW_FEATURES)",
+    )
+    p.add_argument("--created-from", type=str, default=None, help="Export filter (api/db): created_at >= (ISO date/time)")
+    p.add_argument("--created-to", type=str, default=None, help="Export filter (api/db): created_at < (ISO date/time)")
+    p.add_argument("--warehouse-id", type=int, action="append", default=[], help="Export filter (api/db) (repeatable)")
+    p.add_argument("--item-id", type=int, action="append", default=[], help="Export filter (api/db) (repeatable)")
+    p.add_argument("--item-category", type=str, action="append", default=[], help="Export filter (api/db) (repeatable)")
+    p.add_argument(
+        "--transaction-type",
+        choices=["in", "out", "adjust", "transfer"],
+        action="append",
+        default=[],
+        help="Export filter (api/db) (repeatable)",
+    )
     args = p.parse_args()
 
+    filters = ExportFilters(
+        created_from=args.created_from,
+        created_to=args.created_to,
+        warehouse_ids=args.warehouse_id,
+        item_ids=args.item_id,
+        item_categories=args.item_category,
+        transaction_types=args.transaction_type,
+    )
+    if args.incremental and filters.to_params():
+        p.error("export filters are not supported with --incremental")
+
+    if args.server_features and args.incremental:
+        p.error("--server-features cannot be combined with --incremental")
+    if args.spool and (args.max_rows or args.stream or args.incremental or args.server_features):
+        p.error("--spool is a full paged pull; it cannot be combined with --max-rows/--stream/--incremental")
+
+    if args.source == "db" and (args.server_features or args.incremental or args.stream or args.spool):
+        p.error("--source db reads the database directly; API pull options don't apply")
+    if args.chunked and (args.server_features or args.incremental):
+        p.error("--chunked cannot be combined with --server-features or --incremental")
+    if args.partition_by and not args.chunked:
+        p.error("--partition-by needs --chunked")
+    if args.source == "csv" and not args.csv_path:
+        print("--csv-path required when source=csv")
+        sys.exit(1)
+
+    if args.store and (args.source != "api" or args.server_features or args.chunked or args.spool):
+        p.error("--store syncs from the API's /ml/changes; it cannot be combined with other sources or pull modes")
+    if args.update and not args.store:
+        p.error("--update applies to a feature store; use --store DIR --update")
+    if args.store and args.incremental:
+        p.error("--incremental syncs data/transactions_raw.parquet; update a feature store with --store DIR --update")
+    if args.store and (filters.to_params() or args.max_rows):
+        p.error("--store always holds every transaction; export filters and --max-rows don't apply")
+
     settings = Settings()
-    if args.source == "api":
+    paged_pull = args.source == "api" and not (args.server_features or args.incremental or args.stream or args.store)
+    if paged_pull and args.max_rows and (args.prefetch or settings.ml_export_prefetch) > 1:
+        p.error("--max-rows takes the first rows in (created_at, id) order; it needs --prefetch 1")
+    window_hours = settings.time_window_hours if (args.window_features or settings.window_features) else None
+    if window_hours and (args.server_features or args.store):
+        p.error("window features are computed from raw rows; --server-features and --store don't provide them")
+    if args.store:
+        stats = sync_feature_store(
+            args.store,
+            base_url=args.api_url or settings.erp_api_base_url,
+            token=args.token or settings.erp_api_token,
+            batch_size=args.chunk_size or settings.ml_export_batch_size,
+            rebuild=not args.update,
+        )
+        print(
+            f"{'Rebuilt' if stats['full'] else 'Updated'} feature store {args.store} in {stats['seconds']:.1f}s: "
+            f"{stats['upserted']} rows upserted, {stats['deleted']} deleted, {stats['appended']} partition appends, "
+            f"{stats['rewritten']} partition rewrites; {stats['rows']} rows in {stats['partitions']} partitions"
+        )
+        return
+    if args.chunked:
+        _run_chunked(args, settings, filters, window_hours)
+        return
+
+    feat = None
+    if args.source == "api" and args.server_features:
+        feat = fetch_features_from_stream(
+            base_url=args.api_url or settings.erp_api_base_url,
+            token=args.token or settings.erp_api_token,
+            max_rows=args.max_rows,
+            filters=filters,
+        )
+        spec = _source_feature_spec(args, settings, None)
+        df = feat
+    elif args.source == "db":
+        df = fetch_transactions_from_db(
+            args.database_url, args.chunk_size or settings.ml_export_batch_size, args.max_rows, filters, args.db_method
+        )
+    elif args.source == "api" and args.incremental:
+        df = sync_transactions_snapshot(
+            get_data_dir() / "transactions_raw.parquet",
+            base_url=args.api_url or settings.erp_api_base_url,
+            token=args.token or settings.erp_api_token,
+        )
+    elif args.source == "api" and args.stream:
+        df = fetch_transactions_from_stream(
+            base_url=args.api_url or settings.erp_api_base_url,
+            token=args.token or settings.erp_api_token,
+            max_rows=args.max_rows,
+            filters=filters,
+        )
+    elif args.source == "api" and args.spool:
+        spool_dir = spool_transactions_from_api(
+            args.spool,
+            base_url=args.api_url or settings.erp_api_base_url,
+            token=args.token or settings.erp_api_token,
+            filters=filters,
+            prefetch=args.prefetch,
+            http2=args.http2,
+        )
+        df = pd.read_parquet(spool_dir)
+    elif args.source == "api":
         df = fetch_transactions_from_api(
             base_url=args.api_url or settings.erp_api_base_url,
             token=args.token or settings.erp_api_token,
             max_rows=args.max_rows,
+            filters=filters,
+            prefetch=args.prefetch,
+            http2=args.http2,
         )
     else:
-        if not args.csv_path:
-            print("--csv-path required when source=csv")
-            sys.exit(1)
         df = load_transactions_from_csv(args.csv_path)
 
     if df.empty:
         print("No transactions loaded.")
         sys.exit(0)
 
-    feat = build_feature_matrix(df, drop_na_rows=True)
+    if feat is None:
+        spec = _source_feature_spec(args, settings, window_hours) or build_feature_spec(df, window_hours)
+        feat = build_feature_matrix(df, drop_na_rows=True, spec=spec)
     if feat.empty:
         print("No rows after feature build.")
         sys.exit(0)
 
-    out_path = args.output
-    if not out_path:
-        base = Path.cwd()
-        get_features_dir(base).mkdir(parents=True, exist_ok=True)
-        out_path = get_features_dir(base) / "transactions_featured.parquet"
-    out_path = Path(out_path)
+    out_path = _output_path(args)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     feat.to_parquet(out_path, index=False)
-    print(f"Wrote {len(feat)} rows to {out_path}")
+    # Vocabularies / column order travel with the features into the model dir (see training.train)
+    spec_path = save_feature_spec(spec, out_path.parent)
+    print(f"Wrote {len(feat)} rows to {out_path} (spec: {spec_path})")
+
+
+def _output_path(args: argparse.Namespace) -> Path:
+    if args.output:
+        return Path(args.output)
+    name = "transactions_featured" if args.partition_by else "transactions_featured.parquet"
+    return get_features_dir(Path.cwd()) / name
+
+
+def _source_feature_spec(args: argparse.Namespace, settings: Settings, window_hours: int | None) -> dict | None:
+    """
+    Spec from the source's global vocabularies (the API's /ml/features, or the same
+    lists read from the database), so codes don't depend on which rows were pulled;
+    None for CSV, whose vocabularies come from the data.
+    """
+    if args.source == "db":
+        return make_feature_spec(fetch_feature_vocabularies_from_db(args.database_url), window_hours)
+    if args.source == "api":
+        vocabularies = fetch_feature_vocabularies(
+            args.api_url or settings.erp_api_base_url, args.token or settings.erp_api_token
+        )
+        return make_feature_spec(vocabularies, window_hours)
+    return None
+
+
+def _run_chunked(
+    args: argparse.Namespace, settings: Settings, filters: ExportFilters, window_hours: int | None
+) -> None:
+    """
+    --chunked: the spec is fixed before the first page (_source_feature_spec, or a first
+    pass over the CSV's category columns), then pages are featurized and written one at
+    a time. Window features need the pages in created_at order.
+    """
+    chunk_size = args.chunk_size or settings.ml_export_batch_size
+    base_url = args.api_url or settings.erp_api_base_url
+    token = args.token or settings.erp_api_token
+    if args.source == "csv":
+        spec = build_feature_spec_from_chunks(
+            iterate_transactions_from_csv(args.csv_path, chunk_size, columns=list(CATEGORICAL_COLUMNS.values())),
+            window_hours,
+        )
+        pages = iterate_transactions_from_csv(args.csv_path, chunk_size)
+    elif args.source == "db":
+        spec = _source_feature_spec(args, settings, window_hours)
+        pages = iterate_transactions_from_db(args.database_url, chunk_size, filters, args.db_method)
+    else:
+        spec = _source_feature_spec(args, settings, window_hours)
+        if args.spool:
+            spool_dir = spool_transactions_from_api(
+                args.spool, base_url, token, chunk_size, filters, prefetch=args.prefetch, http2=args.http2
+            )
+            pages = iter_parquet_chunks(spool_dir, chunk_size)
+        elif args.stream:
+            pages = iterate_transactions_from_stream(
+                base_url, token, chunk_size=chunk_size, max_rows=args.max_rows, filters=filters
+            )
+        else:
+            pages = iterate_transactions_from_api(
+                base_url, token, chunk_size, args.max_rows, filters=filters, prefetch=args.prefetch, http2=args.http2
+            )
+
+    out_path = _output_path(args)
+    try:
+        stats = write_features_streaming(pages, out_path, spec, args.partition_by, max_rows=args.max_rows)
+    except (FileExistsError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    spec_path = save_feature_spec(spec, out_path.parent)
+    print(
+        f"Wrote {stats['rows']} of {stats['rows_in']} rows to {stats['output']} in {stats['seconds']:.1f}s "
+        f"({stats['rows_per_s']:,.0f} rows/s; spec: {spec_path})"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,317 @@
+"""
+Incremental feature store: a directory of date-partitioned Parquet files
+(ROOT/date=YYYY-MM-DD/part-<id>.parquet) plus ROOT/manifest.json and ROOT/feature_spec.json.
+
+The manifest is the source of truth: it lists each partition's files and records the
+/ml/changes watermark the store is current to, the created_at/id high-water mark of
+the rows it holds, and the hash of the feature spec they were encoded with. It is
+replaced by rename after every batch, so readers and a crashed sync always see a
+consistent set of files; files it doesn't list are leftovers and are deleted.
+
+A sync pulls /ml/changes from the watermark: rows past the store's ids land in new
+part files of their date partitions; partitions holding rows that were updated or
+deleted are rewritten without them (one compacted file). Readers get the store as
+one pyarrow dataset, pruned to a date range through the partition list.
+"""
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pipeline.feature_engineering.features import (
+    FeatureTransformer,
+    build_feature_matrix,
+    feature_spec_hash,
+    make_feature_spec,
+    save_feature_spec,
+)
+from pipeline.feature_engineering.fetcher import fetch_feature_vocabularies, iterate_changes_from_api
+from pipeline.parquet_io import partition_keys
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+# Rows without created_at_ts; never matched by a date range
+UNKNOWN_PARTITION = "unknown"
+
+
+def is_feature_store(path: str | Path) -> bool:
+    return (Path(path) / MANIFEST_FILENAME).is_file()
+
+
+def _partition_in_range(key: str, date_from: Optional[str], date_to: Optional[str]) -> bool:
+    """date_from inclusive, date_to exclusive (YYYY-MM-DD or anything pd.Timestamp parses)."""
+    if date_from is None and date_to is None:
+        return True
+    if key == UNKNOWN_PARTITION:
+        return False
+    if date_from is not None and key < pd.Timestamp(date_from).strftime("%Y-%m-%d"):
+        return False
+    if date_to is not None and key >= pd.Timestamp(date_to).strftime("%Y-%m-%d"):
+        return False
+    return True
+
+
+class FeatureStore:
+    """Read / update a feature store directory (see module docstring)."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        path = self.root / MANIFEST_FILENAME
+        self.manifest: Optional[dict[str, Any]] = json.loads(path.read_text()) if path.exists() else None
+
+    # Reading
+
+    @property
+    def columns(self) -> list[str]:
+        """Stored columns: transaction_id, the feature columns, created_at_ts."""
+        return self._schema(self.manifest["feature_columns"]).names
+
+    def partitions(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> list[str]:
+        if self.manifest is None:
+            return []
+        return sorted(k for k in self.manifest["partitions"] if _partition_in_range(k, date_from, date_to))
+
+    def files(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> list[Path]:
+        return [
+            self.root / f"date={key}" / name
+            for key in self.partitions(date_from, date_to)
+            for name in self.manifest["partitions"][key]["files"]
+        ]
+
+    def dataset(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> ds.Dataset:
+        """The listed files of the partitions in [date_from, date_to) as one dataset (with a `date` column)."""
+        if self.manifest is None:
+            raise FileNotFoundError(f"No feature store at {self.root} (missing {MANIFEST_FILENAME})")
+        partition_schema = pa.schema([("date", pa.string())])
+        return ds.dataset(
+            [str(f) for f in self.files(date_from, date_to)],
+            schema=pa.unify_schemas([self._schema(self.manifest["feature_columns"]), partition_schema]),
+            format="parquet",
+            partitioning=ds.partitioning(partition_schema, flavor="hive"),
+            partition_base_dir=str(self.root),
+        )
+
+    def read(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        columns: Optional[list[str]] = None,
+    ) -> pd.DataFrame:
+        """Rows of [date_from, date_to); columns default to the stored ones (pass "date" to get the partition)."""
+        return self.dataset(date_from, date_to).to_table(columns=columns or self.columns).to_pandas()
+
+    def iter_chunks(
+        self,
+        chunk_size: int,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        columns: Optional[list[str]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        dataset = self.dataset(date_from, date_to)
+        for batch in dataset.to_batches(columns=columns or self.columns, batch_size=chunk_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    # Writing
+
+    @staticmethod
+    def _schema(feature_columns: list[str]) -> pa.Schema:
+        return pa.schema(
+            [("transaction_id", pa.int64())]
+            + [(c, pa.float64()) for c in feature_columns]
+            + [("created_at_ts", pa.float64())]
+        )
+
+    def reset(self, spec: dict[str, Any]) -> None:
+        """Start an empty store for spec (in memory; the old files stay valid until the next commit)."""
+        self.manifest = {
+            "version": MANIFEST_VERSION,
+            "spec_hash": feature_spec_hash(spec),
+            "feature_columns": spec["feature_columns"],
+            "watermark": None,
+            "high_watermark": None,
+            "rows": 0,
+            "updated_at": None,
+            "partitions": {},
+        }
+
+    def _read_partition(self, key: str, columns: Optional[list[str]] = None) -> pa.Table:
+        files = [self.root / f"date={key}" / name for name in self.manifest["partitions"][key]["files"]]
+        return pa.concat_tables([pq.read_table(f, columns=columns) for f in files])
+
+    def _write_part(self, key: str, table: pa.Table) -> str:
+        name = f"part-{uuid.uuid4().hex[:16]}.parquet"
+        path = self.root / f"date={key}" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, path)
+        return name
+
+    def _holding(self, ids: np.ndarray) -> list[str]:
+        """Partitions holding any of the sorted ids (id range from the manifest first, then their id column)."""
+        hits = []
+        for key, part in self.manifest["partitions"].items():
+            lo = np.searchsorted(ids, part["min_id"], side="left")
+            hi = np.searchsorted(ids, part["max_id"], side="right")
+            if lo == hi:
+                continue
+            stored = self._read_partition(key, ["transaction_id"]).column(0).to_numpy()
+            if np.isin(stored, ids[lo:hi]).any():
+                hits.append(key)
+        return hits
+
+    def apply(self, features: pd.DataFrame, remove_ids: np.ndarray) -> dict[str, int]:
+        """
+        Upsert featurized rows (transaction_id, feature columns, created_at_ts) and drop
+        remove_ids (the changed and deleted transactions). Partitions holding removed ids
+        are rewritten; the others get the new rows as an extra file. Call commit() after.
+        """
+        schema = self._schema(self.manifest["feature_columns"])
+        parts = self.manifest["partitions"]
+        remove_ids = np.unique(np.asarray(remove_ids, dtype=np.int64))
+        rewrite = set(self._holding(remove_ids)) if len(remove_ids) else set()
+
+        new_by_key: dict[str, pa.Table] = {}
+        if not features.empty:
+            keys = partition_keys(features, "date")
+            table = pa.Table.from_pandas(features[schema.names], schema=schema, preserve_index=False)
+            for key, idx in pd.Series(keys).groupby(keys, sort=False).indices.items():
+                new_by_key[str(key)] = table.take(idx)
+            ts = features["created_at_ts"].to_numpy(dtype=np.float64)
+            ids = features["transaction_id"].to_numpy(dtype=np.int64)
+            valid = np.isfinite(ts)
+            if valid.any():
+                order = np.lexsort((ids[valid], ts[valid]))
+                top = (float(ts[valid][order[-1]]), int(ids[valid][order[-1]]))
+                high = self.manifest["high_watermark"]
+                if high is None or top > (high["created_at_ts"], high["transaction_id"]):
+                    self.manifest["high_watermark"] = {
+                        "created_at": datetime.fromtimestamp(top[0], timezone.utc).isoformat(),
+                        "created_at_ts": top[0],
+                        "transaction_id": top[1],
+                    }
+
+        for key in sorted(rewrite | set(new_by_key)):
+            new = new_by_key.get(key)
+            if key in rewrite:
+                kept = self._read_partition(key)
+                kept = kept.filter(pc.invert(pc.is_in(kept["transaction_id"], pa.array(remove_ids))))
+                table = pa.concat_tables([kept, new]) if new is not None else kept
+                table = table.sort_by([("created_at_ts", "ascending"), ("transaction_id", "ascending")])
+                files: list[str] = [self._write_part(key, table)] if table.num_rows else []
+            else:
+                table = new.sort_by([("created_at_ts", "ascending"), ("transaction_id", "ascending")])
+                files = parts.get(key, {}).get("files", []) + [self._write_part(key, table)]
+            if not files:
+                parts.pop(key, None)
+                continue
+            ids = table["transaction_id"].to_numpy()
+            old = parts.get(key) if key not in rewrite else None
+            parts[key] = {
+                "files": files,
+                "rows": (old["rows"] if old else 0) + table.num_rows,
+                "min_id": int(min(ids.min(), old["min_id"])) if old else int(ids.min()),
+                "max_id": int(max(ids.max(), old["max_id"])) if old else int(ids.max()),
+            }
+        self.manifest["rows"] = sum(p["rows"] for p in parts.values())
+        return {"rewritten": len(rewrite), "appended": len(set(new_by_key) - rewrite)}
+
+    def commit(self, watermark: Optional[str], spec: dict[str, Any]) -> None:
+        """Record watermark, write spec and manifest (temp file + rename), then delete unlisted files."""
+        self.manifest["watermark"] = watermark
+        self.manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self.root.mkdir(parents=True, exist_ok=True)
+        save_feature_spec(spec, self.root)
+        tmp = self.root / f".{MANIFEST_FILENAME}.tmp"
+        tmp.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp, self.root / MANIFEST_FILENAME)
+        self._remove_unlisted()
+
+    def _remove_unlisted(self) -> None:
+        listed = {f.resolve() for f in self.files()}
+        for path in self.root.glob("date=*/part-*.parquet"):
+            if path.resolve() not in listed:
+                path.unlink()
+        for directory in self.root.glob("date=*"):
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+
+
+def sync_feature_store(
+    root: str | Path,
+    base_url: str | None = None,
+    token: str | None = None,
+    batch_size: int = 10_000,
+    rebuild: bool = False,
+    buffer_rows: int = 200_000,
+) -> dict[str, Any]:
+    """
+    Bring the store at root up to date with /ml/changes. Without a manifest, with
+    rebuild=True, or when the API's vocabularies no longer hash to the manifest's spec
+    (codes would shift), the store is rebuilt from the full history. Changes are
+    applied and committed every buffer_rows rows, so an interrupted sync resumes from
+    the last commit. Returns counts of the run.
+    """
+    store = FeatureStore(root)
+    spec = make_feature_spec(fetch_feature_vocabularies(base_url, token))
+    if store.manifest is not None and not rebuild and store.manifest["spec_hash"] != feature_spec_hash(spec):
+        print("Feature spec changed since the store was built (new categories); rebuilding it")
+        rebuild = True
+    if store.manifest is None or rebuild:
+        store.reset(spec)
+    since = store.manifest["watermark"]
+    transformer = FeatureTransformer(spec)
+
+    stats = {"upserted": 0, "deleted": 0, "rewritten": 0, "appended": 0, "full": since is None}
+    started = time.perf_counter()
+    pending: list[pd.DataFrame] = []
+    deleted: list[int] = []
+    n_pending = 0
+    watermark = since
+
+    def flush() -> None:
+        nonlocal pending, deleted, n_pending
+        raw = pd.concat(pending, ignore_index=True) if pending else pd.DataFrame()
+        features = pd.DataFrame()
+        remove = np.asarray(deleted, dtype=np.int64)
+        if not raw.empty:
+            # Last version of each transaction in this batch
+            raw = raw.drop_duplicates("transaction_id", keep="last", ignore_index=True)
+            features = build_feature_matrix(raw, drop_na_rows=True, transformer=transformer)
+            features["created_at_ts"] = raw.loc[features.index, "created_at_ts"].to_numpy(dtype=np.float64)
+            # Deleted after an update in the same batch: keep deleted
+            features = features[~features["transaction_id"].isin(remove)]
+            remove = np.concatenate([remove, raw["transaction_id"].to_numpy(dtype=np.int64)])
+        counts = store.apply(features, remove)
+        store.commit(watermark, spec)
+        stats["upserted"] += len(raw)
+        stats["deleted"] += len(deleted)
+        stats["rewritten"] += counts["rewritten"]
+        stats["appended"] += counts["appended"]
+        pending, deleted, n_pending = [], [], 0
+
+    for df, page_deleted, watermark in iterate_changes_from_api(since, base_url, token, batch_size):
+        if not df.empty:
+            pending.append(df)
+            n_pending += len(df)
+        deleted.extend(page_deleted)
+        if n_pending >= buffer_rows:
+            flush()
+    flush()
+
+    stats.update(
+        rows=store.manifest["rows"],
+        partitions=len(store.manifest["partitions"]),
+        watermark=store.manifest["watermark"],
+        seconds=time.perf_counter() - started,
+    )
+    return stats
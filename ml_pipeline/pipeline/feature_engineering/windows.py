@@ -0,0 +1,140 @@
+"""
+Rolling time-window features per (item_id, warehouse_id). Over the transactions of
+the same item in the same warehouse in the trailing window (ts - W, ts], ordered by
+(created_at_ts, transaction_id) and including the row itself:
+- window_count: transactions in the window
+- window_quantity_sum: sum of signed quantity in the window
+- window_quantity_z: z-score of quantity against the earlier rows of the window
+  (0 without spread, e.g. fewer than two earlier rows)
+- hours_since_prev: hours since the previous transaction of the pair, capped at W
+  (also the value when there is none in the window)
+All four depend only on rows inside the window, so a stream can be featurized chunk
+by chunk (WindowHistory), and the backend computes a row's window from an indexed
+range query over its pair's (ts - W, ts] rows in the database (window_features_at).
+Must match backend app.services.window_features.
+"""
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+WINDOW_FEATURE_COLUMNS = ["window_count", "window_quantity_sum", "window_quantity_z", "hours_since_prev"]
+
+
+def window_z(x: np.ndarray, count: np.ndarray, total: np.ndarray, total_sq: np.ndarray) -> np.ndarray:
+    """
+    z of x against count earlier values with sum total and sum of squares total_sq
+    (all shifted by the same constant). 0 where the variance is within rounding of 0.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / count
+        mean_sq = total_sq / count
+        var = mean_sq - mean * mean
+        spread = (count >= 2) & (var > 1e-9 * mean_sq + 1e-12)
+        return np.where(spread, (x - mean) / np.sqrt(np.where(spread, var, 1.0)), 0.0)
+
+
+def window_features(
+    item_id: Any,
+    warehouse_id: Any,
+    created_at_ts: Any,
+    quantity: Any,
+    transaction_id: Any,
+    window_hours: float,
+) -> dict[str, np.ndarray]:
+    """
+    WINDOW_FEATURE_COLUMNS for every row, in input order (any order in, no Python
+    loop): rows are sorted by (item, warehouse, ts, id), each window's first row is
+    a binary search for (pair, ts - W) in the sorted keys, and window sums are
+    differences of per-pair cumulative sums. O(n log n). Rows without a
+    timestamp or quantity get NaN and don't count in the windows of others.
+    """
+    ts = np.asarray(created_at_ts, dtype=np.float64)
+    qty = np.asarray(quantity, dtype=np.float64)
+    n = len(ts)
+    out = {c: np.full(n, np.nan) for c in WINDOW_FEATURE_COLUMNS}
+    rows = np.flatnonzero(np.isfinite(ts) & np.isfinite(qty))
+    m = len(rows)
+    if m == 0:
+        return out
+    item = np.asarray(item_id, dtype=np.int64)[rows]
+    warehouse = np.asarray(warehouse_id, dtype=np.int64)[rows]
+    order = np.lexsort((np.asarray(transaction_id, dtype=np.int64)[rows], ts[rows], warehouse, item))
+    rows, item, warehouse = rows[order], item[order], warehouse[order]
+    t, x = ts[rows], qty[rows]
+
+    new_pair = np.ones(m, dtype=bool)
+    new_pair[1:] = (item[1:] != item[:-1]) | (warehouse[1:] != warehouse[:-1])
+    pair = np.cumsum(new_pair) - 1
+    pair_start = np.flatnonzero(new_pair)[pair]
+
+    # Window start: rows at or before (pair, ts - W) in (pair, ts) order. Complex numbers
+    # sort by (real, imag), so one searchsorted does the lexicographic lookup exactly.
+    keys = pair + 1j * t
+    start = np.searchsorted(keys, pair + 1j * (t - float(window_hours) * 3600.0), side="right")
+
+    # Per-pair cumulative sums (restart at each pair), shifted by the pair's first quantity
+    xs = x - x[pair_start]
+    csum = pd.Series(xs).groupby(pair, sort=False).cumsum().to_numpy()
+    csum_sq = pd.Series(xs * xs).groupby(pair, sort=False).cumsum().to_numpy()
+    before = start - 1
+    inside = before >= pair_start
+    before = np.maximum(before, 0)
+    count = np.arange(1, m + 1) - start
+    total = csum - np.where(inside, csum[before], 0.0)
+    total_sq = csum_sq - np.where(inside, csum_sq[before], 0.0)
+
+    earlier = count - 1
+    gap = np.full(m, float(window_hours))
+    has_prev = earlier >= 1
+    gap[has_prev] = (t[has_prev] - t[np.flatnonzero(has_prev) - 1]) / 3600.0
+
+    out["window_count"][rows] = count
+    out["window_quantity_sum"][rows] = total + count * x[pair_start]
+    out["window_quantity_z"][rows] = window_z(xs, earlier, total - xs, total_sq - xs * xs)
+    out["hours_since_prev"][rows] = np.minimum(gap, float(window_hours))
+    return out
+
+
+class WindowHistory:
+    """
+    Window features over consecutive chunks of one stream in (created_at_ts,
+    transaction_id) order: each chunk is featurized after the rows of the previous
+    ones that can still fall in its windows (within W of the newest seen), so the
+    result equals window_features over the whole stream. Raises ValueError on a
+    chunk older than what came before.
+    """
+
+    _KEYS = ("item_id", "warehouse_id", "created_at_ts", "quantity", "transaction_id")
+
+    def __init__(self, window_hours: float):
+        self.window_hours = float(window_hours)
+        self._tail = {k: np.empty(0) for k in self._KEYS}
+        self._newest = -np.inf
+
+    def features(
+        self, item_id: Any, warehouse_id: Any, created_at_ts: Any, quantity: Any, transaction_id: Any
+    ) -> dict[str, np.ndarray]:
+        chunk = {
+            "item_id": np.asarray(item_id, dtype=np.float64),
+            "warehouse_id": np.asarray(warehouse_id, dtype=np.float64),
+            "created_at_ts": np.asarray(created_at_ts, dtype=np.float64),
+            "quantity": np.asarray(quantity, dtype=np.float64),
+            "transaction_id": np.asarray(transaction_id, dtype=np.float64),
+        }
+        n = len(chunk["created_at_ts"])
+        valid_ts = chunk["created_at_ts"][np.isfinite(chunk["created_at_ts"])]
+        if len(valid_ts) and valid_ts.min() < self._newest:
+            raise ValueError(
+                "Window features need chunks in created_at order (no --prefetch > 1 or unordered input)"
+            )
+        cols = {k: np.concatenate([self._tail[k], chunk[k]]) for k in self._KEYS}
+        feats = window_features(
+            cols["item_id"], cols["warehouse_id"], cols["created_at_ts"], cols["quantity"], cols["transaction_id"],
+            self.window_hours,
+        )
+        if len(valid_ts):
+            self._newest = max(self._newest, float(valid_ts.max()))
+        keep = (cols["created_at_ts"] > self._newest - self.window_hours * 3600.0) & np.isfinite(cols["quantity"])
+        self._tail = {k: v[keep] for k, v in cols.items()}
+        return {c: v[len(v) - n:] for c, v in feats.items()}
@@ -1,4 +1,5 @@
 """Inference: load model, score transactions, return anomaly scores."""
 from pipeline.inference.predictor import load_predictor, predict
+from pipeline.inference.batch import run_batch_inference
 
-__all__ = ["load_predictor", "predict"]
+__all__ = ["load_predictor", "predict", "run_batch_inference"]
@@ -0,0 +1,150 @@
+"""
+Chunked batch inference: read the input a chunk at a time (Parquet record batches,
+CSV chunks or API pages), score chunks in-process or across a process pool, and
+stream the results through pyarrow ParquetWriters, optionally partitioned by date
+or warehouse. Memory stays at a few chunks regardless of input size; scores don't
+depend on chunking (the model's distance scale is persisted at training, and window
+features are carried across raw chunks in the reading process).
+"""
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from pipeline.feature_engineering.features import FeatureTransformer, get_feature_columns, load_feature_spec
+from pipeline.feature_engineering.windows import WindowHistory
+from pipeline.inference.predictor import Predictor
+from pipeline.parquet_io import PartitionedParquetWriter, partition_keys
+
+# Per worker process (see _init_worker)
+_worker_predictor: Optional[Predictor] = None
+
+
+def input_kind(columns: list[str], feature_columns: Optional[list[str]] = None) -> str:
+    """'features' when every model feature column is present, else 'transactions' (raw rows)."""
+    feature_columns = feature_columns or get_feature_columns()
+    return "features" if all(c in columns for c in feature_columns) else "transactions"
+
+
+def with_window_features(df: pd.DataFrame, history: WindowHistory) -> pd.DataFrame:
+    """Raw chunk + window feature columns computed after the previous chunks (scoring then uses them as is)."""
+    return df.assign(**history.features(
+        df["item_id"], df["warehouse_id"], df["created_at_ts"], df["quantity"], df["transaction_id"]
+    ))
+
+
+def score_chunk(
+    predictor: Predictor,
+    df: pd.DataFrame,
+    kind: str,
+    partition_by: Optional[str] = None,
+) -> tuple[pd.DataFrame, Optional[np.ndarray]]:
+    """One input chunk → (scored frame, partition keys or None)."""
+    keys = partition_keys(df, partition_by)
+    if kind == "features":
+        return predictor.score_dataframe(df, copy=False), keys
+    return predictor.score_transactions(df), keys
+
+
+def _init_worker(model_dir: str) -> None:
+    global _worker_predictor
+    _worker_predictor = Predictor(model_dir)
+
+
+def _score_in_worker(
+    df: pd.DataFrame, kind: str, partition_by: Optional[str]
+) -> tuple[pd.DataFrame, Optional[np.ndarray]]:
+    return score_chunk(_worker_predictor, df, kind, partition_by)
+
+
+def score_chunks(
+    model_dir: str | Path,
+    chunks: Iterator[pd.DataFrame],
+    kind: Optional[str] = None,
+    workers: int = 1,
+    partition_by: Optional[str] = None,
+) -> Iterator[tuple[pd.DataFrame, Optional[np.ndarray]]]:
+    """
+    Score chunks in input order. With workers > 1 chunks go to a spawned process pool
+    (each worker loads the model once); at most 2 * workers chunks are in flight, so
+    reading never runs far ahead of writing. kind defaults to input_kind of the first chunk.
+    For models with window features, raw chunks must come in created_at order.
+    """
+    spec = load_feature_spec(model_dir)
+    feature_columns = (spec or {}).get("feature_columns") or get_feature_columns()
+    history = FeatureTransformer(spec).window_history()
+
+    def prepared(df: pd.DataFrame) -> pd.DataFrame:
+        return with_window_features(df, history) if history is not None and kind == "transactions" else df
+
+    if workers <= 1:
+        predictor = Predictor(model_dir)
+        for df in chunks:
+            kind = kind or input_kind(list(df.columns), feature_columns)
+            yield score_chunk(predictor, prepared(df), kind, partition_by)
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(str(model_dir),),
+    ) as executor:
+        pending: deque = deque()
+        for df in chunks:
+            kind = kind or input_kind(list(df.columns), feature_columns)
+            pending.append(executor.submit(_score_in_worker, prepared(df), kind, partition_by))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ScoredParquetWriter(PartitionedParquetWriter):
+    """PartitionedParquetWriter for scored chunks; also counts anomalies."""
+
+    def __init__(self, output: str | Path, partition_by: Optional[str] = None):
+        super().__init__(output, partition_by)
+        self.anomalies = 0
+
+    def write(self, df: pd.DataFrame, keys: Optional[np.ndarray] = None) -> None:
+        super().write(df, keys)
+        if "is_anomaly" in df.columns:
+            self.anomalies += int(df["is_anomaly"].sum())
+
+
+def run_batch_inference(
+    model_dir: str | Path,
+    chunks: Iterator[pd.DataFrame],
+    output: str | Path,
+    kind: Optional[str] = None,
+    workers: int = 1,
+    partition_by: Optional[str] = None,
+    progress_every_s: float = 5.0,
+) -> dict[str, Any]:
+    """Score chunks into output; prints progress. Returns {rows, anomalies, seconds, rows_per_s, output}."""
+    writer = ScoredParquetWriter(output, partition_by)
+    started = last_report = time.perf_counter()
+    try:
+        for scored, keys in score_chunks(model_dir, chunks, kind, workers, partition_by):
+            writer.write(scored, keys)
+            now = time.perf_counter()
+            if now - last_report >= progress_every_s:
+                last_report = now
+                print(f"  {writer.rows:,} rows scored ({writer.rows / (now - started):,.0f} rows/s)", flush=True)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    seconds = time.perf_counter() - started
+    return {
+        "rows": writer.rows,
+        "anomalies": writer.anomalies,
+        "seconds": seconds,
+        "rows_per_s": writer.rows / seconds if seconds > 0 else 0.0,
+        "output": str(writer.output),
+    }
@@ -5,37 +5,63 @@ from typing import Any, Optional
 import numpy as np
 import pandas as pd
 
-from pipeline.feature_engineering.features import build_feature_matrix, get_feature_columns
-from pipeline.training.model import load_pipeline, predict_anomaly_scores
+from pipeline.feature_engineering.features import FeatureTransformer, get_feature_columns
+from pipeline.config import Settings
+from pipeline.training.model import (
+    MODEL_PARAMS_FILENAME,
+    FusedScorer,
+    distance_scale_of,
+    load_model_params,
+    load_pipeline,
+)
 
 
 class Predictor:
-    """Load once, score many. Uses same feature columns as training."""
+    """
+    Load once, score many. Uses same feature columns as training. Reads
+    model_params.bin when present (no unpickling), else the joblib artifacts.
+    Scores use the training distance scale from the config, so they don't depend
+    on how rows are batched.
+    """
 
-    def __init__(self, model_dir: str | Path):
+    def __init__(self, model_dir: str | Path, float32: Optional[bool] = None):
         self.model_dir = Path(model_dir)
-        self.scaler, self.pca, self.kmeans, self.config = load_pipeline(self.model_dir)
+        if float32 is None:
+            float32 = Settings().scoring_float32
+        dtype = np.float32 if float32 else np.float64
+        params_path = self.model_dir / MODEL_PARAMS_FILENAME
+        if params_path.exists():
+            header, arrays = load_model_params(params_path)
+            self.config = header["config"]
+            self.scorer = FusedScorer.from_model_params(arrays, dtype, distance_scale_of(self.config))
+            spec = header.get("feature_spec")
+            # Same vocabularies as training, compiled once
+            self.transformer = FeatureTransformer(spec) if spec else FeatureTransformer.from_dir(self.model_dir)
+        else:
+            scaler, pca, kmeans, self.config = load_pipeline(self.model_dir)
+            self.scorer = FusedScorer.from_sklearn(scaler, pca, kmeans, dtype, distance_scale_of(self.config))
+            self.transformer = FeatureTransformer.from_dir(self.model_dir)
         self.feature_columns = self.config.get("feature_columns") or get_feature_columns()
         self.anomaly_threshold = self.config.get("anomaly_score_threshold")
 
     def score_feature_matrix(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """X: (n, n_features) in training order. Returns (anomaly_scores, cluster_ids)."""
-        scores, labels = predict_anomaly_scores(X, self.scaler, self.pca, self.kmeans)
-        return scores, labels
+        return self.scorer.score(X)
 
-    def score_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+    def score_dataframe(self, df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
         """
         df must have feature columns. Returns same df with added columns:
-        anomaly_score, cluster_id, is_anomaly.
+        anomaly_score, cluster_id, is_anomaly. copy=False adds them to df in place
+        (chunked inference, where the chunk is not reused).
         """
         for c in self.feature_columns:
             if c not in df.columns:
                 raise ValueError(f"Missing feature column: {c}")
-        X = df[self.feature_columns].to_numpy().astype(np.float64)
+        X = df[self.feature_columns].to_numpy(dtype=np.float64)
         # Replace inf/nan with 0 for inference
-        X = np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
+        X = np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0, copy=not X.flags.writeable)
         scores, labels = self.score_feature_matrix(X)
-        out = df.copy()
+        out = df.copy() if copy else df
         out["anomaly_score"] = scores
         out["cluster_id"] = labels
         threshold = self.anomaly_threshold
@@ -47,14 +73,32 @@ class Predictor:
         Raw transaction DataFrame (from API/CSV with standard columns).
         Builds features then scores. Returns featured DataFrame + anomaly_score, cluster_id, is_anomaly.
         """
-        feat = build_feature_matrix(transactions_df, drop_na_rows=False)
-        if feat.empty:
-            feat["anomaly_score"] = []
-            feat["cluster_id"] = []
-            feat["is_anomaly"] = []
-            return feat
+        if transactions_df.empty:
+            return pd.DataFrame(columns=["transaction_id", *self.feature_columns, "anomaly_score", "cluster_id", "is_anomaly"])
+        X = self.transformer.transform_frame(transactions_df)
+        feat = pd.DataFrame(X, columns=self.transformer.feature_columns, index=transactions_df.index)
+        feat.insert(0, "transaction_id", transactions_df["transaction_id"].astype(np.int64))
         return self.score_dataframe(feat)
 
+    def score_rows(self, rows: list[dict]) -> list[dict]:
+        """
+        ML export-style dicts → [{transaction_id, anomaly_score, cluster_id, is_anomaly}].
+        No DataFrame is built, so single-row requests stay cheap.
+        """
+        if not rows:
+            return []
+        scores, labels = self.score_feature_matrix(self.transformer.transform_rows(rows))
+        threshold = self.anomaly_threshold
+        return [
+            {
+                "transaction_id": r.get("transaction_id", i),
+                "anomaly_score": float(s),
+                "cluster_id": int(l),
+                "is_anomaly": bool(threshold is not None and s > threshold),
+            }
+            for i, (r, s, l) in enumerate(zip(rows, scores, labels))
+        ]
+
 
 def load_predictor(model_dir: str | Path) -> Predictor:
     return Predictor(model_dir)
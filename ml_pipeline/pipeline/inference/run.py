@@ -3,23 +3,38 @@ import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
-
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from pipeline.config import Settings, get_model_dir, get_features_dir
-from pipeline.inference.predictor import load_predictor
-from pipeline.feature_engineering.fetcher import fetch_transactions_from_api, load_transactions_from_csv
+from pipeline.inference.batch import run_batch_inference
+from pipeline.feature_engineering.fetcher import iterate_transactions_from_api, iterate_transactions_from_csv
+from pipeline.feature_engineering.store import FeatureStore, is_feature_store
+from pipeline.parquet_io import PARTITION_BY, iter_parquet_chunks
 
 
 def main():
     p = argparse.ArgumentParser(description="Run anomaly detection inference")
     p.add_argument("--model-dir", type=str, default=None, help="Path to trained model")
-    p.add_argument("--input", type=str, default=None, help="Input: parquet (feature matrix) or CSV (raw transactions)")
-    p.add_argument("--output", type=str, default=None, help="Output parquet path")
+    p.add_argument(
+        "--input",
+        type=str,
+        default=None,
+        help="Input: parquet file/dir (feature matrix or raw transactions), CSV (raw transactions) or a feature store",
+    )
+    p.add_argument("--date-from", type=str, default=None, help="Feature store input: first date partition (inclusive)")
+    p.add_argument("--date-to", type=str, default=None, help="Feature store input: last date partition (exclusive)")
+    p.add_argument("--output", type=str, default=None, help="Output parquet path (a directory with --partition-by)")
     p.add_argument("--source", choices=["api", "file"], default="file", help="When input is raw: fetch from API or read file")
     p.add_argument("--api-url", type=str, default=None)
     p.add_argument("--token", type=str, default=None)
+    p.add_argument("--chunk-size", type=int, default=None, help="Rows read and scored per chunk")
+    p.add_argument("--workers", type=int, default=None, help="Score chunks in N processes (1 = in-process)")
+    p.add_argument(
+        "--partition-by",
+        choices=PARTITION_BY,
+        default=None,
+        help="Write OUTPUT/date=YYYY-MM-DD/ (raw input only) or OUTPUT/warehouse=ID/ partitions",
+    )
     args = p.parse_args()
 
     settings = Settings()
@@ -27,40 +42,50 @@ def main():
     if not model_dir.exists() or not (model_dir / "config.json").exists():
         print(f"Model not found: {model_dir}")
         sys.exit(1)
+    chunk_size = args.chunk_size or settings.inference_chunk_size
+    workers = args.workers or settings.inference_workers
 
-    predictor = load_predictor(model_dir)
-
+    kind = None
     if args.input:
         path = Path(args.input)
-        if path.suffix.lower() == ".csv":
-            df = load_transactions_from_csv(path)
-            scored = predictor.score_transactions(df)
+        if is_feature_store(path):
+            chunks = FeatureStore(path).iter_chunks(chunk_size, args.date_from, args.date_to)
+            kind = "features"
+        elif path.suffix.lower() == ".csv":
+            chunks, kind = iterate_transactions_from_csv(path, chunk_size), "transactions"
         else:
-            df = pd.read_parquet(path)
-            scored = predictor.score_dataframe(df)
+            chunks = iter_parquet_chunks(path, chunk_size)
     elif args.source == "api":
-        df = fetch_transactions_from_api(
+        chunks = iterate_transactions_from_api(
             base_url=args.api_url or settings.erp_api_base_url,
             token=args.token or settings.erp_api_token,
+            batch_size=chunk_size,
         )
-        scored = predictor.score_transactions(df)
+        kind = "transactions"
     else:
         # Default: use featured parquet then score
         feat_path = get_features_dir() / "transactions_featured.parquet"
         if not feat_path.exists():
             print("No input. Use --input or --source api or run feature_engineering first.")
             sys.exit(1)
-        df = pd.read_parquet(feat_path)
-        scored = predictor.score_dataframe(df)
+        chunks, kind = iter_parquet_chunks(feat_path, chunk_size), "features"
+
+    if (args.date_from or args.date_to) and not (args.input and is_feature_store(args.input)):
+        print("--date-from/--date-to need a feature store --input")
+        sys.exit(1)
 
     out_path = args.output
     if not out_path:
-        out_path = Path(settings.output_dir) / "scored.parquet"
-    out_path = Path(out_path)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    scored.to_parquet(out_path, index=False)
-    n_anom = scored["is_anomaly"].sum() if "is_anomaly" in scored.columns else 0
-    print(f"Wrote {len(scored)} rows to {out_path}, anomalies: {n_anom}")
+        out_path = Path(settings.output_dir) / ("scored" if args.partition_by else "scored.parquet")
+    try:
+        stats = run_batch_inference(model_dir, chunks, out_path, kind, workers, args.partition_by)
+    except (FileExistsError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    print(
+        f"Wrote {stats['rows']} rows to {stats['output']} in {stats['seconds']:.1f}s "
+        f"({stats['rows_per_s']:,.0f} rows/s, {workers} worker(s)), anomalies: {stats['anomalies']}"
+    )
 
 
 if __name__ == "__main__":
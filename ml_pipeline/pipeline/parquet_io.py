@@ -0,0 +1,113 @@
+"""
+Chunked Parquet I/O shared by the feature and inference CLIs: read a file or dataset
+dir in record batches, and stream frames through pyarrow ParquetWriters into one
+file or a dataset partitioned by date or warehouse, renamed into place when complete.
+"""
+import os
+import shutil
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Output partition dirs are <name>=<value>; names differ from the data columns so Hive readers don't clash
+PARTITION_BY = ("date", "warehouse")
+
+
+def iter_parquet_chunks(
+    path: str | Path, chunk_size: int, columns: Optional[list[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Parquet file (or dataset dir) → DataFrames of at most chunk_size rows, read row group
+    by row group. columns limits the read to those present in each file.
+    """
+    files = pq.ParquetDataset(path).files if Path(path).is_dir() else [str(path)]
+    for f in files:
+        pf = pq.ParquetFile(f)
+        cols = None if columns is None else [c for c in columns if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=chunk_size, columns=cols):
+            yield batch.to_pandas()
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def partition_keys(df: pd.DataFrame, partition_by: Optional[str]) -> Optional[np.ndarray]:
+    """Per-row partition value: UTC date (YYYY-MM-DD) from created_at_ts, or warehouse_id."""
+    if partition_by is None:
+        return None
+    if partition_by == "warehouse":
+        return df["warehouse_id"].to_numpy(dtype=np.int64).astype(str)
+    if "created_at_ts" not in df.columns:
+        raise ValueError("--partition-by date needs created_at_ts (raw transactions, not a feature matrix)")
+    dates = pd.to_datetime(df["created_at_ts"], unit="s", utc=True).dt.strftime("%Y-%m-%d")
+    return dates.fillna("unknown").to_numpy()
+
+
+class PartitionedParquetWriter:
+    """
+    Streams frames to output (one Parquet file), or with partition_by to
+    output/<date|warehouse>=<value>/part-00000.parquet with one open writer per partition;
+    each write() appends row groups. Everything is written under a temporary name and
+    renamed into place on close(), so a failed run never leaves a partial output.
+    The schema is fixed by the first frame.
+    """
+
+    def __init__(self, output: str | Path, partition_by: Optional[str] = None):
+        self.output = Path(output)
+        self.partition_by = partition_by
+        if partition_by is not None and self.output.exists():
+            raise FileExistsError(f"Output directory exists: {self.output} (remove it or choose another --output)")
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.output.with_name(f".{self.output.name}.tmp")
+        _remove(self._tmp)
+        self._writers: dict[str, pq.ParquetWriter] = {}
+        self.schema: Optional[pa.Schema] = None
+        self.rows = 0
+
+    def _writer(self, key: Optional[str]) -> pq.ParquetWriter:
+        name = key or ""
+        writer = self._writers.get(name)
+        if writer is None:
+            if key is None:
+                path = self._tmp
+            else:
+                path = self._tmp / f"{self.partition_by}={key}" / "part-00000.parquet"
+                path.parent.mkdir(parents=True, exist_ok=True)
+            writer = pq.ParquetWriter(path, self.schema)
+            self._writers[name] = writer
+        return writer
+
+    def write(self, df: pd.DataFrame, keys: Optional[np.ndarray] = None) -> None:
+        if df.empty:
+            return
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self.schema = self.schema or table.schema
+        if keys is None:
+            self._writer(None).write_table(table)
+        else:
+            for key, idx in pd.Series(keys).groupby(keys, sort=False).indices.items():
+                self._writer(str(key)).write_table(table.take(idx))
+        self.rows += len(df)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        if not self._writers:
+            if self.partition_by is not None:
+                self._tmp.mkdir(parents=True, exist_ok=True)
+            else:
+                pq.write_table(pa.table({}), self._tmp)
+        os.replace(self._tmp, self.output)
+
+    def abort(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        _remove(self._tmp)
@@ -0,0 +1,54 @@
+"""
+Backfill model_params.bin (and, given its training features, the distance scales) for
+a model dir saved before they existed, or rewrite it in the current format version.
+
+    python -m pipeline.training.export_params MODEL_DIR [--features FEATURES_PARQUET]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from pipeline.feature_engineering.features import load_feature_spec
+from pipeline.training.model import backfill_distance_scales, export_model_params, load_pipeline
+
+
+def backfill_model_params(model_dir: str | Path, features_path: str | Path | None = None) -> Path:
+    """
+    Write model_dir/model_params.bin from its joblib artifacts. With features_path (the
+    model's training features), first recompute the distance scales into config.json.
+    """
+    if features_path is not None:
+        feature_columns = load_pipeline(model_dir)[3]["feature_columns"]
+        X = pd.read_parquet(features_path)[feature_columns].to_numpy(dtype=np.float64)
+        backfill_distance_scales(model_dir, X[np.isfinite(X).all(axis=1)])
+    scaler, pca, kmeans, config = load_pipeline(model_dir)
+    artifacts = {
+        "scaler": scaler,
+        "pca": pca,
+        "kmeans": kmeans,
+        "config": config,
+        "feature_spec": load_feature_spec(model_dir),
+    }
+    return export_model_params(artifacts, model_dir)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Write model_params.bin for an existing model dir")
+    p.add_argument("model_dir", type=str)
+    p.add_argument(
+        "--features",
+        type=str,
+        default=None,
+        help="The model's training features (parquet): also recompute its distance scales",
+    )
+    args = p.parse_args()
+    print(backfill_model_params(args.model_dir, args.features))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
-"""Model components: scaler, PCA (embeddings), KMeans, anomaly scoring."""
+"""Model components: scaler, PCA (embeddings), KMeans, anomaly scoring, model_params.bin export."""
 import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
@@ -9,10 +13,28 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.cluster import KMeans
 
+from pipeline.feature_engineering.features import save_feature_spec
+
 
 FEATURE_COLS_KEY = "feature_columns"
 CONFIG_KEY = "config"
 
+# Single-file numeric artifact (read by the backend without sklearn):
+#   MODEL_PARAMS_MAGIC | uint64 LE header length | JSON header | arrays (64-byte aligned, offsets absolute)
+# Must match backend app.services.model_artifact
+MODEL_PARAMS_FILENAME = "model_params.bin"
+MODEL_PARAMS_MAGIC = b"ERPMDL\x00\x01"
+MODEL_PARAMS_FORMAT_VERSION = 2  # 2 adds the folded scorer weights; 1 (raw arrays only) is still read
+_ALIGN = 64
+# Raw fitted arrays (model_param_arrays) and the scorer's folded weights, stored per dtype
+MODEL_PARAM_NAMES = ("scaler_mean", "scaler_scale", "pca_components", "pca_mean", "centroids")
+FUSED_WEIGHT_NAMES = ("inv_scale", "shift", "W", "b", "centroids_t2", "centroid_sq")
+SCORING_DTYPES = (np.float64, np.float32)
+
+# How centroid distance is normalized in the anomaly score (config "distance_normalization"):
+# "global" divides by the training std of all distances, "cluster" by the std within each cluster
+DISTANCE_NORMALIZATIONS = ("global", "cluster")
+
 
 def fit_pipeline(
     X: np.ndarray,
@@ -20,11 +42,18 @@ def fit_pipeline(
     n_components: int = 8,
     n_clusters: int = 5,
     random_state: int = 42,
+    feature_spec: dict[str, Any] | None = None,
+    distance_normalization: str = "global",
 ) -> dict[str, Any]:
     """
     Fit scaler → PCA → KMeans. Return artifacts and config.
-    Anomaly score = reconstruction error (PCA) + distance to nearest centroid.
+    Anomaly score = reconstruction error (PCA) + distance to nearest centroid, the
+    distance divided by its training std (global or per cluster, both stored in the
+    config) so inference scores don't depend on what else is in the batch.
+    feature_spec (vocabularies used to build X) is saved alongside the model.
     """
+    if distance_normalization not in DISTANCE_NORMALIZATIONS:
+        raise ValueError(f"distance_normalization must be one of {DISTANCE_NORMALIZATIONS}")
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
@@ -40,29 +69,60 @@ def fit_pipeline(
     X_recon = pca.inverse_transform(X_embed)
     recon_error = np.mean((X_scaled - X_recon) ** 2, axis=1)
     dist_to_centroid = np.linalg.norm(X_embed - centroids[labels], axis=1)
-    # Combined score (higher = more anomalous)
-    anomaly_score = recon_error + 0.5 * (dist_to_centroid / (np.std(dist_to_centroid) + 1e-8))
+    global_scale, cluster_scales = distance_scales(dist_to_centroid, labels, n_clusters)
 
     config = {
         "n_components": n_components,
         "n_clusters": n_clusters,
         "random_state": random_state,
         "feature_columns": feature_names,
-        "anomaly_score_threshold": float(np.percentile(anomaly_score, 95)),  # top 5% = anomaly
+        "distance_normalization": distance_normalization,
+        "distance_scale": global_scale,
+        "cluster_distance_scales": cluster_scales,
     }
+    # Combined score (higher = more anomalous)
+    anomaly_score = combine_anomaly_scores(recon_error, dist_to_centroid, distance_scale_of(config), labels)
+    config["anomaly_score_threshold"] = float(np.percentile(anomaly_score, 95))  # top 5% = anomaly
 
     return {
         "scaler": scaler,
         "pca": pca,
         "kmeans": kmeans,
         "config": config,
+        "feature_spec": feature_spec,
         "anomaly_scores_train": anomaly_score,
         "labels_train": labels,
     }
 
 
+def distance_scales(dist: np.ndarray, labels: np.ndarray, n_clusters: int) -> tuple[float, list[float]]:
+    """
+    Training std of centroid distance: over all rows, and per cluster. Clusters with
+    fewer than two rows (or no spread) use the global value.
+    """
+    global_scale = float(np.std(dist))
+    cluster_scales = []
+    for k in range(n_clusters):
+        d = dist[labels == k]
+        s = float(np.std(d)) if len(d) >= 2 else 0.0
+        cluster_scales.append(s if s > 1e-12 else global_scale)
+    return global_scale, cluster_scales
+
+
+def distance_scale_of(config: dict[str, Any]) -> float | np.ndarray | None:
+    """
+    The persisted distance normalization of a model config: a float (global), an
+    array indexed by cluster id ("cluster"), or None for models trained before it
+    was stored (scores then fall back to the batch std).
+    """
+    if config.get("distance_normalization") == "cluster" and config.get("cluster_distance_scales"):
+        return np.asarray(config["cluster_distance_scales"], dtype=np.float64)
+    scale = config.get("distance_scale")
+    return float(scale) if scale is not None else None
+
+
 def save_pipeline(artifacts: dict[str, Any], model_dir: str | Path) -> None:
-    """Save scaler, pca, kmeans, and config to model_dir."""
+    """Save scaler, pca, kmeans, config, feature_spec.json (when known) and model_params.bin to model_dir."""
     model_dir = Path(model_dir)
     model_dir.mkdir(parents=True, exist_ok=True)
     joblib.dump(artifacts["scaler"], model_dir / "scaler.joblib")
@@ -70,6 +130,123 @@ def save_pipeline(artifacts: dict[str, Any], model_dir: str | Path) -> None:
     joblib.dump(artifacts["kmeans"], model_dir / "kmeans.joblib")
     with open(model_dir / "config.json", "w") as f:
         json.dump(artifacts["config"], f, indent=2)
+    if artifacts.get("feature_spec"):
+        save_feature_spec(artifacts["feature_spec"], model_dir)
+    export_model_params(artifacts, model_dir)
+
+
+def model_param_arrays(scaler: Any, pca: Any, kmeans: Any) -> dict[str, np.ndarray]:
+    """The fitted numbers scoring needs, as float64 arrays."""
+    if getattr(pca, "whiten", False):
+        raise ValueError("Whitened PCA is not supported")
+    return {
+        "scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64),
+        "pca_components": np.asarray(pca.components_, dtype=np.float64),
+        "pca_mean": np.asarray(pca.mean_, dtype=np.float64),
+        "centroids": np.asarray(kmeans.cluster_centers_, dtype=np.float64),
+    }
+
+
+def export_model_params(artifacts: dict[str, Any], model_dir: str | Path) -> Path:
+    """
+    Write model_params.bin: a JSON header (config with the distance normalization,
+    feature_spec, threshold, array table) followed by the raw little-endian arrays:
+    the fitted parameters, and FusedScorer's folded weights for each of
+    SCORING_DTYPES, so readers memory-map it and score from the mapped pages without
+    unpickling or copying. Written to a temp file and renamed, so processes that have
+    the previous file mapped keep a valid copy.
+    """
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    arrays = model_param_arrays(artifacts["scaler"], artifacts["pca"], artifacts["kmeans"])
+    for dtype in SCORING_DTYPES:
+        weights = fold_scoring_weights(**{name: arrays[name] for name in MODEL_PARAM_NAMES}, dtype=dtype)
+        arrays.update({fused_weight_prefix(dtype) + name: a for name, a in weights.items()})
+    arrays = {name: np.ascontiguousarray(a, dtype=a.dtype.newbyteorder("<")) for name, a in arrays.items()}
+    config = artifacts["config"]
+    header: dict[str, Any] = {
+        "format_version": MODEL_PARAMS_FORMAT_VERSION,
+        "config": config,
+        "feature_spec": artifacts.get("feature_spec"),
+        "anomaly_score_threshold": config.get("anomaly_score_threshold"),
+        "arrays": {},
+    }
+
+    def encode(table: dict[str, Any]) -> bytes:
+        header["arrays"] = table
+        return json.dumps(header).encode("utf-8")
+
+    # Offsets depend on the header length: size the header with placeholder offsets first
+    placeholder = {name: {"dtype": a.dtype.str, "shape": list(a.shape), "offset": 10**12} for name, a in arrays.items()}
+    data_start = -(-(16 + len(encode(placeholder))) // _ALIGN) * _ALIGN
+    table, offset = {}, data_start
+    for name, a in arrays.items():
+        table[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset += -(-a.nbytes // _ALIGN) * _ALIGN
+    header_bytes = encode(table)
+
+    path = model_dir / MODEL_PARAMS_FILENAME
+    tmp = path.with_name(f".{MODEL_PARAMS_FILENAME}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MODEL_PARAMS_MAGIC)
+        f.write(np.uint64(len(header_bytes)).astype("<u8").tobytes())
+        f.write(header_bytes)
+        for name, a in arrays.items():
+            f.seek(table[name]["offset"])
+            f.write(a.tobytes())
+        f.truncate(offset)
+    os.replace(tmp, path)
+    return path
+
+
+def load_model_params(path: str | Path) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """(header, arrays) from model_params.bin; arrays are read-only views of a memory map."""
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buf[:8]) != MODEL_PARAMS_MAGIC:
+        raise ValueError(f"Not a model params file: {path}")
+    header_len = int(buf[8:16].view("<u8")[0])
+    header = json.loads(bytes(buf[16:16 + header_len]))
+    if header.get("format_version") not in (1, MODEL_PARAMS_FORMAT_VERSION):
+        raise ValueError(f"Unsupported model params format_version: {header.get('format_version')}")
+    arrays = {
+        name: np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=buf, offset=spec["offset"])
+        for name, spec in header["arrays"].items()
+    }
+    return header, arrays
+
+
+REGISTRY_CURRENT_POINTER = "current"  # Must match backend app.services.model_registry.CURRENT_POINTER
+
+
+def publish_to_registry(
+    artifacts: dict[str, Any],
+    registry_dir: str | Path,
+    version: str | None = None,
+    promote: bool = True,
+) -> Path:
+    """
+    Save artifacts as registry_dir/<version>/ (default version: UTC timestamp) with
+    config.model_version set, then (promote) point registry_dir/current at it.
+    The version dir is written under a temp name and renamed, so a watching API
+    never sees a half-written model.
+    """
+    registry_dir = Path(registry_dir)
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    target = registry_dir / version
+    if target.exists():
+        raise FileExistsError(f"Model version already exists: {target}")
+    artifacts = {**artifacts, "config": {**artifacts["config"], "model_version": version}}
+    tmp = registry_dir / f".{version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    save_pipeline(artifacts, tmp)
+    os.replace(tmp, target)
+    if promote:
+        pointer = registry_dir / REGISTRY_CURRENT_POINTER
+        pointer_tmp = registry_dir / f".{REGISTRY_CURRENT_POINTER}.tmp"
+        pointer_tmp.write_text(version + "\n")
+        os.replace(pointer_tmp, pointer)
+    return target
 
 
 def load_pipeline(model_dir: str | Path) -> tuple[Any, Any, Any, dict]:
@@ -88,9 +265,11 @@ def predict_anomaly_scores(
     scaler: Any,
     pca: Any,
     kmeans: Any,
+    distance_scale: float | np.ndarray | None = None,
 ) -> tuple[np.ndarray, np.ndarray]:
     """
     X: (n_samples, n_features). Returns (anomaly_scores, cluster_labels).
+    distance_scale: distance_scale_of(config); None uses the batch std (legacy models).
     """
     X_scaled = scaler.transform(X)
     X_embed = pca.transform(X_scaled)
@@ -99,6 +278,210 @@ def predict_anomaly_scores(
     X_recon = pca.inverse_transform(X_embed)
     recon_error = np.mean((X_scaled - X_recon) ** 2, axis=1)
     dist_to_centroid = np.linalg.norm(X_embed - centroids[labels], axis=1)
-    scale = np.std(dist_to_centroid) + 1e-8
-    anomaly_score = recon_error + 0.5 * (dist_to_centroid / scale)
-    return anomaly_score, labels
+    return combine_anomaly_scores(recon_error, dist_to_centroid, distance_scale, labels), labels
+
+
+def fused_weight_prefix(dtype: Any) -> str:
+    """Array name prefix of the folded weights for dtype in model_params.bin."""
+    return f"fused_{np.dtype(dtype).name}_"
+
+
+def fold_scoring_weights(
+    scaler_mean: np.ndarray,
+    scaler_scale: np.ndarray,
+    pca_components: np.ndarray,
+    pca_mean: np.ndarray,
+    centroids: np.ndarray,
+    dtype: Any = np.float64,
+) -> dict[str, np.ndarray]:
+    """FusedScorer's weights (see its docstring) in dtype, C-contiguous, computed in float64."""
+    dtype = np.dtype(dtype)
+    inv_scale = 1.0 / np.asarray(scaler_scale, dtype=np.float64)
+    components = np.asarray(pca_components, dtype=np.float64)  # (k, d)
+    shift = np.asarray(scaler_mean, dtype=np.float64) * inv_scale + np.asarray(pca_mean, dtype=np.float64)
+    centroids = np.asarray(centroids, dtype=np.float64)  # (K, k)
+    return {
+        "inv_scale": inv_scale.astype(dtype),
+        "shift": shift.astype(dtype),
+        "W": np.ascontiguousarray((components * inv_scale).T, dtype=dtype),  # (d, k)
+        "b": (-shift @ components.T).astype(dtype),
+        "centroids_t2": np.ascontiguousarray(-2.0 * centroids.T, dtype=dtype),  # (k, K)
+        "centroid_sq": (centroids ** 2).sum(axis=1).astype(dtype),
+    }
+
+
+class FusedScorer:
+    """
+    predict_anomaly_scores as a few BLAS calls, built once at model load:
+    - scaler folded into PCA: z = x @ W + b with W = components.T / scale,
+      b = -(mean / scale + pca.mean) @ components.T
+    - reconstruction error from the projection residual: components are orthonormal,
+      so ||x_c - recon||² = ||x_c||² - ||z||² (no inverse_transform)
+    - nearest centroid from one GEMM: argmin_k ||c_k||² - 2 z·c_k
+    Built from the raw arrays (model_params.bin) or fitted estimators (from_sklearn).
+    distance_scale is the model's persisted normalization (distance_scale_of), so a
+    row's score doesn't depend on the rest of the batch; None (models trained before
+    it was stored) falls back to the batch std.
+    Per-thread workspaces are reused across calls; pass out_scores / out_labels to
+    also reuse the outputs. dtype=np.float32 halves memory traffic (scores agree with
+    the float64 path to ~1e-4 relative).
+    The backend keeps a copy (app.services.scoring); its
+    scripts/check_scoring_parity.py compares the two.
+    """
+
+    def __init__(
+        self,
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        pca_components: np.ndarray,
+        pca_mean: np.ndarray,
+        centroids: np.ndarray,
+        dtype: Any = np.float64,
+        distance_scale: float | np.ndarray | None = None,
+    ):
+        weights = fold_scoring_weights(scaler_mean, scaler_scale, pca_components, pca_mean, centroids, dtype)
+        self._use_weights(weights, distance_scale)
+
+    def _use_weights(self, weights: dict[str, np.ndarray], distance_scale: float | np.ndarray | None) -> None:
+        """Take the folded weights as they are (no copy: they may be views of a memory map)."""
+        self.dtype = weights["W"].dtype
+        self.distance_scale = distance_scale
+        self.n_features = weights["W"].shape[0]
+        self.inv_scale = weights["inv_scale"]
+        self.shift = weights["shift"]
+        self.W = weights["W"]
+        self.b = weights["b"]
+        self.centroids_t2 = weights["centroids_t2"]
+        self.centroid_sq = weights["centroid_sq"]
+        self._local = threading.local()
+
+    @classmethod
+    def from_model_params(
+        cls,
+        arrays: dict[str, np.ndarray],
+        dtype: Any = np.float64,
+        distance_scale: float | np.ndarray | None = None,
+    ) -> "FusedScorer":
+        """
+        From load_model_params arrays. Files that store the folded weights for dtype
+        (format version 2) are scored from the memory-mapped views directly, so every
+        process shares one page-cache copy; older files are folded here.
+        """
+        prefix = fused_weight_prefix(dtype)
+        if all(prefix + name in arrays for name in FUSED_WEIGHT_NAMES):
+            scorer = cls.__new__(cls)
+            scorer._use_weights({name: arrays[prefix + name] for name in FUSED_WEIGHT_NAMES}, distance_scale)
+            return scorer
+        return cls(**{name: arrays[name] for name in MODEL_PARAM_NAMES}, dtype=dtype, distance_scale=distance_scale)
+
+    @classmethod
+    def from_sklearn(
+        cls,
+        scaler: Any,
+        pca: Any,
+        kmeans: Any,
+        dtype: Any = np.float64,
+        distance_scale: float | np.ndarray | None = None,
+    ) -> "FusedScorer":
+        return cls(**model_param_arrays(scaler, pca, kmeans), dtype=dtype, distance_scale=distance_scale)
+
+    def _workspace(self, n: int) -> dict[str, np.ndarray]:
+        ws = getattr(self._local, "ws", None)
+        if ws is None or ws["xc"].shape[0] < n:
+            cap = max(n, 2 * ws["xc"].shape[0] if ws else 1024)
+            ws = {
+                "xc": np.empty((cap, self.n_features), dtype=self.dtype),
+                "z": np.empty((cap, self.W.shape[1]), dtype=self.dtype),
+                "d": np.empty((cap, self.centroids_t2.shape[1]), dtype=self.dtype),
+            }
+            self._local.ws = ws
+        return {k: v[:n] for k, v in ws.items()}
+
+    def score_parts(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """X: (n, n_features) raw features → (recon_error, dist_to_centroid, cluster_labels), new arrays."""
+        X = np.asarray(X, dtype=self.dtype)
+        n = X.shape[0]
+        labels = np.empty(n, dtype=np.int64)
+        if n == 0:
+            return np.empty(0), np.empty(0), labels
+        ws = self._workspace(n)
+        xc, z, d = ws["xc"], ws["z"], ws["d"]
+
+        np.matmul(X, self.W, out=z)
+        z += self.b
+        np.multiply(X, self.inv_scale, out=xc)
+        xc -= self.shift
+        z_sq = np.einsum("ij,ij->i", z, z)
+        recon_error = np.einsum("ij,ij->i", xc, xc)
+        recon_error -= z_sq
+        np.maximum(recon_error, 0.0, out=recon_error)
+        recon_error /= self.n_features
+
+        np.matmul(z, self.centroids_t2, out=d)
+        d += self.centroid_sq
+        np.argmin(d, axis=1, out=labels)
+        dist = np.take_along_axis(d, labels[:, None], axis=1)[:, 0]
+        dist += z_sq
+        np.maximum(dist, 0.0, out=dist)
+        np.sqrt(dist, out=dist)
+        return recon_error, dist, labels
+
+    def score(
+        self,
+        X: np.ndarray,
+        out_scores: np.ndarray | None = None,
+        out_labels: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """X: (n, n_features) raw features. Returns (anomaly_scores float64, cluster_labels)."""
+        recon_error, dist, labels = self.score_parts(X)
+        scores = combine_anomaly_scores(recon_error, dist, self.distance_scale, labels, out_scores)
+        if out_labels is not None:
+            out_labels[:] = labels
+            labels = out_labels
+        return scores, labels
+
+
+def combine_anomaly_scores(
+    recon_error: np.ndarray,
+    dist: np.ndarray,
+    distance_scale: float | np.ndarray | None = None,
+    labels: np.ndarray | None = None,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Anomaly score = reconstruction error + 0.5 * distance / training distance std.
+    distance_scale is a float, or per-cluster scales indexed by labels; None uses
+    std(distance) over the batch (models trained before the scale was persisted).
+    """
+    out = out if out is not None else np.empty(len(dist), dtype=np.float64)
+    if len(dist) == 0:
+        return out
+    if distance_scale is None:
+        distance_scale = np.std(dist)
+    if np.ndim(distance_scale) == 0:
+        np.multiply(dist, 0.5 / (float(distance_scale) + 1e-8), out=out, casting="unsafe")
+    else:
+        np.multiply(dist, (0.5 / (np.asarray(distance_scale) + 1e-8))[labels], out=out, casting="unsafe")
+    out += recon_error
+    return out
+
+
+def backfill_distance_scales(model_dir: str | Path, X: np.ndarray) -> dict[str, Any]:
+    """
+    For a model saved before the distance normalization was persisted: recompute the
+    training distance scales from its training features X and store them in config.json
+    (global normalization, which is what its threshold was computed with).
+    """
+    scaler, pca, kmeans, config = load_pipeline(model_dir)
+    _, dist, labels = FusedScorer.from_sklearn(scaler, pca, kmeans).score_parts(X)
+    global_scale, cluster_scales = distance_scales(dist, labels, len(kmeans.cluster_centers_))
+    config = {
+        **config,
+        "distance_normalization": config.get("distance_normalization", "global"),
+        "distance_scale": global_scale,
+        "cluster_distance_scales": cluster_scales,
+    }
+    with open(Path(model_dir) / "config.json", "w") as f:
+        json.dump(config, f, indent=2)
+    return config
+
@@ -10,8 +10,9 @@ import pandas as pd
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from pipeline.config import Settings, get_model_dir, get_features_dir
-from pipeline.feature_engineering.features import get_feature_columns
-from pipeline.training.model import fit_pipeline, save_pipeline
+from pipeline.feature_engineering.features import get_feature_columns, load_feature_spec
+from pipeline.feature_engineering.store import FeatureStore, is_feature_store
+from pipeline.training.model import fit_pipeline, publish_to_registry, save_pipeline
 
 
 def load_training_config(model_dir: str | Path) -> dict:
@@ -26,9 +27,18 @@ def train(
     n_components: int | None = None,
     n_clusters: int | None = None,
     random_state: int | None = None,
+    registry_dir: str | Path | None = None,
+    version: str | None = None,
+    promote: bool = True,
+    distance_normalization: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
 ) -> dict:
     """
-    Read parquet feature matrix, fit scaler/PCA/KMeans, save to model_dir.
+    Read parquet feature matrix, fit scaler/PCA/KMeans, save to model_dir, or with
+    registry_dir publish as a new version (and make it current unless promote=False).
+    features_path may be a feature store dir; date_from / date_to (inclusive /
+    exclusive) then select its date partitions.
     Returns config dict (includes anomaly_score_threshold).
     """
     settings = Settings()
@@ -38,8 +48,21 @@ def train(
     if not features_path.exists():
         raise FileNotFoundError(f"Features not found: {features_path}. Run feature_engineering first.")
 
-    df = pd.read_parquet(features_path)
-    feature_cols = get_feature_columns()
+    if is_feature_store(features_path):
+        store = FeatureStore(features_path)
+        feature_spec = load_feature_spec(features_path)
+        feature_cols = (feature_spec or {}).get("feature_columns") or get_feature_columns()
+        df = store.read(date_from, date_to, columns=[c for c in feature_cols if c in store.manifest["feature_columns"]])
+        print(f"Feature store {features_path}: {len(df)} rows from {len(store.partitions(date_from, date_to))} partitions")
+    elif date_from or date_to:
+        raise ValueError("date_from / date_to need a feature store (see feature_engineering.run --store)")
+    else:
+        df = pd.read_parquet(features_path)
+        feature_spec = load_feature_spec(features_path.parent)
+        # The spec's column order, window features included
+        feature_cols = (feature_spec or {}).get("feature_columns") or get_feature_columns()
+    if feature_spec is None:
+        print(f"Warning: no feature spec next to {features_path}; inference will encode categories per batch")
     missing = [c for c in feature_cols if c not in df.columns]
     if missing:
         raise ValueError(f"Missing feature columns: {missing}")
@@ -61,8 +84,14 @@ def train(
         n_components=min(n_components, X.shape[0], X.shape[1]),
         n_clusters=min(n_clusters, X.shape[0]),
         random_state=random_state,
+        feature_spec=feature_spec,
+        distance_normalization=distance_normalization or settings.distance_normalization,
     )
-    save_pipeline(artifacts, model_dir)
+    if registry_dir:
+        model_dir = publish_to_registry(artifacts, registry_dir, version, promote)
+        artifacts["config"]["model_version"] = model_dir.name
+    else:
+        save_pipeline(artifacts, model_dir)
     print(f"Saved model to {model_dir}, anomaly_score_threshold={artifacts['config']['anomaly_score_threshold']:.4f}")
     return artifacts["config"]
 
@@ -70,11 +99,22 @@ def train(
 def main():
     import argparse
     p = argparse.ArgumentParser()
-    p.add_argument("--features", type=str, default=None)
+    p.add_argument("--features", type=str, default=None, help="Featured parquet file/dir or a feature store dir")
+    p.add_argument("--date-from", type=str, default=None, help="Feature store: first date partition (inclusive)")
+    p.add_argument("--date-to", type=str, default=None, help="Feature store: last date partition (exclusive)")
     p.add_argument("--model-dir", type=str, default=None)
     p.add_argument("--n-components", type=int, default=None)
     p.add_argument("--n-clusters", type=int, default=None)
     p.add_argument("--random-state", type=int, default=42)
+    p.add_argument("--registry", type=str, default=None, help="Publish as a new version in this model registry dir")
+    p.add_argument("--version", type=str, default=None, help="Registry version name (default: UTC timestamp)")
+    p.add_argument("--no-promote", action="store_true", help="Don't point the registry's `current` at the new version")
+    p.add_argument(
+        "--distance-normalization",
+        choices=["global", "cluster"],
+        default=None,
+        help="Divide centroid distance by the training std over all rows or within each cluster",
+    )
     args = p.parse_args()
     train(
         features_path=args.features,
@@ -82,6 +122,12 @@ def main():
         n_components=args.n_components,
         n_clusters=args.n_clusters,
         random_state=args.random_state,
+        registry_dir=args.registry,
+        version=args.version,
+        promote=not args.no_promote,
+        distance_normalization=args.distance_normalization,
+        date_from=args.date_from,
+        date_to=args.date_to,
     )
 
 